@@ -1,6 +1,7 @@
 import logging
 from flask import Flask
 from .config import Config
+from .cpu_pool import cpu_pool
 from .routes import api
 
 def create_app():
@@ -16,4 +17,7 @@ def create_app():
     # Register blueprints
     app.register_blueprint(api, url_prefix='/api')
     
+    # Fork the CPU pool workers now, before request threads exist
+    cpu_pool.start()
+    
     return app
\ No newline at end of file
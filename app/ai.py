@@ -1,64 +1,291 @@
 import json
 import logging
-from groq import Groq
-from typing import Dict, Any
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
 from .config import Config
+from .extractor import extract_market_facts, format_market_facts
+from .llm_backends import LLMRouter
+from .translation_memory import TranslationMemory, TranslationPlan
+from .schemas import ReportAnalysis, describe_fields, missing_fields, repair_json
+from .symbols import SymbolIndex, get_symbol_index
+from .usage import usage_scope
 
 logger = logging.getLogger(__name__)
 
+FALLBACK_SUMMARY = "Market report analysis temporarily unavailable. Please review original content."
+
+SYSTEM_PROMPT = "You are an expert financial analyst with deep knowledge of global markets, trading, and investment strategies."
+
+def is_fallback_analysis(analysis: Dict[str, Any]) -> bool:
+    """True for the placeholder returned when the AI step failed"""
+    return analysis.get("summary") == FALLBACK_SUMMARY
+
+class AnalysisPolicy:
+    """Picks reasoning effort and completion budget per report and tracks how each tier performs"""
+
+    TIERS = {
+        "light": {"reasoning_effort": "low", "max_completion_tokens": 2048},
+        "standard": {"reasoning_effort": "medium", "max_completion_tokens": 4096},
+        "deep": {"reasoning_effort": "high", "max_completion_tokens": 8192},
+    }
+    REASONING_EFFORTS = ("low", "medium", "high")
+
+    def __init__(self, light_max_words: int = None, standard_max_words: int = None):
+        self.light_max_words = Config.AI_LIGHT_MAX_WORDS if light_max_words is None else light_max_words
+        self.standard_max_words = Config.AI_STANDARD_MAX_WORDS if standard_max_words is None else standard_max_words
+        self._history = {tier: deque(maxlen=200) for tier in self.TIERS}
+        self._lock = threading.Lock()
+
+    def choose(self, word_count: int, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Tier from word count, then apply any per-request overrides from the webhook payload"""
+        overrides = overrides or {}
+
+        tier = overrides.get("analysis_tier")
+        if tier not in self.TIERS:
+            if word_count <= self.light_max_words:
+                tier = "light"
+            elif word_count <= self.standard_max_words:
+                tier = "standard"
+            else:
+                tier = "deep"
+
+        settings = {"tier": tier, **self.TIERS[tier]}
+
+        if overrides.get("reasoning_effort") in self.REASONING_EFFORTS:
+            settings["reasoning_effort"] = overrides["reasoning_effort"]
+        if overrides.get("max_completion_tokens") is not None:
+            try:
+                budget = int(overrides["max_completion_tokens"])
+                settings["max_completion_tokens"] = max(256, min(budget, Config.AI_MAX_COMPLETION_TOKENS))
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring invalid max_completion_tokens override: {overrides['max_completion_tokens']}")
+
+        return settings
+
+    def record(self, settings: Dict[str, Any], word_count: int, latency: float, usage: Dict[str, Any] = None):
+        usage = usage or {}
+        sample = {
+            "word_count": word_count,
+            "latency": latency,
+            "reasoning_effort": settings["reasoning_effort"],
+            "max_completion_tokens": settings["max_completion_tokens"],
+            "completion_tokens": usage.get("completion_tokens"),
+        }
+        with self._lock:
+            self._history[settings["tier"]].append(sample)
+        logger.info(
+            f"Analysis tier={settings['tier']} effort={settings['reasoning_effort']} "
+            f"budget={settings['max_completion_tokens']} words={word_count} latency={latency:.1f}s "
+            f"completion_tokens={sample['completion_tokens']}"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Latency and token usage per tier, for tuning the thresholds"""
+        with self._lock:
+            history = {tier: list(samples) for tier, samples in self._history.items()}
+
+        stats = {}
+        for tier, samples in history.items():
+            latencies = sorted(sample["latency"] for sample in samples)
+            tokens = [sample["completion_tokens"] for sample in samples if sample["completion_tokens"] is not None]
+            stats[tier] = {
+                "count": len(samples),
+                "avg_latency": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "p95_latency": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 2) if latencies else None,
+                "avg_words": round(sum(sample["word_count"] for sample in samples) / len(samples)) if samples else None,
+                "avg_completion_tokens": round(sum(tokens) / len(tokens)) if tokens else None,
+                "budget_hits": sum(1 for sample in samples if sample["completion_tokens"] and sample["completion_tokens"] >= sample["max_completion_tokens"]),
+            }
+        return stats
+
 class GroqAIProcessor:
-    def __init__(self):
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
+    def __init__(
+        self,
+        router: Optional[LLMRouter] = None,
+        policy: Optional[AnalysisPolicy] = None,
+        translation_memory: Optional[TranslationMemory] = None,
+        symbols: Optional[SymbolIndex] = None,
+    ):
+        self.router = router or LLMRouter.from_config()
+        self.policy = policy or AnalysisPolicy()
+        # None means every segment is sent to the model; from_config() adds the configured memory
+        self.translation_memory = translation_memory
+        if symbols is None and Config.SYMBOL_NORMALIZATION_ENABLED:
+            symbols = get_symbol_index()
+        self.symbols = symbols
+
+    @classmethod
+    def from_config(cls) -> "GroqAIProcessor":
+        """Processor with the configured backends and, when enabled, the translation memory"""
+        return cls(translation_memory=TranslationMemory() if Config.TRANSLATION_MEMORY_ENABLED else None)
     
-    def translate_and_analyze(self, content: str) -> Dict[str, Any]:
+    def translate_and_analyze(self, content: str, word_count: Optional[int] = None, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Translate content to English and perform comprehensive analysis
+        Translate content to English and perform comprehensive analysis.
+        `word_count` (from the cleaned report) and `overrides` drive the reasoning tier.
         """
 
         try:
-            prompt = self._create_analysis_prompt(content[:8000]) # the Limit of 8000 is to do not over pass the tokens limit
-            
-            response = self.client.chat.completions.create(
-                model="openai/gpt-oss-120b",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert financial analyst with deep knowledge of global markets, trading, and investment strategies."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                temperature=1,
-                max_completion_tokens=8192,
-                top_p=1,
-                reasoning_effort="high",
-                stream=False,
-                response_format={"type": "json_object"},
-                stop=None,
-                # tools=[{"type":"browser_search"}]
-            )
-            if not response.choices or not response.choices[0].message.content:
-                return self._fallback_analysis("")
+            request = self.prepare_analysis(content, word_count, overrides)
+            started = time.monotonic()
 
-            try:
-                result = json.loads(response.choices[0].message.content)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {e}")
-                return self._fallback_analysis(f"Failed to parse JSON from AI response: {e}")
+            with usage_scope(stage="analysis"):
+                response = self.router.complete(
+                    request["messages"],
+                    validate=self._parse_analysis,
+                    **request["params"]
+                )
 
-            return result
+            logger.info(f"Analysis served by {response.backend} in {response.latency:.1f}s")
+            self.policy.record(request["settings"], request["word_count"], time.monotonic() - started, response.usage)
+            return self.finish_analysis(request, response.content)
 
         except Exception as e:
             logger.error(f"Groq AI processing failed: {e}")
             return self._fallback_analysis(f"Processing failed: {e}")
+
+    def prepare_analysis(self, content: str, word_count: Optional[int] = None, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build the analysis request; the result is JSON-serialisable so batch jobs can be resumed"""
+        # Facts come from the full report, so levels past the truncation point still reach the model
+        facts = extract_market_facts(content, symbols=self.symbols or None) if Config.MARKET_FACTS_ENABLED else None
+        content = content[:8000] # the Limit of 8000 is to do not over pass the tokens limit
+        plan = self.translation_memory.plan(content) if self.translation_memory else None
+        prompt = self._create_analysis_prompt(content, plan, facts)
+        if word_count is None:
+            word_count = len(content.split())
+        settings = self.policy.choose(word_count, overrides)
+
+        return {
+            "content": content,
+            "word_count": word_count,
+            "settings": settings,
+            "plan": plan.to_dict() if plan is not None else None,
+            "facts": facts,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user", 
+                    "content": prompt
+                }
+            ],
+            "params": {
+                "temperature": 1,
+                "max_completion_tokens": settings["max_completion_tokens"],
+                "top_p": 1,
+                "reasoning_effort": settings["reasoning_effort"],
+                "stream": False,
+                "response_format": {"type": "json_object"},
+                "stop": None,
+                # "tools": [{"type":"browser_search"}]
+            },
+        }
+
+    def finish_analysis(self, request: Dict[str, Any], raw_content: str) -> Dict[str, Any]:
+        """Turn the model's raw answer to a prepared request into a validated analysis"""
+        try:
+            result = self._parse_analysis(raw_content)
+        except ValueError as e:
+            logger.error(f"Failed to parse JSON response: {e}")
+            return self._fallback_analysis(f"Failed to parse JSON from AI response: {e}")
+
+        if request.get("plan") is not None:
+            result = self._apply_translation_plan(result, TranslationPlan.from_dict(request["plan"]))
+        if request.get("facts"):
+            result = self._apply_market_facts(result, request["facts"])
+
+        missing = missing_fields(result)
+        if missing:
+            result.update(self._request_missing_fields(request["content"], result, missing))
+
+        analysis = ReportAnalysis.model_validate(result).model_dump()
+        if self.symbols:
+            # Canonical names keep the Notion multi-select options small
+            analysis["market_metrics"] = self.symbols.normalize_metrics(analysis["market_metrics"], request["content"])
+        return analysis
     
+    def _parse_analysis(self, text: str) -> Dict[str, Any]:
+        """Parse (and if needed repair) the model's JSON; raises ValueError when nothing is usable"""
+        result = repair_json(text)
+        if not result:
+            raise ValueError("No JSON object in AI response")
+        return result
+
+    def _request_missing_fields(self, content: str, partial: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+        """Ask only for the fields the first answer left out, instead of re-running the whole analysis"""
+        logger.warning(f"AI response missing fields {fields}, requesting them separately")
+        known = {key: value for key, value in partial.items() if key not in fields and key != "translated_content"}
+        prompt = f"""
+A previous analysis of the financial market report below is missing some fields.
+Return valid JSON containing ONLY these keys:
+
+{describe_fields(fields)}
+
+Analysis so far (for consistency):
+{json.dumps(known, ensure_ascii=False)[:3000]}
+
+Report:
+{content}
+"""
+        budget = 8192 if "translated_content" in fields else 2048
+        try:
+            with usage_scope(stage="missing_fields"):
+                response = self.router.complete(
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    validate=self._parse_analysis,
+                    temperature=1,
+                    max_completion_tokens=budget,
+                    top_p=1,
+                    reasoning_effort="low",
+                    stream=False,
+                    response_format={"type": "json_object"},
+                )
+            recovered = self._parse_analysis(response.content)
+            return {key: recovered[key] for key in fields if key in recovered}
+        except Exception as e:
+            # Schema defaults fill whatever is still missing
+            logger.error(f"Follow-up request for missing fields failed: {e}")
+            return {}
+
+    def _apply_market_facts(self, result: Dict[str, Any], facts: Dict[str, Any]) -> Dict[str, Any]:
+        """Fill market_metrics from the rule-based extraction where the model left gaps"""
+        metrics = result.get("market_metrics")
+        metrics = dict(metrics) if isinstance(metrics, dict) else {}
+        if not metrics.get("mentioned_stocks") and (facts.get("tickers") or facts.get("indices")):
+            metrics["mentioned_stocks"] = facts.get("tickers", []) + facts.get("indices", [])
+        if not metrics.get("sectors") and facts.get("sectors"):
+            metrics["sectors"] = facts["sectors"]
+        if facts.get("levels") and not metrics.get("price_levels"):
+            metrics["price_levels"] = [
+                {"kind": level["kind"], "value": level["value"]} for level in facts["levels"]
+            ]
+        if metrics:
+            metrics.setdefault("sectors", [])
+            metrics.setdefault("market_sentiment", "neutral")
+            result["market_metrics"] = metrics
+        return result
+
+    def _apply_translation_plan(self, result: Dict[str, Any], plan: TranslationPlan) -> Dict[str, Any]:
+        """Store newly translated segments and rebuild translated_content from memory"""
+        translations = result.pop("segment_translations", None)
+        if not isinstance(translations, dict):
+            translations = {}
+        self.translation_memory.store(plan.new_entries(translations))
+        result["translated_content"] = plan.assemble(translations)
+        return result
+
     def _fallback_analysis(self, content: str) -> Dict[str, Any]:
         """Fallback analysis when AI processing fails"""
         return {
             "translated_content": content,
-            "summary": "Market report analysis temporarily unavailable. Please review original content.",
+            "summary": FALLBACK_SUMMARY,
             "key_insights": ["AI analysis temporarily unavailable"],
             "market_metrics": {
                 "mentioned_stocks": [],
@@ -72,14 +299,39 @@ class GroqAIProcessor:
         }
     
         
-    def _create_analysis_prompt(self, content: str) -> str:
+    def _create_analysis_prompt(self, content: str, plan: Optional[TranslationPlan] = None, facts: Optional[Dict[str, Any]] = None) -> str:
         """Create a comprehensive analysis prompt for the AI"""
+        facts_block = format_market_facts(facts) if facts else ""
+        if facts_block:
+            facts_block = (
+                "Pre-extracted from the report (tickers, indices, price levels, changes). "
+                "Use them for market_metrics and the analysis instead of searching the text for numbers again:\n"
+                f"{facts_block}\n"
+            )
+
+        translation_step = "2. **Translation**: If not in English, translate to English preserving all financial terms and numbers"
+        translation_field = '"translated_content": "Full content translated to English",'
+
+        if plan is not None:
+            # Only segments missing from the translation memory are sent for translation
+            content = plan.tagged_text()
+            if plan.missing:
+                translation_step = (
+                    "2. **Translation**: Sentences prefixed with an id like [s1] have not been translated yet. "
+                    "Translate each of them to English, preserving all financial terms and numbers. "
+                    "Untagged text is already translated elsewhere; use it for the analysis only"
+                )
+                translation_field = '"segment_translations": {"s1": "English translation of sentence [s1]", "...": "one entry per tagged sentence"},'
+            else:
+                translation_step = "2. **Translation**: Not needed, the text is already translated elsewhere"
+                translation_field = ""
+
         return f"""
 Analyze this financial market report and provide a comprehensive analysis in JSON format.
 
 Please provide:
 1. **Language Detection**: Identify the original language
-2. **Translation**: If not in English, translate to English preserving all financial terms and numbers
+{translation_step}
 3. **Content Analysis**: Extract and analyze the key information
 
 Ensure the translation maintains financial terminology accuracy and the analysis focuses on actionable market intelligence.
@@ -87,7 +339,7 @@ Ensure the translation maintains financial terminology accuracy and the analysis
 Response format (must be valid JSON):
 
 {{
-    "translated_content": "Full content translated to English",
+    {translation_field}
     "summary": "Comprehensive 3-4 paragraph summary highlighting the most critical insights",
     "key_insights": [
         "List of 5-7 most important insights from the report",
@@ -107,6 +359,7 @@ Response format (must be valid JSON):
     "confidence_level": "High/Medium/Low - based on data quality and analysis certainty"
 }}
 
+{facts_block}
 Content to analyze:
 {content}
 """
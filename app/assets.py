@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+IMAGE = "image"
+LINK = "link"
+
+_EXTENSIONS = {"png": "png", "jpeg": "jpg", "gif": "gif", "webp": "webp"}
+
+
+def image_info(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """(format, width, height) from the image header, or None if the bytes are not a known image"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        width, height = struct.unpack(">II", data[16:24])
+        return "png", width, height
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        width, height = struct.unpack("<HH", data[6:10])
+        return "gif", width, height
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            width = int.from_bytes(data[24:27], "little") + 1
+            height = int.from_bytes(data[27:30], "little") + 1
+            return "webp", width, height
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return "webp", width & 0x3FFF, height & 0x3FFF
+    if data[:2] == b"\xff\xd8":
+        # Walk the JPEG segments up to the start-of-frame marker
+        index = 2
+        while index + 9 < len(data):
+            if data[index] != 0xFF:
+                index += 1
+                continue
+            marker = data[index + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                index += 2
+                continue
+            length = struct.unpack(">H", data[index + 2:index + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[index + 5:index + 9])
+                return "jpeg", width, height
+            index += 2 + length
+    return None
+
+
+@dataclass
+class ReportAsset:
+    url: str
+    kind: str = IMAGE
+    sha256: Optional[str] = None
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    size: Optional[int] = None
+    path: Optional[str] = None
+    duplicates: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class AssetCache:
+    """Content-addressed image files on disk with a URL index, evicting least recently used files"""
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or Config.ASSET_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else Config.ASSET_CACHE_MAX_MB * 1024 * 1024
+        self.index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load asset index {self.index_path}: {e}")
+
+    def lookup(self, url: str) -> Optional[ReportAsset]:
+        """Cached asset for `url` if its file (or, for links, its entry) is still there"""
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        if entry.get("kind") == IMAGE:
+            if not entry.get("path") or not os.path.exists(entry["path"]):
+                return None
+            os.utime(entry["path"])
+        return ReportAsset(**entry)
+
+    def store(self, asset: ReportAsset, data: Optional[bytes] = None):
+        if data is not None:
+            asset.path = os.path.join(self.directory, f"{asset.sha256}.{_EXTENSIONS.get(asset.format, 'bin')}")
+            if not os.path.exists(asset.path):
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = f"{asset.path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, asset.path)
+            else:
+                os.utime(asset.path)
+        with self._lock:
+            self.index[asset.url] = {**asset.to_dict(), "duplicates": 0}
+
+    def save(self):
+        """Evict old files over the size budget, then persist the URL index"""
+        with self._lock:
+            self._evict()
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.index, f)
+            os.replace(tmp_path, self.index_path)
+
+    def _evict(self):
+        if not os.path.isdir(self.directory):
+            return
+        # Subdirectories count too: inline/ holds the images externalize_data_uris() takes out of report HTML
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                if path != self.index_path and not name.endswith(".tmp"):
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        evicted = set()
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            evicted.add(path)
+            total -= size
+        if evicted:
+            self.index = {url: entry for url, entry in self.index.items() if entry.get("path") not in evicted}
+            logger.info(f"Evicted {len(evicted)} cached assets")
+
+
+class AssetPipeline:
+    """
+    Fetches report images concurrently over a pooled session, keeps only valid
+    images (unique by content hash) and reachable non-image links, and caches them.
+    """
+
+    def __init__(self, cache: AssetCache = None, session: requests.Session = None, max_workers: int = None,
+                 timeout: float = None, max_image_bytes: int = None):
+        self.cache = cache or AssetCache()
+        self.max_workers = max_workers or Config.ASSET_FETCH_CONCURRENCY
+        self.timeout = timeout or Config.ASSET_FETCH_TIMEOUT
+        self.max_image_bytes = max_image_bytes or Config.ASSET_MAX_IMAGE_MB * 1024 * 1024
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = Config.USER_AGENT
+        self.session = session
+
+    def process(self, urls: List[str], base_url: str = None) -> List[ReportAsset]:
+        """Valid, unique assets in the order the report uses them"""
+        started = time.monotonic()
+        urls = [urljoin(base_url, url) if base_url else url for url in urls or []]
+        urls = [url for url in dict.fromkeys(urls) if url.startswith(("http://", "https://"))]
+        if not urls:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls)), thread_name_prefix="assets") as executor:
+            fetched = list(executor.map(self._fetch, urls))
+
+        assets, by_hash = [], {}
+        for asset in fetched:
+            if asset is None:
+                continue
+            if asset.kind == IMAGE:
+                if asset.sha256 in by_hash:
+                    by_hash[asset.sha256].duplicates += 1
+                    continue
+                by_hash[asset.sha256] = asset
+            assets.append(asset)
+
+        try:
+            self.cache.save()
+        except OSError as e:
+            logger.error(f"Could not save asset cache: {e}")
+        logger.info(f"Processed {len(urls)} report assets into {len(assets)} in {time.monotonic() - started:.1f}s")
+        return assets
+
+    def _fetch(self, url: str) -> Optional[ReportAsset]:
+        cached = self.cache.lookup(url)
+        if cached:
+            return cached
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    logger.warning(f"Dropping asset {url}: HTTP {response.status_code}")
+                    return None
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if content_type.startswith("text/html"):
+                    # Chart pages (e.g. TradingView snapshots) are shown as bookmarks; cached under
+                    # the requested URL, which is what the next lookup uses, not the redirect target
+                    asset = ReportAsset(url=url, kind=LINK)
+                    self.cache.store(asset)
+                    return asset
+
+                data = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    data.extend(chunk)
+                    if len(data) > self.max_image_bytes:
+                        logger.warning(f"Dropping asset {url}: larger than {self.max_image_bytes} bytes")
+                        return None
+        except requests.RequestException as e:
+            logger.warning(f"Dropping asset {url}: {e}")
+            return None
+
+        info = image_info(bytes(data))
+        if not info:
+            logger.warning(f"Dropping asset {url}: not a PNG/JPEG/GIF/WebP image")
+            return None
+        image_format, width, height = info
+        asset = ReportAsset(
+            url=url,
+            sha256=hashlib.sha256(data).hexdigest(),
+            format=image_format,
+            width=width,
+            height=height,
+            size=len(data),
+        )
+        try:
+            self.cache.store(asset, bytes(data))
+        except OSError as e:
+            logger.error(f"Could not cache asset {url}: {e}")
+        return asset
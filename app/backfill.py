@@ -0,0 +1,419 @@
+"""
+Backfill the Notion database from the report archive.
+
+    python -m app.backfill urls.txt
+    python -m app.backfill sitemap.xml --batch-size 50 --submitter groq
+
+Progress is stored under the state directory, so an interrupted run can be
+started again with the same arguments and continues where it stopped.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from .ai import is_fallback_analysis
+from .config import Config
+from .llm_backends import DEFAULT_MODEL
+from .usage import usage_scope, usage_tracker
+
+logger = logging.getLogger(__name__)
+
+_SITEMAP_LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+# Progress of a URL through the pipeline, in order
+PENDING = "pending"
+SCRAPED = "scraped"
+SUBMITTED = "submitted"
+ANALYZED = "analyzed"
+PUBLISHED = "published"
+FAILED = "failed"
+
+
+def load_urls(path: str) -> List[str]:
+    """Read report URLs from a plain list (one per line) or a sitemap XML dump"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+
+    if "<loc>" in text.lower():
+        urls = [url for url in _SITEMAP_LOC.findall(text) if urlparse(url).path.startswith("/analysis")]
+    else:
+        urls = [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+    # Keep the first occurrence of each URL
+    return list(dict.fromkeys(urls))
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+class BackfillState:
+    """Per-URL progress plus cached intermediate results, persisted on disk"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, "progress.json")
+        self._lock = threading.Lock()
+        for sub in ("reports", "requests", "analyses"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def add(self, urls: List[str]):
+        with self._lock:
+            for url in urls:
+                self.entries.setdefault(url, {"status": PENDING})
+        self.save()
+
+    def urls_with(self, *statuses: str) -> List[str]:
+        with self._lock:
+            return [url for url, entry in self.entries.items() if entry["status"] in statuses]
+
+    def update(self, url: str, **fields):
+        with self._lock:
+            self.entries[url].update(fields)
+        self.save()
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+    def write(self, kind: str, url: str, data: Dict[str, Any]):
+        path = os.path.join(self.directory, kind, f"{url_key(url)}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def read(self, kind: str, url: str) -> Dict[str, Any]:
+        with open(os.path.join(self.directory, kind, f"{url_key(url)}.json"), encoding="utf-8") as f:
+            return json.load(f)
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+
+class LocalBatchSubmitter:
+    """
+    Batch interface that completes jobs immediately with `complete(messages, **params) -> str`.
+
+    Used for testing and for small backfills where waiting for a provider
+    batch window is not worth it.
+    """
+
+    def __init__(self, complete: Callable[..., str], max_workers: int = 4):
+        self.complete = complete
+        self.max_workers = max_workers
+        self._results: Dict[str, Dict[str, Optional[str]]] = {}
+
+    def submit(self, jobs: Dict[str, Dict[str, Any]]) -> str:
+        def run(job):
+            try:
+                with usage_scope(report_url=job.get("report_url"), stage="backfill"):
+                    return self.complete(job["messages"], **job["params"])
+            except Exception as e:
+                logger.error(f"Local batch job failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            outputs = list(executor.map(run, jobs.values()))
+
+        batch_id = f"local-{len(self._results) + 1}-{int(time.time())}"
+        self._results[batch_id] = dict(zip(jobs.keys(), outputs))
+        return batch_id
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        return self._results.get(batch_id, {})
+
+
+class GroqBatchSubmitter:
+    """Submits jobs through Groq's batch API (JSONL upload, asynchronous completion window)"""
+
+    FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, client=None, model: str = None, poll_interval: float = None, completion_window: str = "24h"):
+        if client is None:
+            from groq import Groq
+            client = Groq(api_key=Config.GROQ_API_KEY)
+        self.client = client
+        self.model = model or Config.GROQ_MODEL or DEFAULT_MODEL
+        self.poll_interval = poll_interval or Config.BACKFILL_POLL_INTERVAL
+        self.completion_window = completion_window
+        # custom_id → report URL for usage attribution (batches from earlier runs fall back to the id)
+        self.report_urls: Dict[str, str] = {}
+
+    def submit(self, jobs: Dict[str, Dict[str, Any]]) -> str:
+        lines = []
+        for custom_id, job in jobs.items():
+            if job.get("report_url"):
+                self.report_urls[custom_id] = job["report_url"]
+            body = {"model": self.model, "messages": job["messages"], **job["params"]}
+            body.pop("stream", None)
+            lines.append(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }))
+
+        batch_file = self.client.files.create(
+            file=("backfill.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        logger.info(f"Submitted Groq batch {batch.id} with {len(jobs)} jobs")
+        return batch.id
+
+    def results(self, batch_id: str) -> Dict[str, Optional[str]]:
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in self.FINAL_STATUSES:
+                break
+            logger.info(f"Batch {batch_id} is {batch.status}, checking again in {self.poll_interval:.0f}s")
+            time.sleep(self.poll_interval)
+
+        if not batch.output_file_id:
+            logger.error(f"Batch {batch_id} ended as {batch.status} without output")
+            return {}
+
+        results = {}
+        for line in self.client.files.content(batch.output_file_id).text().splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            choices = body.get("choices") or []
+            if response.get("status_code") == 200 and choices:
+                results[record["custom_id"]] = choices[0]["message"].get("content")
+                # Batch calls bypass the router, so account for them here
+                if Config.USAGE_TRACKING_ENABLED:
+                    usage_tracker.record(
+                        "groq-batch", body.get("model") or self.model, body.get("usage"), 0.0,
+                        report_url=self.report_urls.get(record["custom_id"], record["custom_id"]), stage="backfill",
+                    )
+            else:
+                results[record["custom_id"]] = None
+        return results
+
+
+class Backfill:
+    """Scrape → batch analysis → Notion, with resumable progress and a throughput summary"""
+
+    def __init__(
+        self,
+        state: BackfillState,
+        submitter,
+        ai_processor=None,
+        notion_client=None,
+        extractor=None,
+        batch_size: int = None,
+        notion_concurrency: int = None,
+    ):
+        if ai_processor is None:
+            from .ai import GroqAIProcessor
+            ai_processor = GroqAIProcessor.from_config()
+        if notion_client is None:
+            from .notion_client import NotionClient
+            notion_client = NotionClient()
+        if extractor is None:
+            from .extractor import ContentExtractor
+            extractor = ContentExtractor()
+
+        self.state = state
+        self.submitter = submitter
+        self.ai_processor = ai_processor
+        self.notion_client = notion_client
+        self.extractor = extractor
+        self.batch_size = batch_size or Config.BACKFILL_BATCH_SIZE
+        self.notion_concurrency = notion_concurrency or Config.BACKFILL_NOTION_CONCURRENCY
+        self.timings: Dict[str, float] = {}
+        self.processed: Dict[str, int] = {}
+
+    def run(self, urls: List[str]) -> Dict[str, Any]:
+        self.state.add(urls)
+        # Failed reports get another chance on every run
+        for url in self.state.urls_with(FAILED):
+            self.state.update(url, status=PENDING, error=None)
+        started = time.monotonic()
+
+        self._timed("scrape", self.scrape)
+        self._timed("analyze", self.analyze)
+        self._timed("publish", self.publish)
+
+        return self.summary(time.monotonic() - started)
+
+    def _timed(self, stage: str, step: Callable[[], int]):
+        started = time.monotonic()
+        self.processed[stage] = step() or 0
+        self.timings[stage] = time.monotonic() - started
+
+    def scrape(self) -> int:
+        """Scrape pending URLs through one shared, logged-in browser"""
+        urls = self.state.urls_with(PENDING)
+        if not urls:
+            return 0
+        from .scraper import WebScraper
+
+        async def _scrape_all():
+            async with WebScraper() as scraper:
+                for index, url in enumerate(urls, 1):
+                    report = await scraper.scrape_report(url)
+                    self.store_scraped(url, report)
+                    logger.info(f"Scraped {index}/{len(urls)}: {url}")
+
+        asyncio.run(_scrape_all())
+        return len(urls)
+
+    def store_scraped(self, url: str, report: Dict[str, Any]):
+        if not report.get("success"):
+            self.state.update(url, status=FAILED, stage="scrape", error=report.get("error"))
+            return
+        self.state.write("reports", url, report)
+        self.state.update(url, status=SCRAPED)
+
+    def analyze(self) -> int:
+        """Submit scraped reports in batches, then collect results (including batches from earlier runs)"""
+        scraped = self.state.urls_with(SCRAPED)
+        for start in range(0, len(scraped), self.batch_size):
+            batch_urls = scraped[start:start + self.batch_size]
+            jobs = {}
+            for url in batch_urls:
+                report = self.state.read("reports", url)
+                cleaned = self.extractor.clean_html_content(report)
+                content = report.get("text_content") or report.get("html_content") or ""
+                request = self.ai_processor.prepare_analysis(content, word_count=cleaned["word_count"])
+                self.state.write("requests", url, request)
+                jobs[url_key(url)] = {**request, "report_url": url}
+
+            batch_id = self.submitter.submit(jobs)
+            for url in batch_urls:
+                self.state.update(url, status=SUBMITTED, batch_id=batch_id)
+
+        analyzed = 0
+        submitted = self.state.urls_with(SUBMITTED)
+        for batch_id in dict.fromkeys(self.state.entries[url]["batch_id"] for url in submitted):
+            results = self.submitter.results(batch_id)
+            for url in submitted:
+                if self.state.entries[url]["batch_id"] != batch_id:
+                    continue
+                raw = results.get(url_key(url))
+                if raw is None:
+                    # Resubmit on the next run
+                    self.state.update(url, status=SCRAPED, batch_id=None)
+                    continue
+                request = self.state.read("requests", url)
+                try:
+                    analysis = self.ai_processor.finish_analysis(request, raw)
+                except Exception as e:
+                    logger.error(f"Could not finish analysis of {url}: {e}")
+                    self.state.update(url, status=FAILED, stage="analyze", error=str(e), batch_id=None)
+                    continue
+                if is_fallback_analysis(analysis):
+                    # Never publish the placeholder; the report is retried on the next run
+                    self.state.update(url, status=FAILED, stage="analyze", error="AI response could not be parsed", batch_id=None)
+                    continue
+                self.state.write("analyses", url, analysis)
+                self.state.update(url, status=ANALYZED)
+                analyzed += 1
+        return analyzed
+
+    def publish(self) -> int:
+        """Create Notion pages with bounded concurrency"""
+        urls = self.state.urls_with(ANALYZED)
+
+        def publish_one(url):
+            try:
+                report = self.state.read("reports", url)
+                analysis = self.state.read("analyses", url)
+                full_response = self.extractor.create_summary_structure(report, analysis)
+                if Config.NOTION_UPSERT_ENABLED:
+                    result = self.notion_client.upsert_report_page(full_response, url)
+                else:
+                    result = self.notion_client.create_report_page(full_response, url)
+            except Exception as e:
+                # One broken report must not stop the rest of the run
+                logger.error(f"Could not publish {url}: {e}")
+                result = {"success": False, "error": str(e)}
+            if result["success"]:
+                self.state.update(url, status=PUBLISHED, page_url=result.get("page_url"))
+                return True
+            self.state.update(url, error=result.get("error"))
+            return False
+
+        with ThreadPoolExecutor(max_workers=self.notion_concurrency) as executor:
+            return sum(executor.map(publish_one, urls))
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        throughput = {
+            stage: round(count / self.timings[stage] * 60, 2) if self.timings.get(stage) else None
+            for stage, count in self.processed.items()
+        }
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "status": self.state.counts(),
+            "processed": self.processed,
+            "stage_seconds": {stage: round(seconds, 1) for stage, seconds in self.timings.items()},
+            "reports_per_minute": throughput,
+        }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Backfill past reports into Notion")
+    parser.add_argument("source", help="File with one URL per line, or a sitemap XML dump")
+    parser.add_argument("--state-dir", default=Config.BACKFILL_STATE_DIR)
+    parser.add_argument("--batch-size", type=int, default=Config.BACKFILL_BATCH_SIZE)
+    parser.add_argument("--notion-concurrency", type=int, default=Config.BACKFILL_NOTION_CONCURRENCY)
+    parser.add_argument("--submitter", choices=("groq", "local"), default="groq",
+                        help="groq: batch API; local: run requests immediately through the configured backends")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from .ai import GroqAIProcessor
+    ai_processor = GroqAIProcessor.from_config()
+    if args.submitter == "groq":
+        submitter = GroqBatchSubmitter()
+    else:
+        submitter = LocalBatchSubmitter(
+            lambda messages, **params: ai_processor.router.complete(messages, **params).content
+        )
+
+    backfill = Backfill(
+        BackfillState(args.state_dir),
+        submitter,
+        ai_processor=ai_processor,
+        batch_size=args.batch_size,
+        notion_concurrency=args.notion_concurrency,
+    )
+    summary = backfill.run(load_urls(args.source))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,78 @@ class Config:
     # Groq AI settings
     GROQ_API_KEY = os.getenv('GROQ_API_KEY')
     GROQ_MODEL = os.getenv('GROQ_MODEL')
+    GROQ_REQUESTS_PER_MINUTE = int(os.getenv('GROQ_REQUESTS_PER_MINUTE', '30'))
+    GROQ_TOKENS_PER_MINUTE = int(os.getenv('GROQ_TOKENS_PER_MINUTE', '8000'))
+    GROQ_MAX_RETRIES = int(os.getenv('GROQ_MAX_RETRIES', '5'))
+    GROQ_BACKOFF_BASE = float(os.getenv('GROQ_BACKOFF_BASE', '1.0'))
+    GROQ_BACKOFF_MAX = float(os.getenv('GROQ_BACKOFF_MAX', '60'))
+
+    # LLM backends: JSON list of {"name", "provider" (groq/openai), "model", "base_url",
+    # "api_key_env", "requests_per_minute", "tokens_per_minute", "params"}, tried in order
+    LLM_BACKENDS = os.getenv('LLM_BACKENDS')
+    LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '300'))
+    LLM_HEDGE_ENABLED = os.getenv('LLM_HEDGE_ENABLED', 'True').lower() == 'true'
+    LLM_HEDGE_QUANTILE = float(os.getenv('LLM_HEDGE_QUANTILE', '0.95'))
+    LLM_HEDGE_INITIAL_DELAY = float(os.getenv('LLM_HEDGE_INITIAL_DELAY', '90'))
+    LLM_HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', '5'))
+    LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '3'))
+    LLM_CIRCUIT_RESET_TIMEOUT = float(os.getenv('LLM_CIRCUIT_RESET_TIMEOUT', '120'))
+
+    # Analysis tiers: reports up to these word counts get low/medium reasoning, longer ones high
+    AI_LIGHT_MAX_WORDS = int(os.getenv('AI_LIGHT_MAX_WORDS', '300'))
+    AI_STANDARD_MAX_WORDS = int(os.getenv('AI_STANDARD_MAX_WORDS', '1200'))
+    AI_MAX_COMPLETION_TOKENS = int(os.getenv('AI_MAX_COMPLETION_TOKENS', '32768'))
+
+    # Rule-based extraction of tickers, price levels and percentages, passed to the prompt
+    MARKET_FACTS_ENABLED = os.getenv('MARKET_FACTS_ENABLED', 'True').lower() == 'true'
+
+    # Alias table mapping model output and report mentions to canonical tickers and sectors
+    SYMBOL_NORMALIZATION_ENABLED = os.getenv('SYMBOL_NORMALIZATION_ENABLED', 'True').lower() == 'true'
+    SYMBOLS_PATH = os.getenv('SYMBOLS_PATH', os.path.join(os.path.dirname(__file__), 'data', 'symbols.json'))
+
+    # Translation memory: previously translated sentences are reused instead of re-translated
+    TRANSLATION_MEMORY_ENABLED = os.getenv('TRANSLATION_MEMORY_ENABLED', 'True').lower() == 'true'
+    TRANSLATION_MEMORY_PATH = os.getenv('TRANSLATION_MEMORY_PATH', 'data/translation_memory.sqlite3')
+    
+    # Shared HTTP client for the Notion and Telegram APIs (keep-alive pools, retries)
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+    HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
     
     # Notion settings
     NOTION_API_KEY = os.getenv('NOTION_API_KEY')
     NOTION_DATABASE_ID = os.getenv('NOTION_DATABASE_ID')
+    # Point at a local stand-in (python -m benchmarks.fake_services) for load tests
+    NOTION_BASE_URL = os.getenv('NOTION_BASE_URL', 'https://api.notion.com/v1')
+    NOTION_APPEND_CONCURRENCY = int(os.getenv('NOTION_APPEND_CONCURRENCY', '3'))
+    # Process-wide limit for all Notion traffic; 429s are retried after Retry-After
+    NOTION_REQUESTS_PER_SECOND = float(os.getenv('NOTION_REQUESTS_PER_SECOND', '3'))
+    NOTION_BURST = int(os.getenv('NOTION_BURST', '3'))
+    NOTION_MAX_RETRIES = int(os.getenv('NOTION_MAX_RETRIES', '5'))
+    # Page properties are checked against the cached database schema before each write
+    NOTION_SCHEMA_VALIDATION_ENABLED = os.getenv('NOTION_SCHEMA_VALIDATION_ENABLED', 'True').lower() == 'true'
+    NOTION_SCHEMA_TTL = float(os.getenv('NOTION_SCHEMA_TTL', '3600'))
+    NOTION_CREATE_SELECT_OPTIONS = os.getenv('NOTION_CREATE_SELECT_OPTIONS', 'True').lower() == 'true'
+    # Upsert mode: a report whose source URL or text already has a page updates it in place
+    NOTION_UPSERT_ENABLED = os.getenv('NOTION_UPSERT_ENABLED', 'False').lower() == 'true'
+    NOTION_PAGE_INDEX_PATH = os.getenv('NOTION_PAGE_INDEX_PATH', 'data/notion_pages.json')
     
     # Telegram settings
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    # Report subscribers (comma-separated, defaults to TELEGRAM_CHAT_ID); errors go to TELEGRAM_CHAT_ID only
+    TELEGRAM_CHAT_IDS = [chat.strip() for chat in os.getenv('TELEGRAM_CHAT_IDS', TELEGRAM_CHAT_ID or '').split(',') if chat.strip()]
+    # Bot API limits: ~30 messages/s overall, 1/s per chat, 20/minute per group (negative chat ids)
+    TELEGRAM_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_MESSAGES_PER_SECOND', '30'))
+    TELEGRAM_CHAT_MESSAGES_PER_SECOND = float(os.getenv('TELEGRAM_CHAT_MESSAGES_PER_SECOND', '1'))
+    TELEGRAM_GROUP_MESSAGES_PER_MINUTE = float(os.getenv('TELEGRAM_GROUP_MESSAGES_PER_MINUTE', '20'))
+    TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+    TELEGRAM_SEND_CONCURRENCY = int(os.getenv('TELEGRAM_SEND_CONCURRENCY', '8'))
+    TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', 'https://api.telegram.org')
+    # MarkdownV2 or HTML; parts that Telegram can't parse are resent as plain text
+    TELEGRAM_PARSE_MODE = os.getenv('TELEGRAM_PARSE_MODE', 'MarkdownV2')
     
     # Email settings
     SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
@@ -30,11 +94,69 @@ class Config:
     EMAIL_ADDRESS = os.getenv('EMAIL_ADDRESS')
     EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
     RECIPIENT_EMAIL = os.getenv('RECIPIENT_EMAIL')
+    # Report subscribers (comma-separated, defaults to RECIPIENT_EMAIL), sent as Bcc in batches per SMTP transaction
+    RECIPIENT_EMAILS = [email.strip() for email in os.getenv('RECIPIENT_EMAILS', RECIPIENT_EMAIL or '').split(',') if email.strip()]
+    SMTP_MAX_RECIPIENTS = int(os.getenv('SMTP_MAX_RECIPIENTS', '50'))
+    # Authenticated SMTP sessions are pooled; one idle for SMTP_NOOP_AFTER seconds is checked with NOOP
+    SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', '2'))
+    SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+    SMTP_NOOP_AFTER = float(os.getenv('SMTP_NOOP_AFTER', '30'))
+    SMTP_MAX_IDLE = float(os.getenv('SMTP_MAX_IDLE', '240'))
+    # Report emails are sent on background threads instead of the request thread
+    EMAIL_BACKGROUND_ENABLED = os.getenv('EMAIL_BACKGROUND_ENABLED', 'True').lower() == 'true'
+    EMAIL_SEND_WORKERS = int(os.getenv('EMAIL_SEND_WORKERS', '2'))
+    
+    # HTML parser backend: html.parser, lxml or selectolax (optional package)
+    HTML_PARSER = os.getenv('HTML_PARSER', 'lxml')
+    
+    # Optional process pool for CPU-bound parsing and rendering; smaller inputs stay inline
+    CPU_POOL_ENABLED = os.getenv('CPU_POOL_ENABLED', 'False').lower() == 'true'
+    CPU_POOL_WORKERS = int(os.getenv('CPU_POOL_WORKERS', '0'))  # 0 = one per CPU
+    CPU_POOL_INLINE_THRESHOLD = int(os.getenv('CPU_POOL_INLINE_THRESHOLD', '200000'))
+    CPU_POOL_TIMEOUT = float(os.getenv('CPU_POOL_TIMEOUT', '60'))
+    CPU_POOL_START_METHOD = os.getenv('CPU_POOL_START_METHOD', 'fork' if os.name == 'posix' else 'spawn')
     
     # Scraping settings
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     REQUEST_TIMEOUT = 60
     MAX_RETRIES = 3
     
+    # Report images: fetched concurrently with the AI step, de-duplicated and cached on disk
+    ASSET_PIPELINE_ENABLED = os.getenv('ASSET_PIPELINE_ENABLED', 'True').lower() == 'true'
+    ASSET_CACHE_DIR = os.getenv('ASSET_CACHE_DIR', 'data/assets')
+    ASSET_CACHE_MAX_MB = int(os.getenv('ASSET_CACHE_MAX_MB', '500'))
+    ASSET_MAX_IMAGE_MB = int(os.getenv('ASSET_MAX_IMAGE_MB', '10'))
+    ASSET_FETCH_CONCURRENCY = int(os.getenv('ASSET_FETCH_CONCURRENCY', '6'))
+    ASSET_FETCH_TIMEOUT = float(os.getenv('ASSET_FETCH_TIMEOUT', '15'))
+    # How long the webhook waits for the whole asset step before using the raw image URLs
+    ASSET_PIPELINE_TIMEOUT = float(os.getenv('ASSET_PIPELINE_TIMEOUT', '45'))
+    
+    # Report bodies larger than this are kept on disk and referenced from the summary
+    BODY_STORE_DIR = os.getenv('BODY_STORE_DIR', 'data/bodies')
+    BODY_INLINE_MAX_CHARS = int(os.getenv('BODY_INLINE_MAX_CHARS', '200000'))
+    BODY_STORE_MAX_MB = int(os.getenv('BODY_STORE_MAX_MB', '200'))
+    
+    # Report links in emails: click-tracking redirects are followed once and cached
+    LINK_RESOLVE_REDIRECTS = os.getenv('LINK_RESOLVE_REDIRECTS', 'True').lower() == 'true'
+    LINK_RESOLVE_TIMEOUT = float(os.getenv('LINK_RESOLVE_TIMEOUT', '5'))
+    LINK_CACHE_PATH = os.getenv('LINK_CACHE_PATH', 'data/link_cache.json')
+    
+    # LLM token usage accounting
+    USAGE_TRACKING_ENABLED = os.getenv('USAGE_TRACKING_ENABLED', 'True').lower() == 'true'
+    USAGE_DB_PATH = os.getenv('USAGE_DB_PATH', 'data/usage.sqlite3')
+    
+    # Near-duplicate reports reuse the previous analysis
+    DUPLICATE_DETECTION_ENABLED = os.getenv('DUPLICATE_DETECTION_ENABLED', 'True').lower() == 'true'
+    DUPLICATE_INDEX_PATH = os.getenv('DUPLICATE_INDEX_PATH', 'data/similarity_index.json')
+    DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', '0.9'))
+    # Shorter texts (empty or failed scrapes) are never matched or indexed
+    DUPLICATE_MIN_SHINGLES = int(os.getenv('DUPLICATE_MIN_SHINGLES', '20'))
+    
+    # Backfill (python -m app.backfill)
+    BACKFILL_STATE_DIR = os.getenv('BACKFILL_STATE_DIR', 'data/backfill')
+    BACKFILL_BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', '25'))
+    BACKFILL_NOTION_CONCURRENCY = int(os.getenv('BACKFILL_NOTION_CONCURRENCY', '3'))
+    BACKFILL_POLL_INTERVAL = float(os.getenv('BACKFILL_POLL_INTERVAL', '30'))
+    
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
\ No newline at end of file
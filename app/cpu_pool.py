@@ -0,0 +1,109 @@
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def payload_size(value: Any) -> int:
+    """Rough size of a task's input in characters; BodyStore references count as their text"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        if "body_ref" in value:
+            return value.get("chars", 0)
+        return sum(payload_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    return 0
+
+
+def _warm_worker() -> int:
+    # Runs once per worker at start-up so the first real task doesn't pay for imports
+    import app.extractor  # noqa: F401
+    import app.report_document  # noqa: F401
+    return multiprocessing.current_process().pid
+
+
+class CPUPool:
+    """
+    Optional process pool for CPU-bound steps (HTML cleaning, html2text, Notion
+    blocks, email rendering) so they don't hold the GIL on request threads.
+    Inputs below `inline_threshold` characters, or any input while the pool is
+    disabled, run inline; task functions and their arguments must be picklable.
+    """
+
+    def __init__(self, enabled: bool = None, max_workers: int = None, inline_threshold: int = None,
+                 timeout: float = None, start_method: str = None):
+        self.enabled = Config.CPU_POOL_ENABLED if enabled is None else enabled
+        self.max_workers = max_workers or Config.CPU_POOL_WORKERS or multiprocessing.cpu_count()
+        self.inline_threshold = Config.CPU_POOL_INLINE_THRESHOLD if inline_threshold is None else inline_threshold
+        self.timeout = timeout or Config.CPU_POOL_TIMEOUT
+        self.start_method = start_method or Config.CPU_POOL_START_METHOD
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._timings = {"inline": deque(maxlen=500), "pool": deque(maxlen=500)}
+
+    def start(self):
+        """Create the pool and start every worker now rather than on the first request"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                futures = [self._executor.submit(_warm_worker) for _ in range(self.max_workers)]
+                pids = {future.result() for future in futures}
+                logger.info(f"CPU pool started with {len(pids)} {self.start_method} workers")
+
+    def run(self, func: Callable, size: int, *args, **kwargs):
+        """Run func(*args, **kwargs) in the pool when `size` is worth the inter-process copy, else inline"""
+        started = time.perf_counter()
+        if not self.enabled or size < self.inline_threshold:
+            result = func(*args, **kwargs)
+            self._record("inline", func, size, started)
+            return result
+
+        if self._executor is None:
+            self.start()
+        try:
+            result = self._executor.submit(func, *args, **kwargs).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            logger.error(f"CPU pool broke while running {func.__name__}, restarting it and running inline")
+            with self._lock:
+                self._executor = None
+            result = func(*args, **kwargs)
+        self._record("pool", func, size, started)
+        return result
+
+    def _record(self, mode: str, func: Callable, size: int, started: float):
+        elapsed = time.perf_counter() - started
+        self._timings[mode].append((func.__name__, size, elapsed))
+        if mode == "pool":
+            logger.debug(f"{func.__name__} ({size} chars) ran in the CPU pool in {elapsed * 1000:.0f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"enabled": self.enabled, "workers": self.max_workers, "inline_threshold": self.inline_threshold}
+        for mode, samples in self._timings.items():
+            samples = list(samples)
+            stats[mode] = {
+                "count": len(samples),
+                "avg_ms": round(sum(sample[2] for sample in samples) / len(samples) * 1000, 1) if samples else None,
+            }
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+cpu_pool = CPUPool()
@@ -1,33 +1,196 @@
 import logging
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional
 from datetime import datetime
+from .cpu_pool import cpu_pool
+from .html_stream import BodyStore
+from .links import LinkExtractor
+from .parsing import get_html_backend
 
 
 logger = logging.getLogger(__name__)
 
+# Level keywords (English and Spanish) and the kind of level they introduce
+_LEVEL_KINDS = {
+    "support": "support", "supports": "support", "soporte": "support", "soportes": "support",
+    "resistance": "resistance", "resistances": "resistance", "resistencia": "resistance", "resistencias": "resistance",
+    "target": "target", "targets": "target", "objetivo": "target", "objetivos": "target",
+    "stop": "stop", "stop-loss": "stop", "stops": "stop",
+    "level": "level", "levels": "level", "nivel": "level", "niveles": "level",
+    "pivot": "level", "zone": "level", "zona": "level",
+}
+_LEVEL_KEYWORD = re.compile(r"\b(" + "|".join(sorted(map(re.escape, _LEVEL_KINDS), key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_NUMBER = re.compile(r"(?<![\w.,])\$?(\d{1,3}(?:[.,]\d{3})+(?:[.,]\d+)?|\d+(?:[.,]\d+)?)(?![\d%])(?!\s?%)")
+_PERCENTAGE = re.compile(r"(?<![\w.,])([+\-−]?\d+(?:[.,]\d+)?)\s?%")
+_SENTENCE_END = re.compile(r"[.;!?\n](?:\s|$)")
+
+# Cashtags ($AAPL), exchange prefixes (NASDAQ:AAPL) and tickers in parentheses ("Apple (AAPL)")
+_TICKER = re.compile(
+    r"\$([A-Z]{1,5}(?:\.[A-Z])?)\b"
+    r"|\b(?:NASDAQ|NYSE|AMEX|BME|LSE)\s?:\s?([A-Z]{1,5}(?:\.[A-Z])?)\b"
+    r"|\(([A-Z]{1,5}(?:\.[A-Z])?)\)"
+)
+# Upper-case abbreviations that show up in parentheses but are not tickers
+_NOT_TICKERS = {
+    "AI", "IA", "BCE", "BOE", "BOJ", "CEO", "CFO", "CPI", "ECB", "EEUU", "EPS", "ETF", "EU", "EUR", "FED",
+    "FOMC", "GDP", "IPC", "IPO", "OPEC", "OPEP", "PCE", "PIB", "PMI", "QOQ", "UE", "UK", "US", "USA", "USD", "YOY",
+}
+_INDICES = [
+    ("S&P 500", r"S\s?&\s?P\s?500|SPX"),
+    ("Nasdaq 100", r"Nasdaq[\s-]?100|NDX"),
+    ("Nasdaq", r"Nasdaq(?:\s+Composite)?"),
+    ("Dow Jones", r"Dow\s+Jones|DJIA"),
+    ("Russell 2000", r"Russell\s?2000|RUT"),
+    ("VIX", r"VIX"),
+    ("DAX", r"DAX(?:\s?40)?"),
+    ("IBEX 35", r"IBEX(?:\s?35)?"),
+    ("Euro Stoxx 50", r"Euro\s?Stoxx(?:\s?50)?"),
+    ("FTSE 100", r"FTSE(?:\s?100)?"),
+    ("CAC 40", r"CAC\s?40"),
+    ("Nikkei 225", r"Nikkei(?:\s?225)?"),
+]
+_INDEX = re.compile("|".join(f"(?P<i{n}>\\b(?:{pattern})\\b)" for n, (_, pattern) in enumerate(_INDICES)), re.IGNORECASE)
+
+
+def _parse_number(text: str) -> Optional[float]:
+    """Parse 4,520.50 / 4.520,50 / 4.520 / 1.5 into a float"""
+    text = text.lstrip("$")
+    if "," in text and "." in text:
+        decimal = "," if text.rfind(",") > text.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        text = text.replace(thousands, "").replace(decimal, ".")
+    elif "," in text or "." in text:
+        separator = "," if "," in text else "."
+        head, _, tail = text.rpartition(separator)
+        if text.count(separator) > 1 or len(tail) == 3:
+            text = text.replace(separator, "")
+        else:
+            text = f"{head.replace(separator, '')}.{tail}"
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _sentence_around(text: str, start: int, end: int, limit: int = 160) -> str:
+    """The sentence containing text[start:end], clipped to `limit` characters"""
+    before = text.rfind("\n", max(0, start - limit), start)
+    for match in _SENTENCE_END.finditer(text, max(0, start - limit), start):
+        before = max(before, match.end() - 1)
+    after = _SENTENCE_END.search(text, end, end + limit)
+    snippet = text[before + 1:after.start() + 1 if after else end + limit]
+    return " ".join(snippet.split())[:limit]
+
+
+def extract_market_facts(text: str, max_items: int = 20, symbols=None) -> Dict[str, Any]:
+    """
+    Rule-based pass over the report for tickers, index names, price levels
+    (support/resistance/target/stop with their numbers) and percentages.
+    With a SymbolIndex, company names and sectors mentioned in the text are added too.
+    """
+    text = text or ""
+
+    tickers = []
+    for match in _TICKER.finditer(text):
+        ticker = next(group for group in match.groups() if group)
+        if ticker not in _NOT_TICKERS and ticker not in tickers:
+            tickers.append(ticker)
+
+    indices = []
+    for match in _INDEX.finditer(text):
+        name = _INDICES[int(match.lastgroup[1:])][0]
+        if name not in indices:
+            indices.append(name)
+
+    levels, seen_levels = [], set()
+    for match in _LEVEL_KEYWORD.finditer(text):
+        kind = _LEVEL_KINDS[match.group(1).lower()]
+        sentence_end = _SENTENCE_END.search(text, match.end(), match.end() + 80)
+        window_end = sentence_end.start() if sentence_end else match.end() + 80
+        for number in _NUMBER.finditer(text, match.end(), window_end):
+            value = _parse_number(number.group(1))
+            if value is None or (kind, value) in seen_levels:
+                continue
+            seen_levels.add((kind, value))
+            levels.append({
+                "kind": kind,
+                "value": value,
+                "text": number.group(0),
+                "context": _sentence_around(text, match.start(), number.end()),
+            })
+
+    percentages = []
+    for match in _PERCENTAGE.finditer(text):
+        value = _parse_number(match.group(1).replace("−", "-").lstrip("+-"))
+        if value is None:
+            continue
+        if match.group(1)[0] in "-−":
+            value = -value
+        percentages.append({
+            "value": value,
+            "text": match.group(0),
+            "context": _sentence_around(text, match.start(), match.end()),
+        })
+
+    sectors = []
+    if symbols is not None:
+        mentions = symbols.scan(text)
+        tickers = [symbols.normalize_stock(ticker) or ticker for ticker in tickers]
+        tickers = list(dict.fromkeys(tickers + mentions["stocks"]))
+        tickers = [ticker for ticker in tickers if ticker not in indices]
+        sectors = mentions["sectors"]
+
+    return {
+        "tickers": tickers[:max_items],
+        "indices": indices,
+        "sectors": sectors[:max_items],
+        "levels": levels[:max_items],
+        "percentages": percentages[:max_items],
+    }
+
+
+def format_market_facts(facts: Dict[str, Any], context_chars: int = 80) -> str:
+    """Compact text block of extracted facts for the prompt; empty when nothing was found"""
+    lines = []
+    if facts.get("tickers"):
+        lines.append(f"Tickers: {', '.join(facts['tickers'])}")
+    if facts.get("indices"):
+        lines.append(f"Indices: {', '.join(facts['indices'])}")
+    if facts.get("sectors"):
+        lines.append(f"Sectors: {', '.join(facts['sectors'])}")
+    # Levels quoted in the same sentence share one line
+    grouped: Dict[tuple, List[str]] = {}
+    for level in facts.get("levels", []):
+        grouped.setdefault((level["kind"], level["context"]), []).append(level["text"])
+    for (kind, context), values in grouped.items():
+        lines.append(f"Level ({kind}): {', '.join(values)} | {context[:context_chars]}")
+    for percentage in facts.get("percentages", []):
+        lines.append(f"Change: {percentage['text']} | {percentage['context'][:context_chars]}")
+    return "\n".join(lines)
+
 class ContentExtractor:
-    def extract_urls_from_email(self, email_content: str) -> List[str]:
-        """Extract URLs from email HTML content that match specific domain and path"""
-        soup = BeautifulSoup(email_content, "html.parser")
-        urls = []
+    def __init__(self, link_extractor: Optional[LinkExtractor] = None, body_store: Optional[BodyStore] = None):
+        self._link_extractor = link_extractor
+        self.body_store = body_store or BodyStore()
 
-        for link in soup.find_all("a", href=True):
-            href = link["href"]
-            parsed = urlparse(href)
+    @property
+    def link_extractor(self) -> LinkExtractor:
+        if self._link_extractor is None:
+            self._link_extractor = LinkExtractor()
+        return self._link_extractor
 
-            # Only allow links from protradingskills.com with path starting with /analysis
-            if parsed.netloc.lower() == "protradingskills.com" and parsed.path.startswith("/analysis"):
-                urls.append(href)
+    def extract_urls_from_email(self, email_content: str) -> List[str]:
+        """Extract protradingskills.com/analysis URLs from email HTML or plain text"""
+        urls = self.link_extractor.extract(email_content)
 
         logger.info(f"Extracted urls: {len(urls)}")
         return urls
     
 
-    def create_summary_structure(self, scraped_report: str, ai_analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def create_summary_structure(self, scraped_report: str, ai_analysis: Dict[str, Any], cleaned_content: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """Create a structured summary combining extracted content and AI analysis"""
-        cleaned_content = self.clean_html_content(scraped_report)
+        if cleaned_content is None:
+            cleaned_content = self.clean_html_content(scraped_report)
         
         return {
             'metadata': {
@@ -36,10 +199,13 @@ class ContentExtractor:
                 'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')  
             },
             'content': {
-                'original_text': cleaned_content['main_content'],
+                # Large bodies are stored once and referenced; read them with read_body()
+                'original_text': self.body_store.put(cleaned_content['main_content']),
                 'translated_content': ai_analysis.get('translated_content', ''),
-                'original_html': scraped_report.get('html_content', ''),
-                'report_images': scraped_report.get('report_images')
+                'original_html': self.body_store.put(scraped_report.get('html_content', '')),
+                'report_images': scraped_report.get('report_images'),
+                'report_assets': scraped_report.get('report_assets'),
+                'inline_images': scraped_report.get('inline_images')
             },
             'analysis': {
                 'summary': ai_analysis.get('summary', ''),
@@ -54,16 +220,21 @@ class ContentExtractor:
     
     def clean_html_content(self, report: dict) -> dict:
         """Clean HTML content and prepare structured data from the scraped report"""
-
-        title = report.get("title") or ""
         html_content = report.get("html_content") or ""
-        
-        # Strip HTML tags
-        soup = BeautifulSoup(html_content, "html.parser")
-        text = soup.get_text(separator="\n", strip=True)
+        # Large reports are parsed in the CPU pool (when enabled) to keep the GIL free
+        return cpu_pool.run(clean_html, len(html_content), report.get("title") or "", html_content)
 
-        return {
-            "title": title.strip(),
-            "main_content": text,
-            "word_count": len(text.split())
-        }
\ No newline at end of file
+
+def clean_html(title: str, html_content: str) -> dict:
+    """Strip HTML tags with an event-based parse instead of building a tree"""
+    pieces = []
+    word_count = 0
+    for piece in get_html_backend().iter_text(html_content):
+        pieces.append(piece)
+        word_count += len(piece.split())
+
+    return {
+        "title": title.strip(),
+        "main_content": "\n".join(pieces),
+        "word_count": word_count
+    }
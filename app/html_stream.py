@@ -0,0 +1,190 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Inline images in attribute values: src="data:image/png;base64,...."
+_DATA_URI = re.compile(r"data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)", re.IGNORECASE)
+_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/jpg": "jpg", "image/gif": "gif", "image/webp": "webp", "image/svg+xml": "svg"}
+
+# Elements whose text is not part of the report (BeautifulSoup's get_text skips them too)
+_SKIPPED = {"script", "style"}
+
+CHUNK_SIZE = 64 * 1024
+
+
+def externalize_data_uris(html: str, directory: str = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Move base64 data-URI images out of the HTML into content-addressed files.
+    Each one is replaced by a `cid:` reference, so emails can attach it inline.
+    """
+    directory = directory or os.path.join(Config.ASSET_CACHE_DIR, "inline")
+    images: Dict[str, Dict[str, Any]] = {}
+    pieces, position = [], 0
+
+    for match in _DATA_URI.finditer(html or ""):
+        try:
+            data = base64.b64decode("".join(match.group(2).split()), validate=True)
+        except (binascii.Error, ValueError):
+            continue
+        digest = hashlib.sha256(data).hexdigest()
+        content_id = f"inline-{digest[:16]}"
+        if content_id not in images:
+            path = os.path.join(directory, f"{digest}.{_EXTENSIONS.get(match.group(1).lower(), 'bin')}")
+            if not os.path.exists(path):
+                os.makedirs(directory, exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+            else:
+                # Recently used, so the asset cache evicts it last
+                os.utime(path)
+            images[content_id] = {"cid": content_id, "path": path, "mime_type": match.group(1).lower(), "size": len(data)}
+        pieces.append(html[position:match.start()])
+        pieces.append(f"cid:{content_id}")
+        position = match.end()
+
+    if not images:
+        return html, []
+    pieces.append(html[position:])
+    logger.info(f"Externalized {len(images)} inline images ({sum(image['size'] for image in images.values())} bytes)")
+    return "".join(pieces), list(images.values())
+
+
+class _TextCollector(HTMLParser):
+    """Event-based HTML parser that queues each non-empty text node"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pending: List[str] = []
+        self._skip_depth = 0
+        # A text node can arrive in several pieces when it spans chunks
+        self._text: List[str] = []
+
+    def flush(self):
+        if self._text:
+            text = "".join(self._text).strip()
+            self._text = []
+            if text and not self._skip_depth:
+                self.pending.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self.flush()
+        if tag in _SKIPPED:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.flush()
+
+    def handle_endtag(self, tag):
+        self.flush()
+        if tag in _SKIPPED and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def handle_data(self, data):
+        self._text.append(data)
+
+
+def iter_html_text(source: Union[str, Iterable[str]], chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Yield the text nodes of an HTML document (or of an iterable of HTML chunks) as they are parsed,
+    without building a tree. Equivalent to BeautifulSoup's get_text(separator="\\n", strip=True) pieces.
+    """
+    if isinstance(source, str):
+        html = source
+        chunks = (html[start:start + chunk_size] for start in range(0, len(html), chunk_size))
+    else:
+        chunks = source
+
+    parser = _TextCollector()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.pending:
+            yield from parser.pending
+            parser.pending = []
+    parser.close()
+    parser.flush()
+    yield from parser.pending
+
+
+class BodyStore:
+    """
+    Report bodies above `inline_limit` characters are written once to disk
+    (content-addressed) and summaries carry a small reference instead of the text.
+    The least recently written bodies are removed once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str = None, inline_limit: int = None, max_bytes: int = None):
+        self.directory = directory or Config.BODY_STORE_DIR
+        self.inline_limit = inline_limit if inline_limit is not None else Config.BODY_INLINE_MAX_CHARS
+        self.max_bytes = max_bytes if max_bytes is not None else Config.BODY_STORE_MAX_MB * 1024 * 1024
+
+    def put(self, text: Optional[str]) -> Union[str, Dict[str, Any]]:
+        text = text or ""
+        if len(text) <= self.inline_limit:
+            return text
+        encoded = text.encode("utf-8")
+        digest = hashlib.sha256(encoded).hexdigest()
+        path = os.path.join(self.directory, f"{digest}.txt")
+        if not os.path.exists(path):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, path)
+            self._evict(keep=path)
+        else:
+            os.utime(path)
+        return {"body_ref": digest, "path": path, "chars": len(text)}
+
+    def _evict(self, keep: str):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".txt") and path != keep:
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = os.path.getsize(keep) + sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} stored report bodies")
+
+
+def read_body(value: Union[None, str, Dict[str, Any]], limit: int = None) -> str:
+    """Text of a summary body, whether it is inline or a BodyStore reference; `limit` caps the characters read"""
+    if not value:
+        return ""
+    if isinstance(value, str):
+        return value if limit is None else value[:limit]
+    try:
+        with open(value["path"], encoding="utf-8") as f:
+            return f.read() if limit is None else f.read(limit)
+    except (OSError, KeyError) as e:
+        logger.error(f"Could not read report body {value}: {e}")
+        return ""
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Idempotent methods are retried on these statuses; POST/PATCH only when the connection never opened
+_RETRY_STATUSES = (500, 502, 503, 504)
+
+# on_request hooks receive (method, url, status or None, seconds, error or None)
+RequestHook = Callable[[str, str, Optional[int], float, Optional[Exception]], None]
+
+
+class HTTPClient:
+    """
+    Shared requests.Session for API calls: keep-alive connection pools per host,
+    (connect, read) timeouts, urllib3 retries and per-host timing.
+    """
+
+    def __init__(self, pool_maxsize: int = None, connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, backoff_factor: float = None):
+        self.timeout = (
+            connect_timeout or Config.HTTP_CONNECT_TIMEOUT,
+            read_timeout or Config.HTTP_READ_TIMEOUT,
+        )
+        retries = Retry(
+            total=Config.HTTP_MAX_RETRIES if max_retries is None else max_retries,
+            backoff_factor=Config.HTTP_BACKOFF_FACTOR if backoff_factor is None else backoff_factor,
+            status_forcelist=_RETRY_STATUSES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        pool_maxsize = pool_maxsize or Config.HTTP_POOL_MAXSIZE
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize, max_retries=retries)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.hooks: List[RequestHook] = []
+        self._lock = threading.Lock()
+        self._timings: Dict[str, deque] = defaultdict(lambda: deque(maxlen=500))
+        self._errors: Dict[str, int] = defaultdict(int)
+
+    def add_hook(self, hook: RequestHook):
+        self.hooks.append(hook)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request over the pooled session; connection errors raise after the retries are used up"""
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        response, error = None, None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            return response
+        except requests.RequestException as e:
+            error = e
+            raise
+        finally:
+            self._record(method, url, response.status_code if response is not None else None,
+                         time.perf_counter() - started, error)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def _record(self, method: str, url: str, status: Optional[int], elapsed: float, error: Optional[Exception]):
+        host = urlparse(url).netloc
+        with self._lock:
+            self._timings[host].append(elapsed)
+            if error is not None or (status or 0) >= 500:
+                self._errors[host] += 1
+        logger.debug(f"{method} {host} -> {status or type(error).__name__} in {elapsed * 1000:.0f} ms")
+        for hook in self.hooks:
+            try:
+                hook(method, url, status, elapsed, error)
+            except Exception as e:
+                logger.error(f"HTTP timing hook failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Request count, errors and latency (ms) per host over the recent window"""
+        with self._lock:
+            hosts = {host: sorted(samples) for host, samples in self._timings.items()}
+            errors = dict(self._errors)
+        return {
+            host: {
+                "requests": len(samples),
+                "errors": errors.get(host, 0),
+                "avg_ms": round(sum(samples) / len(samples) * 1000, 1),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+            }
+            for host, samples in hosts.items() if samples
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_default_client: Optional[HTTPClient] = None
+_default_lock = threading.Lock()
+
+
+def get_http_client() -> HTTPClient:
+    """Process-wide client shared by the Notion and Telegram integrations"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HTTPClient()
+        return _default_client
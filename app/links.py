@@ -0,0 +1,209 @@
+import html
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlunparse
+
+import requests
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Absolute URLs in HTML attributes or plain text; quotes, brackets and whitespace end a URL
+_URL = re.compile(r"""(?:https?://|www\.)[^\s<>"'`\[\]{}|\\^]+""", re.IGNORECASE)
+_TRAILING = ".,;:!?)*"
+
+# Query parameters that marketing emails commonly append to links
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|mc_cid|mc_eid|fbclid|gclid|_hsenc|_hsmi|mkt_tok)$", re.IGNORECASE)
+
+# Query parameters a click-tracking redirect may carry its target in
+_TARGET_PARAMS = ("url", "u", "target", "redirect", "redirect_url", "dest", "destination", "link", "q")
+
+# Hosts of click-tracking services; their links are resolved by following the redirect
+_TRACKER_HOSTS = (
+    "list-manage.com", "sendgrid.net", "mandrillapp.com", "mailgun.org", "hubspotlinks.com",
+    "hs-sites.com", "mailchi.mp", "rs6.net", "convertkit-mail.com", "ck.page", "substack.com",
+    "beehiiv.com", "mailerlite.com", "activehosted.com", "klclick.com", "lt.acemlnb.com",
+)
+# Only unambiguous subdomains: every match costs a HEAD request to a host taken from the email
+_TRACKER_PREFIXES = ("click.", "clicks.", "links.", "track.", "tracking.")
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form for comparison: lower-case host without www, no tracking params or fragment"""
+    url = html.unescape(url.strip())
+    if url.lower().startswith("www."):
+        url = f"https://{url}"
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parsed.port and parsed.port not in (80, 443):
+        host = f"{host}:{parsed.port}"
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _TRACKING_PARAMS.match(key)
+    ])
+    return urlunparse((parsed.scheme.lower() or "https", host, parsed.path or "/", parsed.params, query, ""))
+
+
+def scan_urls(content: str) -> Iterable[str]:
+    """Yield absolute URLs found in HTML or plain text, in order of appearance"""
+    for match in _URL.finditer(content or ""):
+        url = match.group(0).rstrip(_TRAILING)
+        if "&" in url:
+            url = html.unescape(url)
+        yield url
+
+
+def embedded_target(url: str) -> Optional[str]:
+    """Target URL carried in a redirect's query string (e.g. ?u=https%3A%2F%2F...), if any"""
+    tail = url[8:].lower()
+    if "http" not in tail:
+        return None
+    for key, value in parse_qsl(urlparse(url).query):
+        if key.lower() in _TARGET_PARAMS:
+            value = unquote(value)
+            if value.lower().startswith(("http://", "https://")):
+                return value
+    return None
+
+
+def is_tracking_host(host: str) -> bool:
+    host = (host or "").lower()
+    return host.endswith(_TRACKER_HOSTS) or host.startswith(_TRACKER_PREFIXES)
+
+
+class RedirectCache:
+    """Resolved click-tracking redirects, persisted to a JSON file"""
+
+    def __init__(self, path: str = None):
+        # An empty path keeps the cache in memory only
+        self.path = Config.LINK_CACHE_PATH if path is None else path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Optional[str]] = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load link cache {self.path}: {e}")
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def get(self, url: str) -> Optional[str]:
+        return self.entries.get(url)
+
+    def update(self, resolved: Dict[str, Optional[str]]):
+        if not resolved:
+            return
+        with self._lock:
+            self.entries.update(resolved)
+            if not self.path:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+
+class LinkExtractor:
+    """
+    Finds report links in email HTML or plain text with a single regex scan,
+    unwrapping click-tracking redirects (from the query string, or by following
+    the redirect once and caching the result) and de-duplicating normalized URLs.
+    Redirects are only followed when the email has no direct report link.
+    """
+
+    def __init__(
+        self,
+        host: str = "protradingskills.com",
+        path_prefix: str = "/analysis",
+        cache: RedirectCache = None,
+        resolve_redirects: bool = None,
+        timeout: float = None,
+        max_workers: int = 8,
+        session: requests.Session = None,
+    ):
+        self.host = host
+        self.path_prefix = path_prefix
+        self.cache = cache if cache is not None else RedirectCache()
+        self.resolve_redirects = Config.LINK_RESOLVE_REDIRECTS if resolve_redirects is None else resolve_redirects
+        self.timeout = timeout or Config.LINK_RESOLVE_TIMEOUT
+        self.max_workers = max_workers
+        self.session = session or requests.Session()
+
+    def extract(self, content: str) -> List[str]:
+        matches, unresolved = [], []
+        for url in scan_urls(content):
+            url = self._unwrap(url)
+            if self._matches(url):
+                matches.append(url)
+            elif self.resolve_redirects and is_tracking_host(urlparse(url).hostname):
+                unresolved.append(url)
+                matches.append(url)
+
+        # Only go to the network when the email has no direct report link
+        if unresolved and len(unresolved) == len(matches):
+            resolved = self._resolve_all(dict.fromkeys(unresolved))
+            matches = [resolved.get(url, url) for url in matches]
+
+        seen, urls = set(), []
+        for url in matches:
+            if not url or not self._matches(url):
+                continue
+            url = normalize_url(url)
+            if url not in seen:
+                seen.add(url)
+                urls.append(url)
+        return urls
+
+    def _matches(self, url: str) -> bool:
+        parsed = urlparse(url)
+        host = (parsed.hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        return host == self.host and parsed.path.startswith(self.path_prefix)
+
+    def _unwrap(self, url: str) -> str:
+        # Trackers sometimes nest (ESP → link shortener → site)
+        for _ in range(3):
+            target = embedded_target(url)
+            if not target:
+                break
+            url = target
+        return url
+
+    def _resolve_all(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        urls = list(urls)
+        resolved = {url: self.cache.get(url) for url in urls if url in self.cache}
+        pending = [url for url in urls if url not in resolved]
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+                fresh = dict(zip(pending, executor.map(self._resolve, pending)))
+            # Failures are not cached so they are retried with the next email
+            self.cache.update({url: target for url, target in fresh.items() if target})
+            resolved.update(fresh)
+        return resolved
+
+    def _resolve(self, url: str) -> Optional[str]:
+        """Final URL after following redirects, or None if it cannot be reached"""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in (405, 501):
+                # Some trackers only answer GET; don't download the body
+                response = self.session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+                response.close()
+            return self._unwrap(response.url)
+        except requests.RequestException as e:
+            logger.warning(f"Could not resolve tracking link {url}: {e}")
+            return None
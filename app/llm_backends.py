@@ -0,0 +1,425 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import groq
+import requests
+from groq import Groq
+
+from .config import Config
+from .rate_limit import RateLimitScheduler, parse_duration
+from .usage import usage_tracker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "openai/gpt-oss-120b"
+
+# One scheduler per backend name, shared by every router in the process
+_schedulers: Dict[str, RateLimitScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str, requests_per_minute: int, tokens_per_minute: int) -> RateLimitScheduler:
+    with _schedulers_lock:
+        if name not in _schedulers:
+            _schedulers[name] = RateLimitScheduler(
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                max_retries=Config.GROQ_MAX_RETRIES,
+                backoff_base=Config.GROQ_BACKOFF_BASE,
+                backoff_max=Config.GROQ_BACKOFF_MAX,
+            )
+        return _schedulers[name]
+
+
+@dataclass
+class CompletionResult:
+    content: str
+    backend: str
+    model: str
+    latency: float = 0.0
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+
+class BackendError(Exception):
+    """A failed completion call, normalised across providers"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, headers=None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.retryable = retryable
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        return parse_duration(self.headers.get("retry-after"))
+
+
+class CircuitBreaker:
+    """Stops routing to a backend after repeated failures, probing again after a cooldown"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 120.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def _expire_probe(self):
+        # A probe that never reported back counts as failed, so the breaker can probe again
+        if self.state == self.HALF_OPEN and self.clock() - self.probe_started_at >= self.reset_timeout:
+            self.state = self.OPEN
+            self.opened_at = self.probe_started_at
+
+    def available(self) -> bool:
+        """Whether allow() would let a call through, without claiming the probe"""
+        with self._lock:
+            self._expire_probe()
+            if self.state == self.OPEN:
+                return self.clock() - self.opened_at >= self.reset_timeout
+            return self.state == self.CLOSED
+
+    def allow(self) -> bool:
+        """Claim the right to call the backend; only call this right before calling it"""
+        with self._lock:
+            self._expire_probe()
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                # Let a single probe through
+                self.state = self.HALF_OPEN
+                self.probe_started_at = self.clock()
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+class LLMBackend:
+    """A model on a chat-completions endpoint, with its own rate limits, breaker and latency history"""
+
+    def __init__(
+        self,
+        name: str,
+        model: str,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        scheduler: Optional[RateLimitScheduler] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout: float = None,
+    ):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.params = params or {}
+        self.timeout = timeout or Config.LLM_REQUEST_TIMEOUT
+        self.scheduler = scheduler or get_scheduler(
+            name, Config.GROQ_REQUESTS_PER_MINUTE, Config.GROQ_TOKENS_PER_MINUTE
+        )
+        self.breaker = breaker or CircuitBreaker(
+            Config.LLM_CIRCUIT_FAILURE_THRESHOLD, Config.LLM_CIRCUIT_RESET_TIMEOUT
+        )
+        self.latencies = deque(maxlen=50)
+
+    def complete(self, messages: List[Dict[str, str]], **params) -> CompletionResult:
+        """Send a chat completion through the rate-limit scheduler, retrying 429/5xx with backoff"""
+        params = self._merge_params(params)
+        estimated_tokens = self._estimate_tokens(messages)
+
+        for attempt in range(self.scheduler.max_retries + 1):
+            self.scheduler.acquire(estimated_tokens)
+            started = time.monotonic()
+            try:
+                result, headers = self._send(messages, params)
+                self.scheduler.update_from_headers(headers)
+                result.latency = time.monotonic() - started
+                return result
+
+            except BackendError as e:
+                self.scheduler.update_from_headers(e.headers)
+                if not e.retryable or attempt == self.scheduler.max_retries:
+                    raise
+                if e.status_code == 429:
+                    self.scheduler.penalize(e.retry_after)
+                delay = self.scheduler.backoff_delay(attempt, e.retry_after)
+                logger.warning(f"{self.name}: {e}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+
+            time.sleep(delay)
+
+    def hedge_delay(self, quantile: float, initial: float, minimum: float) -> float:
+        """Delay before hedging this backend: the latency quantile once there is enough history"""
+        if len(self.latencies) < 5:
+            return initial
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(quantile * len(ordered)))
+        return max(minimum, ordered[index])
+
+    def _merge_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        merged = dict(params)
+        for key, value in self.params.items():
+            if value is None:
+                merged.pop(key, None)
+            else:
+                merged[key] = value
+        return merged
+
+    def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Rough prompt size (~4 characters per token); headers correct the bucket afterwards"""
+        return sum(len(message.get("content") or "") for message in messages) // 4
+
+    def _send(self, messages, params):
+        raise NotImplementedError
+
+
+class GroqBackend(LLMBackend):
+    """Backend using the Groq SDK"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = None
+
+    @property
+    def client(self) -> Groq:
+        if self._client is None:
+            # Retries are handled by the scheduler so they respect the shared limits
+            self._client = Groq(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                timeout=self.timeout,
+            )
+        return self._client
+
+    def _send(self, messages, params):
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                model=self.model, messages=messages, **params
+            )
+            response = raw.parse()
+        except groq.APIStatusError as e:
+            raise BackendError(
+                f"Groq returned {e.status_code}",
+                status_code=e.status_code,
+                headers=e.response.headers,
+                retryable=e.status_code == 429 or e.status_code >= 500,
+            ) from e
+        except groq.APIConnectionError as e:
+            raise BackendError(f"Groq connection error: {e}", retryable=True) from e
+
+        content = response.choices[0].message.content if response.choices else ""
+        usage = response.usage.model_dump() if response.usage else {}
+        return CompletionResult(content or "", self.name, self.model, usage=usage), raw.headers
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Backend for any endpoint implementing POST {base_url}/chat/completions"""
+
+    def _send(self, messages, params):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        try:
+            response = requests.post(
+                f"{self.base_url.rstrip('/')}/chat/completions",
+                headers=headers,
+                json={"model": self.model, "messages": messages, **params},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise BackendError(f"Connection error: {e}", retryable=True) from e
+
+        if response.status_code != 200:
+            raise BackendError(
+                f"API error: {response.status_code}",
+                status_code=response.status_code,
+                headers=response.headers,
+                retryable=response.status_code == 429 or response.status_code >= 500,
+            )
+
+        data = response.json()
+        choices = data.get("choices") or [{}]
+        content = (choices[0].get("message") or {}).get("content") or ""
+        return CompletionResult(content, self.name, self.model, usage=data.get("usage") or {}), response.headers
+
+
+def build_backend(spec: Dict[str, Any]) -> LLMBackend:
+    """Create a backend from an LLM_BACKENDS entry"""
+    provider = spec.get("provider", "groq")
+    model = spec.get("model") or DEFAULT_MODEL
+    name = spec.get("name") or f"{provider}:{model}"
+    api_key = os.getenv(spec["api_key_env"]) if spec.get("api_key_env") else spec.get("api_key")
+    scheduler = get_scheduler(
+        name,
+        spec.get("requests_per_minute", Config.GROQ_REQUESTS_PER_MINUTE),
+        spec.get("tokens_per_minute", Config.GROQ_TOKENS_PER_MINUTE),
+    )
+
+    backend_class = GroqBackend if provider == "groq" else OpenAICompatibleBackend
+    if provider == "groq":
+        api_key = api_key or Config.GROQ_API_KEY
+    elif not spec.get("base_url"):
+        raise ValueError(f"Backend {name} needs a base_url")
+
+    return backend_class(
+        name,
+        model,
+        api_key=api_key,
+        base_url=spec.get("base_url"),
+        params=spec.get("params"),
+        scheduler=scheduler,
+        timeout=spec.get("timeout"),
+    )
+
+
+class LLMRouter:
+    """
+    Routes completions over an ordered list of backends.
+
+    The first healthy backend gets the request; if it has not answered
+    within its latency quantile, the next one is hedged in and whichever
+    valid response arrives first wins. Failed or invalid responses fail
+    over to the next backend and count against its circuit breaker.
+    """
+
+    def __init__(
+        self,
+        backends: List[LLMBackend],
+        hedge: bool = True,
+        hedge_quantile: float = 0.95,
+        hedge_initial_delay: float = 60.0,
+        hedge_min_delay: float = 5.0,
+    ):
+        if not backends:
+            raise ValueError("At least one LLM backend is required")
+        self.backends = backends
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.executor = ThreadPoolExecutor(max_workers=2 * len(backends), thread_name_prefix="llm")
+
+    @classmethod
+    def from_config(cls) -> "LLMRouter":
+        specs = json.loads(Config.LLM_BACKENDS) if Config.LLM_BACKENDS else [
+            {"name": "groq", "provider": "groq", "model": Config.GROQ_MODEL or DEFAULT_MODEL}
+        ]
+        return cls(
+            [build_backend(spec) for spec in specs],
+            hedge=Config.LLM_HEDGE_ENABLED,
+            hedge_quantile=Config.LLM_HEDGE_QUANTILE,
+            hedge_initial_delay=Config.LLM_HEDGE_INITIAL_DELAY,
+            hedge_min_delay=Config.LLM_HEDGE_MIN_DELAY,
+        )
+
+    def complete(
+        self,
+        messages: List[Dict[str, str]],
+        validate: Optional[Callable[[str], Any]] = None,
+        **params,
+    ) -> CompletionResult:
+        """Return the first valid completion; `validate` raises on unusable content"""
+        candidates = [backend for backend in self.backends if backend.breaker.available()]
+        forced = not candidates
+        if forced:
+            logger.warning("All LLM backends are open, trying them anyway")
+            candidates = list(self.backends)
+
+        pending = {}
+        next_index = 0
+        last_error: Optional[Exception] = None
+
+        def launch():
+            nonlocal next_index
+            while next_index < len(candidates):
+                backend = candidates[next_index]
+                next_index += 1
+                # The breaker's probe is claimed only by a backend that is actually called
+                if not forced and not backend.breaker.allow():
+                    continue
+                # Copy the context so usage is attributed to the caller's request
+                context = contextvars.copy_context()
+                future = self.executor.submit(context.run, self._run, backend, messages, validate, params)
+                pending[future] = backend
+                return backend
+            return None
+
+        current = launch()
+        while pending:
+            timeout = None
+            if self.hedge and next_index < len(candidates):
+                timeout = current.hedge_delay(self.hedge_quantile, self.hedge_initial_delay, self.hedge_min_delay)
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                logger.info(f"{current.name} slower than {timeout:.1f}s, hedging")
+                current = launch() or current
+                continue
+
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM backend {backend.name} failed: {e}")
+                    last_error = e
+                    continue
+                for other in pending:
+                    other.cancel()
+                return result
+
+            if not pending and next_index < len(candidates):
+                current = launch() or current
+
+        raise last_error or BackendError("No LLM backend produced a result")
+
+    def _run(self, backend: LLMBackend, messages, validate, params) -> CompletionResult:
+        started = time.monotonic()
+        result = None
+        try:
+            result = backend.complete(messages, **params)
+            if validate:
+                validate(result.content)
+        except Exception:
+            backend.breaker.record_failure()
+            self._record_usage(backend, result, time.monotonic() - started, success=False)
+            raise
+        backend.breaker.record_success()
+        backend.latencies.append(result.latency)
+        self._record_usage(backend, result, result.latency, success=True)
+        return result
+
+    def _record_usage(self, backend: LLMBackend, result: Optional[CompletionResult], latency: float, success: bool):
+        """Failed attempts are recorded too (with the tokens of an invalid answer, if there was one)"""
+        if not Config.USAGE_TRACKING_ENABLED:
+            return
+        if result is None:
+            usage_tracker.record(backend.name, backend.model, {}, latency, success=success)
+        else:
+            usage_tracker.record(result.backend, result.model, result.usage, latency, success=success)
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import smtplib
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.message import Message
+from email.utils import getaddresses
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def _lost_session(error: Exception) -> bool:
+    """The session can't be reused: dropped, timed out or closed by the server (421)"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def _close_quietly(server: smtplib.SMTP):
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+
+class SMTPConnectionPool:
+    """
+    Authenticated SMTP sessions (STARTTLS + login) kept open and reused.
+
+    A session idle for `noop_after` seconds is checked with NOOP before use
+    and replaced if the server dropped it; one idle longer than `max_idle`
+    is closed. A send that loses its session is retried once on a new one.
+    """
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 size: int = None, timeout: float = None, noop_after: float = None, max_idle: float = None,
+                 clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size or Config.SMTP_POOL_SIZE
+        self.timeout = timeout or Config.SMTP_TIMEOUT
+        self.noop_after = Config.SMTP_NOOP_AFTER if noop_after is None else noop_after
+        self.max_idle = Config.SMTP_MAX_IDLE if max_idle is None else max_idle
+        self.clock = clock
+        self._idle: deque = deque()
+        self._open = 0
+        self._cond = threading.Condition()
+        self._counts = {"connects": 0, "reconnects": 0, "noops": 0, "sent": 0, "failed": 0}
+
+    def _count(self, name: str):
+        with self._cond:
+            self._counts[name] += 1
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._count("connects")
+        return server
+
+    def _healthy(self, server: smtplib.SMTP) -> bool:
+        self._count("noops")
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        stale = []
+        with self._cond:
+            while True:
+                server, idle_for = None, 0.0
+                while self._idle:
+                    candidate, last_used = self._idle.pop()
+                    if self.clock() - last_used > self.max_idle:
+                        stale.append(candidate)
+                        self._open -= 1
+                        continue
+                    server, idle_for = candidate, self.clock() - last_used
+                    break
+                if server is not None or self._open < self.size:
+                    if server is None:
+                        self._open += 1
+                    break
+                self._cond.wait()
+        for candidate in stale:
+            _close_quietly(candidate)
+
+        try:
+            if server is not None and idle_for >= self.noop_after and not self._healthy(server):
+                logger.info("Pooled SMTP session was dropped by the server, reconnecting")
+                self._count("reconnects")
+                server.close()
+                server = None
+            return server or self._connect()
+        except Exception:
+            self._release(None)
+            raise
+
+    def _release(self, server: Optional[smtplib.SMTP]):
+        """Return a session to the pool, or give up its slot when it is None"""
+        with self._cond:
+            if server is None:
+                self._open -= 1
+            else:
+                self._idle.append((server, self.clock()))
+            self._cond.notify()
+
+    def send(self, message: Message, from_addr: str = None, to_addrs: List[str] = None) -> Dict[str, Tuple[int, bytes]]:
+        """Send on a pooled session; returns the refused recipients like smtplib.send_message"""
+        for attempt in range(2):
+            server = self._checkout()
+            try:
+                refused = server.send_message(message, from_addr, to_addrs)
+            except Exception as e:
+                if not _lost_session(e):
+                    # smtplib has reset the transaction, the session is still good
+                    self._release(server)
+                    self._count("failed")
+                    raise
+                server.close()
+                self._release(None)
+                if attempt:
+                    self._count("failed")
+                    raise
+                logger.warning(f"SMTP session lost while sending ({e}), retrying on a new one")
+                self._count("reconnects")
+                continue
+            self._release(server)
+            self._count("sent")
+            return refused
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+        for server, _ in idle:
+            _close_quietly(server)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {"open": self._open, "idle": len(self._idle), **self._counts}
+
+
+def _header_recipients(message: Message) -> List[str]:
+    fields = message.get_all("To", []) + message.get_all("Cc", []) + message.get_all("Bcc", [])
+    return [address for _, address in getaddresses(fields) if address]
+
+
+class BackgroundMailer:
+    """
+    Sends through a connection pool, recipients batched `max_recipients` per
+    SMTP transaction; `submit` runs on worker threads so the caller never
+    waits on SMTP.
+    """
+
+    def __init__(self, pool: SMTPConnectionPool, workers: int = None, max_recipients: int = None):
+        self.pool = pool
+        self.max_recipients = max_recipients or Config.SMTP_MAX_RECIPIENTS
+        self._executor = ThreadPoolExecutor(max_workers=workers or Config.EMAIL_SEND_WORKERS, thread_name_prefix="mailer")
+        self._queued = 0
+        self._lock = threading.Lock()
+
+    def send(self, message: Message, from_addr: str = None, to_addrs: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Send on the calling thread, reusing pooled sessions; returns the outcome per recipient"""
+        recipients = _header_recipients(message) if to_addrs is None else list(dict.fromkeys(to_addrs))
+        outcomes = {}
+        for start in range(0, len(recipients), self.max_recipients):
+            batch = recipients[start:start + self.max_recipients]
+            try:
+                refused = self.pool.send(message, from_addr, batch)
+            except smtplib.SMTPRecipientsRefused as e:
+                refused = e.recipients
+            except Exception as e:
+                logger.error(f"SMTP batch of {len(batch)} recipients failed: {e}")
+                outcomes.update({recipient: {"success": False, "error": str(e)} for recipient in batch})
+                continue
+            for recipient in batch:
+                if recipient in refused:
+                    code, reply = refused[recipient]
+                    outcomes[recipient] = {"success": False, "error": f"{code} {reply.decode(errors='replace')}"}
+                else:
+                    outcomes[recipient] = {"success": True}
+        return outcomes
+
+    def submit(self, message: Message, from_addr: str = None, to_addrs: List[str] = None) -> Future:
+        """Queue a message; the future resolves to the outcome per recipient (failures are logged)"""
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._send, message, from_addr, to_addrs)
+
+    async def send_async(self, message: Message, from_addr: str = None, to_addrs: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Awaitable variant of `submit` for asyncio callers"""
+        return await asyncio.wrap_future(self.submit(message, from_addr, to_addrs))
+
+    def _send(self, message: Message, from_addr: Optional[str], to_addrs: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        try:
+            outcomes = self.send(message, from_addr, to_addrs)
+        except Exception as e:
+            logger.error(f"Failed to send email '{message['Subject']}': {e}")
+            raise
+        finally:
+            with self._lock:
+                self._queued -= 1
+        failed = sorted(recipient for recipient, outcome in outcomes.items() if not outcome["success"])
+        if failed:
+            logger.error(f"Email '{message['Subject']}' was not delivered to {failed}")
+        else:
+            logger.info(f"Email sent to {len(outcomes)} recipients: {message['Subject']}")
+        return outcomes
+
+    def shutdown(self, wait: bool = True):
+        """Finish queued messages, then close the pooled sessions"""
+        self._executor.shutdown(wait=wait)
+        self.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = self._queued
+        return {"queued": queued, **self.pool.stats()}
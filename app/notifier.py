@@ -1,306 +1,251 @@
+import atexit
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-import smtplib
 import requests
+from email.mime.image import MIMEImage
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 from .config import Config
+from .http_client import HTTPClient, get_http_client
+from .mailer import BackgroundMailer, SMTPConnectionPool
+from .rate_limit import DestinationRateLimiter
+from .report_document import ReportDocument
+from .telegram_messages import TelegramMessage, TelegramPart, bold_span, text_span
 
 logger = logging.getLogger(__name__)
 
+def delivery_summary(destinations: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Job-result view of a fan-out: overall success plus the outcome per destination"""
+    sent = sum(1 for outcome in destinations.values() if outcome["success"])
+    return {
+        "success": bool(destinations) and sent == len(destinations),
+        "sent": sent,
+        "failed": len(destinations) - sent,
+        "destinations": destinations
+    }
+
+def _chat_rate(chat_id: str) -> Tuple[float, float]:
+    # Groups and channels have negative ids and a much lower limit
+    if str(chat_id).startswith('-'):
+        return Config.TELEGRAM_GROUP_MESSAGES_PER_MINUTE / 60, 1
+    return Config.TELEGRAM_CHAT_MESSAGES_PER_SECOND, 1
+
+telegram_limiter = DestinationRateLimiter(Config.TELEGRAM_MESSAGES_PER_SECOND, destination_rate=_chat_rate)
+
 class TelegramNotifier:
-    def __init__(self):
+    def __init__(self, http: HTTPClient = None, limiter: DestinationRateLimiter = None):
+        self.http = http or get_http_client()
+        self.limiter = limiter or telegram_limiter
+        self.max_retries = Config.TELEGRAM_MAX_RETRIES
         self.bot_token = Config.TELEGRAM_BOT_TOKEN
         self.chat_id = Config.TELEGRAM_CHAT_ID
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
-    
-    def send_notification(self, report_data: Dict[str, Any], notion_url: str = None) -> bool:
-        """Send Telegram notification about new market report"""
-        try:
-            metadata = report_data.get('metadata', {})
-            analysis = report_data.get('analysis', {})
-            
-            # Create message
-            title = metadata.get('title', 'New Market Report')
-            summary = analysis.get('summary', 'Report processed successfully')
-            
-            message = f"📊 **{title}**\n\n"
-            message += f"📝 **Summary:**\n{summary}\n\n"
-            
-            # Add key insights
-            if analysis.get('key_insights'):
-                message += "💡 **Key Insights:**\n"
-                for insight in analysis['key_insights'][:3]:  # Limit to 3 insights
-                    message += f"• {insight}\n"
-                message += "\n"
-            
-            # Add market sentiment
-            metrics = analysis.get('market_metrics', {})
-            if metrics.get('market_sentiment'):
-                sentiment_emoji = {
-                    'positive': '📈',
-                    'negative': '📉',
-                    'neutral': '➡️'
-                }
-                emoji = sentiment_emoji.get(metrics['market_sentiment'], '➡️')
-                message += f"{emoji} **Sentiment:** {metrics['market_sentiment'].title()}\n\n"
-            
-            # Add Notion link
-            if notion_url:
-                message += f"🔗 [View in Notion]({notion_url})\n"
-            
-            message += f"⏰ {metadata.get('timestamp', 'Just now')}"
-            
-            # Send message
-            payload = {
-                'chat_id': self.chat_id,
-                'text': message,
-                'parse_mode': 'Markdown',
-                'disable_web_page_preview': True
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/sendMessage",
-                json=payload,
-                timeout=15
-            )
-            
+        self.chat_ids = list(Config.TELEGRAM_CHAT_IDS)
+        self.parse_mode = Config.TELEGRAM_PARSE_MODE
+        self.base_url = f"{Config.TELEGRAM_API_BASE_URL.rstrip('/')}/bot{self.bot_token}"
+
+    def _send_message(self, payload: Dict[str, Any]) -> requests.Response:
+        return self.http.post(
+            f"{self.base_url}/sendMessage",
+            json=payload,
+            timeout=(self.http.timeout[0], 15)
+        )
+
+    def _deliver(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Send one message within the global and per-chat limits, retrying 429s after retry_after"""
+        chat_id = str(payload['chat_id'])
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(chat_id)
+            response = self._send_message(payload)
             if response.status_code == 200:
-                logger.info("Telegram notification sent successfully")
-                return True
-            else:
-                logger.error(f"Telegram API error: {response.status_code} - {response.text}")
-                return False
-                
+                return {"success": True}
+            if response.status_code != 429 or attempt == self.max_retries:
+                logger.error(f"Telegram API error for chat {chat_id}: {response.status_code} - {response.text}")
+                return {"success": False, "status": response.status_code, "error": response.text[:200]}
+
+            try:
+                retry_after = response.json()['parameters']['retry_after']
+            except (ValueError, KeyError, TypeError):
+                retry_after = min(2 ** attempt, 30)
+            logger.warning(f"Telegram rate limited chat {chat_id}, retrying in {retry_after}s")
+            self.limiter.penalize(retry_after, chat_id)
+
+    def _deliver_parts(self, chat_id: str, parts: List[TelegramPart], **extra) -> Dict[str, Any]:
+        """
+        Send a split message to one chat in order, stopping at the first part that fails.
+        A part Telegram can't parse is resent once as plain text rather than dropped.
+        """
+        for index, part in enumerate(parts):
+            outcome = self._deliver({'chat_id': chat_id, 'text': part.text, 'parse_mode': self.parse_mode, **extra})
+            if not outcome["success"] and outcome.get("status") == 400 and "can't parse entities" in outcome["error"].lower():
+                logger.warning(f"Telegram could not parse part {index + 1}/{len(parts)} for chat {chat_id}, resending as plain text")
+                outcome = self._deliver({'chat_id': chat_id, 'text': part.plain, **extra})
+            if not outcome["success"]:
+                return {**outcome, "parts_sent": index}
+        return {"success": True, "parts_sent": len(parts)}
+
+    def notify_subscribers(self, report_data: Union[ReportDocument, Dict[str, Any]], notion_url: str = None,
+                           chat_ids: List[str] = None) -> Dict[str, Any]:
+        """Send the report notification to every subscribed chat concurrently, with the outcome per chat"""
+        chat_ids = list(dict.fromkeys(str(chat_id) for chat_id in (self.chat_ids if chat_ids is None else chat_ids)))
+        try:
+            parts = ReportDocument.of(report_data).render("telegram", notion_url=notion_url, parse_mode=self.parse_mode)
         except Exception as e:
-            logger.error(f"Failed to send Telegram notification: {e}")
-            return False
+            logger.error(f"Failed to render Telegram notification: {e}")
+            return delivery_summary({chat_id: {"success": False, "error": str(e)} for chat_id in chat_ids})
+
+        def send(chat_id):
+            try:
+                return self._deliver_parts(chat_id, parts, disable_web_page_preview=True)
+            except Exception as e:
+                logger.error(f"Failed to send Telegram notification to {chat_id}: {e}")
+                return {"success": False, "error": str(e)}
+
+        destinations = {}
+        if chat_ids:
+            with ThreadPoolExecutor(max_workers=min(len(chat_ids), Config.TELEGRAM_SEND_CONCURRENCY)) as executor:
+                destinations = dict(zip(chat_ids, executor.map(send, chat_ids)))
+        else:
+            logger.warning("No Telegram chats configured for report notifications")
+
+        result = delivery_summary(destinations)
+        logger.info(f"Telegram notification sent to {result['sent']}/{len(chat_ids)} chats")
+        return result
+    
+    def send_notification(self, report_data: Union[ReportDocument, Dict[str, Any]], notion_url: str = None,
+                          chat_ids: List[str] = None) -> bool:
+        """Send Telegram notification about new market report to every subscriber (or only `chat_ids`)"""
+        return self.notify_subscribers(report_data, notion_url, chat_ids)["success"]
     
     def send_error_notification(self, error_message: str, context: str = "") -> bool:
         """Send error notification via Telegram"""
         try:
-            message = f"🚨 **Market Report Processing Error**\n\n"
-            message += f"**Error:** {error_message}\n"
+            message = TelegramMessage(self.parse_mode)
+            message.add(text_span("🚨 "), bold_span("Market Report Processing Error"))
+            details = [bold_span("Error:"), text_span(f" {error_message}\n")]
             if context:
-                message += f"**Context:** {context}\n"
-            message += f"**Time:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            
-            payload = {
-                'chat_id': self.chat_id,
-                'text': message,
-                'parse_mode': 'Markdown'
-            }
-            
-            response = requests.post(
-                f"{self.base_url}/sendMessage",
-                json=payload,
-                timeout=15
-            )
-            
-            return response.status_code == 200
+                details += [bold_span("Context:"), text_span(f" {context}\n")]
+            details += [bold_span("Time:"), text_span(f" {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")]
+            message.add(*details)
+
+            return self._deliver_parts(self.chat_id, message.parts())["success"]
             
         except Exception as e:
             logger.error(f"Failed to send error notification: {e}")
             return False
 
 class EmailNotifier:
-    def __init__(self):
+    def __init__(self, mailer: BackgroundMailer = None):
         self.smtp_server = Config.SMTP_SERVER
         self.smtp_port = Config.SMTP_PORT
         self.email_address = Config.EMAIL_ADDRESS
         self.email_password = Config.EMAIL_PASSWORD
-        self.recipient_email = Config.RECIPIENT_EMAIL
+        self.recipient_emails = list(Config.RECIPIENT_EMAILS)
+        self._mailer = mailer
+        self._mailer_lock = threading.Lock()
+
+    @property
+    def mailer(self) -> BackgroundMailer:
+        """Pooled SMTP sessions for this account, opened on first use and flushed at exit"""
+        with self._mailer_lock:
+            if self._mailer is None:
+                pool = SMTPConnectionPool(self.smtp_server, self.smtp_port, self.email_address, self.email_password)
+                self._mailer = BackgroundMailer(pool)
+                atexit.register(self._mailer.shutdown)
+            return self._mailer
     
-    def send_report_email(self, report_data: Dict[str, Any], source_url: str) -> bool:
-        """Send processed report via email"""
+    def deliver_report_email(self, report_data: Union[ReportDocument, Dict[str, Any]], source_url: str,
+                             recipients: List[str] = None) -> Dict[str, Any]:
+        """Send processed report to every recipient (or only `recipients`), waiting for the SMTP server, with the outcome per recipient"""
+        recipients = list(self.recipient_emails if recipients is None else recipients)
+        if not recipients:
+            logger.warning("No email recipients configured for reports")
+            return delivery_summary({})
         try:
-            metadata = report_data.get('metadata', {})
-            analysis = report_data.get('analysis', {})
-            content = report_data.get('content', {})
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"Pro-Trading Skills Report: {metadata.get('title', 'New Report')}"
-            msg['From'] = self.email_address
-            msg['To'] = self.recipient_email
-            
-            # Create HTML content
-            html_content = self._create_html_email(report_data, source_url)
-            
-            # Create plain text content
-            # text_content = self._create_text_email(report_data, source_url)
-            
-            # Attach content
-            # msg.attach(MIMEText(text_content, 'plain'))
-            msg.attach(MIMEText(html_content, 'html'))
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.email_address, self.email_password)
-                server.send_message(msg)
-            
-            logger.info("Email sent successfully")
-            return True
-            
+            message = self._create_message(report_data, source_url, recipients)
+            destinations = self.mailer.send(message, self.email_address, recipients)
         except Exception as e:
             logger.error(f"Failed to send email: {e}")
-            return False
+            destinations = {recipient: {"success": False, "error": str(e)} for recipient in recipients}
+
+        result = delivery_summary(destinations)
+        logger.info(f"Email sent to {result['sent']}/{len(recipients)} recipients")
+        return result
+
+    def send_report_email(self, report_data: Union[ReportDocument, Dict[str, Any]], source_url: str,
+                          recipients: List[str] = None) -> bool:
+        """Send processed report via email"""
+        return self.deliver_report_email(report_data, source_url, recipients)["success"]
+
+    def queue_report_email(self, report_data: Union[ReportDocument, Dict[str, Any]], source_url: str) -> Optional[Future]:
+        """
+        Send processed report on a background thread; the future resolves to the outcome per recipient,
+        and the delivery summary is logged when it does.
+        """
+        if not self.recipient_emails:
+            logger.warning("No email recipients configured for reports")
+            return None
+        recipients = list(self.recipient_emails)
+        try:
+            future = self.mailer.submit(self._create_message(report_data, source_url, recipients), self.email_address, recipients)
+        except Exception as e:
+            logger.error(f"Failed to queue email: {e}")
+            return None
+        future.add_done_callback(lambda done: self._log_delivery(done, recipients, source_url))
+        return future
+
+    def _log_delivery(self, future: Future, recipients: List[str], source_url: str):
+        try:
+            destinations = future.result()
+        except Exception as e:
+            destinations = {recipient: {"success": False, "error": str(e)} for recipient in recipients}
+        result = delivery_summary(destinations)
+        if result["success"]:
+            logger.info(f"Queued email for {source_url} sent to {result['sent']}/{len(recipients)} recipients")
+        else:
+            failed = {recipient: outcome.get("error") for recipient, outcome in destinations.items() if not outcome["success"]}
+            logger.error(f"Queued email for {source_url} sent to {result['sent']}/{len(recipients)} recipients, failed: {failed}")
+
+    def _create_message(self, report_data: Union[ReportDocument, Dict[str, Any]], source_url: str,
+                        recipients: List[str] = None) -> MIMEMultipart:
+        recipients = self.recipient_emails if recipients is None else recipients
+        document = ReportDocument.of(report_data, source_url)
+        
+        # Create message; inline report images need a multipart/related body
+        inline_images = document.inline_images
+        msg = MIMEMultipart('related' if inline_images else 'alternative')
+        msg['Subject'] = f"Pro-Trading Skills Report: {document.title}"
+        msg['From'] = self.email_address
+        # Subscribers are only on the envelope, so they don't see each other
+        msg['To'] = recipients[0] if len(recipients) == 1 else 'undisclosed-recipients:;'
+        
+        # Create HTML content
+        html_content = document.render("email_html")
+        
+        # Create plain text content
+        # text_content = document.render("email_text")
+        
+        # Attach content
+        # msg.attach(MIMEText(text_content, 'plain'))
+        msg.attach(MIMEText(html_content, 'html'))
+        for image in inline_images:
+            try:
+                with open(image['path'], 'rb') as f:
+                    part = MIMEImage(f.read(), _subtype=image['mime_type'].split('/')[-1])
+            except (OSError, KeyError, TypeError) as e:
+                logger.warning(f"Skipping inline image {image.get('cid')}: {e}")
+                continue
+            part.add_header('Content-ID', f"<{image['cid']}>")
+            part.add_header('Content-Disposition', 'inline')
+            msg.attach(part)
+        return msg
     
     def _create_html_email(self, report_data: Dict[str, Any], source_url: str) -> str:
         """Create HTML email content"""
-        metadata = report_data.get('metadata', {})
-        analysis = report_data.get('analysis', {})
-        content = report_data.get('content', {})
-        
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <title>Market Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .header {{ background-color: #f4f4f4; padding: 20px; border-radius: 5px; }}
-                .section {{ margin: 20px 0; }}
-                .insights {{ background-color: #e8f4fd; padding: 15px; border-radius: 5px; }}
-                .risks {{ background-color: #fff3cd; padding: 15px; border-radius: 5px; }}
-                .action-items {{ background-color: #d4edda; padding: 15px; border-radius: 5px; }}
-                ul {{ padding-left: 20px; }}
-                .footer {{ margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; font-size: 12px; color: #666; }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>📊 {metadata.get('title', 'Market Report')}</h1>
-                <p><strong>Source:</strong> <a href="{source_url}">{source_url}</a></p>
-                <p><strong>Processed:</strong> {metadata.get('timestamp', 'Just now')}</p>
-            </div>
-            
-            <div class="section">
-                <h2>📝 Executive Summary</h2>
-                <p>{analysis.get('summary', 'Summary not available')}</p>
-            </div> 
-        """
-        
-        # Key Insights
-        if analysis.get('key_insights'):
-            html += """
-            <div class="section insights">
-                <h2>💡 Key Insights</h2>
-                <ul>
-            """
-            for insight in analysis['key_insights']:
-                html += f"<li>{insight}</li>"
-            html += "</ul></div>"
-        
-        # Market Outlook
-        if analysis.get('outlook'):
-            html += f"""
-            <div class="section">
-                <h2>🔮 Market Outlook</h2>
-                <p>{analysis['outlook']}</p>
-            </div>
-            """
-        
-        # Risk Factors
-        if analysis.get('risk_factors'):
-            html += """
-            <div class="section risks">
-                <h2>⚠️ Risk Factors</h2>
-                <ul>
-            """
-            for risk in analysis['risk_factors']:
-                html += f"<li>{risk}</li>"
-            html += "</ul></div>"
-        
-        # Action Items
-        if analysis.get('action_items'):
-            html += """
-            <div class="section action-items">
-                <h2>✅ Action Items</h2>
-                <ul>
-            """
-            for item in analysis['action_items']:
-                html += f"<li>{item}</li>"
-            html += "</ul></div>"
-
-        # Original Content
-        if content.get('original_html'):
-            original_html = content.get('original_html')
-            html += f"""
-            <div class="section">
-                <h2>📄 Original Report </h2>
-                <div style="max-height: 300px; overflow-y: auto; border: 1px solid #ddd; padding: 15px; background-color: #f9f9f9;">
-                    {original_html}
-                </div>
-            </div>
-            """
-        
-        # Full Content (truncated)
-        if content.get('translated_content'):
-            translated = content['translated_content']
-            html += f"""
-            <div class="section">
-                <h2>📄 Full Report (Translated)</h2>
-                <div style="max-height: 300px; overflow-y: auto; border: 1px solid #ddd; padding: 15px; background-color: #f9f9f9;">
-                    <p>{translated.replace('\n', '<br>')}</p>
-                </div>
-            </div>
-            """
-        
-        html += """
-            <div class="footer">
-                <p>This report was automatically processed by the Market Report AI system.</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html
+        return ReportDocument.of(report_data, source_url).render("email_html")
     
     def _create_text_email(self, report_data: Dict[str, Any], source_url: str) -> str:
         """Create plain text email content"""
-        metadata = report_data.get('metadata', {})
-        analysis = report_data.get('analysis', {})
-        
-        text = f"MARKET REPORT: {metadata.get('title', 'New Report')}\n"
-        text += "=" * 50 + "\n\n"
-        text += f"Source: {source_url}\n"
-        text += f"Processed: {metadata.get('timestamp', 'Just now')}\n\n"
-        
-        text += "EXECUTIVE SUMMARY\n"
-        text += "-" * 20 + "\n"
-        text += f"{analysis.get('summary', 'Summary not available')}\n\n"
-        
-        if analysis.get('key_insights'):
-            text += "KEY INSIGHTS\n"
-            text += "-" * 20 + "\n"
-            for insight in analysis['key_insights']:
-                text += f"• {insight}\n"
-            text += "\n"
-        
-        if analysis.get('outlook'):
-            text += "MARKET OUTLOOK\n"
-            text += "-" * 20 + "\n"
-            text += f"{analysis['outlook']}\n\n"
-        
-        if analysis.get('risk_factors'):
-            text += "RISK FACTORS\n"
-            text += "-" * 20 + "\n"
-            for risk in analysis['risk_factors']:
-                text += f"• {risk}\n"
-            text += "\n"
-        
-        if analysis.get('action_items'):
-            text += "ACTION ITEMS\n"
-            text += "-" * 20 + "\n"
-            for item in analysis['action_items']:
-                text += f"• {item}\n"
-            text += "\n"
-        
-        text += "\n" + "=" * 50 + "\n"
-        text += "This report was automatically processed by the Market Report AI system."
-        
-        return text
+        return ReportDocument.of(report_data, source_url).render("email_text")
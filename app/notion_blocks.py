@@ -0,0 +1,197 @@
+import json
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Notion API request limits
+MAX_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+MAX_CHILDREN = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+MAX_PAYLOAD_BYTES = 450 * 1024  # the API allows 500KB; leave room for properties
+
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+
+def split_text(text: str, limit: int = MAX_TEXT_LENGTH) -> List[str]:
+    """Split text into pieces Notion accepts as one rich-text item, preferring line and word boundaries"""
+    pieces = []
+    while text:
+        window = text[:limit]
+        # Notion counts UTF-16 code units, so emoji and other astral characters count twice
+        size = limit - sum(1 for char in window if ord(char) > 0xFFFF)
+        if len(text) <= size:
+            pieces.append(text)
+            break
+        cut = text.rfind("\n", 0, size)
+        if cut < size // 2:
+            cut = text.rfind(" ", 0, size)
+        cut = cut + 1 if cut >= size // 2 else size
+        pieces.append(text[:cut])
+        text = text[cut:]
+    return pieces
+
+
+def rich_text(text: str, annotations: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    items = []
+    for piece in split_text(text or ""):
+        item = {"type": "text", "text": {"content": piece}}
+        if annotations:
+            item["annotations"] = annotations
+        items.append(item)
+    return items
+
+
+def text_blocks(text: str, block_type: str = "paragraph") -> List[Dict[str, Any]]:
+    """One block per paragraph of `text`; paragraphs too long for a single block continue in the next one"""
+    blocks = []
+    for paragraph in _BLANK_LINES.split(text or ""):
+        items = rich_text(paragraph.strip())
+        for start in range(0, len(items), MAX_RICH_TEXT_ITEMS):
+            blocks.append({
+                "object": "block",
+                "type": block_type,
+                block_type: {"rich_text": items[start:start + MAX_RICH_TEXT_ITEMS]}
+            })
+    return blocks
+
+
+def _split_children(block: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    block_type = block.get("type")
+    body = block.get(block_type)
+    if not isinstance(body, dict) or not body.get("children"):
+        return block, []
+    shallow = {**block, block_type: {key: value for key, value in body.items() if key != "children"}}
+    return shallow, body["children"]
+
+
+def _with_children(block: Dict[str, Any], children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    block_type = block["type"]
+    return {**block, block_type: {**block[block_type], "children": children}}
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+
+def next_batch(blocks: List[Dict[str, Any]], start: int) -> Tuple[List[Dict[str, Any]], Dict[int, List[Dict[str, Any]]], int]:
+    """
+    Blocks from `start` that fit in one request: at most 100 siblings, 1000 blocks in total and
+    the payload size limit. Nested children that don't fit are returned by position in the batch,
+    to be appended once the parent block exists; the last value is where the next batch starts.
+    """
+    batch, deferred = [], {}
+    count = size = 0
+    index = start
+    while index < len(blocks) and len(batch) < MAX_CHILDREN:
+        block, children = _split_children(blocks[index])
+        block_size = _json_size(block)
+        if batch and (count + 1 > MAX_BLOCKS_PER_REQUEST or size + block_size > MAX_PAYLOAD_BYTES):
+            break
+        inline = children[:MAX_CHILDREN]
+        inline_size = _json_size(inline) if inline else 0
+        if inline and (count + 1 + len(inline) > MAX_BLOCKS_PER_REQUEST or size + block_size + inline_size > MAX_PAYLOAD_BYTES):
+            inline, inline_size = [], 0
+        batch.append(_with_children(block, inline) if inline else block)
+        if len(children) > len(inline):
+            deferred[len(batch) - 1] = children[len(inline):]
+        count += 1 + len(inline)
+        size += block_size + inline_size
+        index += 1
+    return batch, deferred, index
+
+
+class NotionBlockWriter:
+    """
+    Creates a page with as many blocks as one request allows, then appends the rest with
+    PATCH /blocks/{id}/children. Batches under the same parent go in order; children of
+    different parents (e.g. a long toggle) are appended concurrently, up to `max_concurrency`.
+    """
+
+    def __init__(self, request: Callable, max_concurrency: int = None):
+        # request(method, path, payload) -> requests.Response, e.g. NotionClient._request
+        self.request = request
+        self.max_concurrency = max_concurrency or Config.NOTION_APPEND_CONCURRENCY
+
+    def create_page(self, payload: Dict[str, Any], blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        batch, deferred, index = next_batch(blocks, 0)
+        response = self.request("POST", "/pages", {**payload, "children": batch})
+        if response.status_code != 200:
+            logger.error(f"Notion API error: {response.status_code} - {response.text}")
+            return {"success": False, "status": response.status_code, "error": f"API error: {response.status_code}"}
+
+        page = response.json()
+        result = {"success": True, "page_id": page["id"], "page_url": page["url"], "complete": True}
+        if not deferred and index >= len(blocks):
+            return result
+
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="notion-blocks") as executor:
+            complete = True
+            if deferred:
+                created = self._child_ids(page["id"])
+                if created is None:
+                    complete = False
+                else:
+                    for position, children in deferred.items():
+                        futures.append(executor.submit(self._append, created[position], children, executor, futures))
+            complete = self._append(page["id"], blocks[index:], executor, futures) and complete
+            complete = self._drain(futures) and complete
+
+        if not complete:
+            logger.error(f"Notion page {page['id']} was created but some of its blocks could not be appended")
+            result.update({"complete": False, "error": "Some blocks could not be appended"})
+        else:
+            logger.info(f"Appended the remaining blocks to Notion page {page['id']} in batches")
+        return result
+
+    def append(self, parent_id: str, blocks: List[Dict[str, Any]]) -> bool:
+        """Append blocks after the existing children of a page or block; False if any batch failed"""
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="notion-blocks") as executor:
+            complete = self._append(parent_id, blocks, executor, futures)
+            return self._drain(futures) and complete
+
+    @staticmethod
+    def _drain(futures: List[Future]) -> bool:
+        # Appends queue their own nested appends before they finish, so this waits for everything
+        complete = True
+        while futures:
+            complete = futures.pop(0).result() and complete
+        return complete
+
+    def _append(self, parent_id: str, blocks: List[Dict[str, Any]], executor: ThreadPoolExecutor,
+                futures: List[Future]) -> bool:
+        index = 0
+        while index < len(blocks):
+            batch, deferred, index = next_batch(blocks, index)
+            try:
+                response = self.request("PATCH", f"/blocks/{parent_id}/children", {"children": batch})
+            except Exception as e:
+                logger.error(f"Failed to append blocks to {parent_id}: {e}")
+                return False
+            if response.status_code != 200:
+                logger.error(f"Notion API error appending to {parent_id}: {response.status_code} - {response.text}")
+                return False
+            # The new blocks are the last ones in the response
+            created = [item["id"] for item in response.json().get("results", [])][-len(batch):]
+            for position, children in deferred.items():
+                futures.append(executor.submit(self._append, created[position], children, executor, futures))
+        return True
+
+    def _child_ids(self, parent_id: str) -> Optional[List[str]]:
+        """IDs of the blocks created with the page (the first batch has at most 100, one page of results)"""
+        try:
+            response = self.request("GET", f"/blocks/{parent_id}/children?page_size={MAX_CHILDREN}")
+        except Exception as e:
+            logger.error(f"Failed to list blocks of {parent_id}: {e}")
+            return None
+        if response.status_code != 200:
+            logger.error(f"Notion API error listing {parent_id}: {response.status_code} - {response.text}")
+            return None
+        return [item["id"] for item in response.json().get("results", [])]
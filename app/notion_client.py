@@ -1,62 +1,91 @@
 import logging
-import html2text
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
 import requests
 from .config import Config
+from .http_client import HTTPClient, get_http_client
+from .notion_blocks import NotionBlockWriter
+from .notion_pages import NotionPageIndex, content_hash
+from .notion_schema import NotionSchemaCache
+from .rate_limit import PriorityRateLimiter, parse_duration
+from .report_document import ReportDocument
 
 
 
 logger = logging.getLogger(__name__)
 
+# Page creation (and its block appends) goes ahead of status updates
+PRIORITY_PAGE = 0
+PRIORITY_STATUS = 1
+
+notion_limiter = PriorityRateLimiter(
+    Config.NOTION_REQUESTS_PER_SECOND,
+    Config.NOTION_BURST,
+    names={PRIORITY_PAGE: "page", PRIORITY_STATUS: "status"},
+)
+
 class NotionClient:
-    def __init__(self):
+    def __init__(self, http: HTTPClient = None, limiter: PriorityRateLimiter = None, page_index: NotionPageIndex = None):
+        self.http = http or get_http_client()
+        self.limiter = limiter or notion_limiter
+        self._page_index = page_index
+        self.max_retries = Config.NOTION_MAX_RETRIES
         self.api_key = Config.NOTION_API_KEY
         self.database_id = Config.NOTION_DATABASE_ID
-        self.base_url = "https://api.notion.com/v1"
+        self.base_url = Config.NOTION_BASE_URL.rstrip('/')
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "Notion-Version": "2022-06-28"
         }
+        self.block_writer = NotionBlockWriter(self._request)
+        self.schema_cache = NotionSchemaCache(self._fetch_schema) if Config.NOTION_SCHEMA_VALIDATION_ENABLED else None
+
+    def _request(self, method: str, path: str, payload: Dict[str, Any] = None, timeout: float = 30,
+                 priority: int = PRIORITY_PAGE) -> requests.Response:
+        """Call the Notion API through the shared rate limiter, retrying 429s after Retry-After"""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(priority)
+            response = self.http.request(
+                method,
+                f"{self.base_url}{path}",
+                headers=self.headers,
+                json=payload,
+                timeout=(self.http.timeout[0], timeout)
+            )
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+
+            retry_after = parse_duration(response.headers.get("Retry-After")) or min(2 ** attempt, 30)
+            logger.warning(f"Notion rate limited {method} {path}, retrying in {retry_after:.1f}s")
+            self.limiter.penalize(retry_after)
+        return response
     
-    def create_report_page(self, analysis: Dict[str, Any], source_url: str) -> Dict[str, Any]:
+    def create_report_page(self, analysis: Union[ReportDocument, Dict[str, Any]], source_url: str) -> Dict[str, Any]:
         """Create a new page in Notion database for the market report"""
         try:
-            # Prepare the page properties
-            properties = self._build_page_properties(analysis, source_url)
+            document = ReportDocument.of(analysis, source_url)
+
+            # Prepare the page properties, checked against the database schema
+            properties = self._build_page_properties(document.data, source_url)
             
             # Prepare the page content (blocks)
-            children = self._build_page_content(analysis)
+            children = document.render("notion")
             
-            # Create the page
+            # Create the page with the first batch of blocks and append the rest
             payload = {
                 "parent": {"database_id": self.database_id},
-                "properties": properties,
-                "children": children
+                "properties": self._prepare_properties(properties)
             }
             
-            response = requests.post(
-                f"{self.base_url}/pages",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Successfully created Notion page: {result['id']}")
-                return {
-                    "success": True,
-                    "page_id": result['id'],
-                    "page_url": result['url']
-                }
-            else:
-                logger.error(f"Notion API error: {response.status_code} - {response.text}")
-                return {
-                    "success": False,
-                    "error": f"API error: {response.status_code}"
-                }
+            result = self.block_writer.create_page(payload, children)
+            if self._schema_changed(result):
+                payload["properties"] = self._prepare_properties(properties, refresh=True)
+                result = self.block_writer.create_page(payload, children)
+            if result["success"]:
+                logger.info(f"Successfully created Notion page: {result['page_id']}")
+            return result
                 
         except Exception as e:
             logger.error(f"Failed to create Notion page: {e}")
@@ -65,6 +94,156 @@ class NotionClient:
                 "error": str(e)
             }
     
+    def _fetch_schema(self) -> Optional[Dict[str, Any]]:
+        response = self._request("GET", f"/databases/{self.database_id}", timeout=15)
+        if response.status_code != 200:
+            logger.error(f"Could not read the Notion database schema: {response.status_code} - {response.text}")
+            return None
+        return response.json().get("properties")
+
+    def _prepare_properties(self, properties: Dict[str, Any], refresh: bool = False) -> Dict[str, Any]:
+        """Properties renamed, converted and option-mapped for the cached schema (as built if it can't be read)"""
+        schema = self.schema_cache.get(refresh) if self.schema_cache else None
+        if schema is None:
+            return properties
+        normalized, missing = schema.normalize(properties)
+        if missing and not (Config.NOTION_CREATE_SELECT_OPTIONS and self._create_select_options(schema, missing)):
+            normalized, _ = schema.normalize(properties, allow_new_options=False)
+        return normalized
+
+    def _create_select_options(self, schema, missing: Dict[str, List[str]]) -> bool:
+        """Add new select/multi-select options to the database in one request"""
+        update = {}
+        for name, options in missing.items():
+            prop_type = schema.properties[name]["type"]
+            existing = (schema.properties[name].get(prop_type) or {}).get("options", [])
+            added = [{"name": option} for option in dict.fromkeys(options)]
+            update[name] = {prop_type: {"options": [{"id": option["id"], "name": option["name"]} for option in existing] + added}}
+        response = self._request("PATCH", f"/databases/{self.database_id}", {"properties": update})
+        if response.status_code != 200:
+            logger.error(f"Could not add Notion select options: {response.status_code} - {response.text}")
+            return False
+        logger.info(f"Added Notion select options: {missing}")
+        self.schema_cache.invalidate()
+        return True
+
+    def _schema_changed(self, result: Dict[str, Any]) -> bool:
+        """A validation error with schema checks on usually means the database changed since it was cached"""
+        if result.get("success") or result.get("status") != 400 or not self.schema_cache or not self.schema_cache.schema:
+            return False
+        logger.warning("Notion rejected the page properties, refreshing the database schema and retrying")
+        return True
+
+    @property
+    def page_index(self) -> NotionPageIndex:
+        if self._page_index is None:
+            self._page_index = NotionPageIndex()
+        return self._page_index
+
+    def upsert_report_page(self, analysis: Union[ReportDocument, Dict[str, Any]], source_url: str) -> Dict[str, Any]:
+        """Update the report's existing page (same source URL or report text) in place, or create one"""
+        document = ReportDocument.of(analysis, source_url)
+        digest = content_hash(document.data.get("content", {}))
+        try:
+            existing = self.page_index.lookup(source_url, digest)
+            if existing is None and not self.page_index.synced_at:
+                self.rebuild_page_index()
+                existing = self.page_index.lookup(source_url, digest)
+
+            if existing:
+                result = self._update_report_page(existing, document, source_url)
+                if not result.get("gone"):
+                    # Any other failure keeps the index entry, so the next run updates instead of duplicating
+                    return result
+                logger.info(f"Indexed Notion page {existing['page_id']} is gone, creating a new one")
+        except Exception as e:
+            logger.error(f"Failed to update Notion page: {e}")
+            return {"success": False, "error": str(e)}
+
+        result = self.create_report_page(document, source_url)
+        if result["success"]:
+            if existing:
+                self.page_index.remove(existing["page_id"])
+            self.page_index.add(result["page_id"], result["page_url"], source_url, digest)
+            self.page_index.save()
+        return {**result, "updated": False}
+
+    def _update_report_page(self, page: Dict[str, str], document: ReportDocument, source_url: str) -> Dict[str, Any]:
+        page_id = page["page_id"]
+        properties = self._build_page_properties(document.data, source_url)
+        # The review status belongs to the reader, keep it
+        properties.pop("Status", None)
+        response = self._request("PATCH", f"/pages/{page_id}", {"properties": self._prepare_properties(properties)})
+        if self._schema_changed({"status": response.status_code}):
+            response = self._request("PATCH", f"/pages/{page_id}", {"properties": self._prepare_properties(properties, refresh=True)})
+        if response.status_code != 200:
+            logger.error(f"Notion API error updating {page_id}: {response.status_code} - {response.text}")
+            # Deleted pages give 404, archived ones a 400 saying so; other 400s are our own validation errors
+            gone = response.status_code == 404 or (response.status_code == 400 and "archived" in response.text.lower())
+            return {"success": False, "status": response.status_code, "error": f"API error: {response.status_code}", "gone": gone}
+
+        # New content goes in before the old is removed, so the page is never empty
+        old_blocks = self._list_children(page_id)
+        complete = self.block_writer.append(page_id, document.render("notion"))
+        if complete:
+            with ThreadPoolExecutor(max_workers=self.block_writer.max_concurrency) as executor:
+                deleted = list(executor.map(self._delete_block, old_blocks))
+            complete = all(deleted)
+        else:
+            logger.error(f"Could not append the new content of {page_id}, keeping the old blocks")
+
+        self.page_index.add(page_id, page["page_url"], source_url, content_hash(document.data.get("content", {})))
+        self.page_index.save()
+        logger.info(f"Updated Notion page in place: {page_id}")
+        result = {"success": True, "page_id": page_id, "page_url": page["page_url"], "updated": True, "complete": complete}
+        if not complete:
+            result["error"] = "Page content was only partly replaced"
+        return result
+
+    def _list_children(self, block_id: str) -> List[str]:
+        ids, cursor = [], None
+        while True:
+            path = f"/blocks/{block_id}/children?page_size=100" + (f"&start_cursor={cursor}" if cursor else "")
+            response = self._request("GET", path)
+            if response.status_code != 200:
+                raise RuntimeError(f"API error listing blocks: {response.status_code}")
+            data = response.json()
+            ids.extend(item["id"] for item in data.get("results", []))
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                return ids
+
+    def _delete_block(self, block_id: str) -> bool:
+        response = self._request("DELETE", f"/blocks/{block_id}")
+        if response.status_code != 200:
+            logger.error(f"Could not delete Notion block {block_id}: {response.status_code}")
+        return response.status_code == 200
+
+    def rebuild_page_index(self) -> int:
+        """Re-read every page's Source URL from the database (paginated query); returns the number indexed"""
+        pages, cursor = {}, None
+        while True:
+            payload = {"page_size": 100, "sorts": [{"timestamp": "created_time", "direction": "descending"}]}
+            if cursor:
+                payload["start_cursor"] = cursor
+            response = self._request("POST", f"/databases/{self.database_id}/query", payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"API error querying the database: {response.status_code}")
+            data = response.json()
+            for page in data.get("results", []):
+                url = (page.get("properties", {}).get("Source URL") or {}).get("url")
+                if url and not page.get("archived"):
+                    # Newest first, so a URL published twice maps to its latest page
+                    pages.setdefault(url, {"page_id": page["id"], "page_url": page["url"]})
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                break
+
+        self.page_index.replace_urls(pages)
+        self.page_index.save()
+        logger.info(f"Rebuilt Notion page index with {len(pages)} source URLs")
+        return len(pages)
+    
     def _build_page_properties(self, full_data: Dict[str, Any], source_url: str) -> Dict[str, Any]:
         """Build the properties for the Notion page"""
 
@@ -129,257 +308,6 @@ class NotionClient:
         
         return properties
     
-    def _build_page_content(self, report_data: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Build the content blocks for the Notion page"""
-        blocks = []
-        analysis = report_data.get('analysis', {})
-        content = report_data.get('content', {})
-        
-        try:
-            # Summary section
-            if analysis.get('summary'):
-                blocks.extend([
-                    {
-                        "object": "block",
-                        "type": "heading_2",
-                        "heading_2": {
-                            "rich_text": [{"type": "text", "text": {"content": "📊 Summary"}}]
-                        }
-                    },
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": analysis['summary']}}]
-                        }
-                    }
-                ])
-            
-            # Key Insights
-            if analysis.get('key_insights'):
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "💡 Key Insights"}}]
-                    }
-                })
-                
-                for insight in analysis['key_insights']:
-                    blocks.append({
-                        "object": "block",
-                        "type": "bulleted_list_item",
-                        "bulleted_list_item": {
-                            "rich_text": [{"type": "text", "text": {"content": insight}}]
-                        }
-                    })
-            
-            # Market Metrics
-            metrics = analysis.get('market_metrics', {})
-            if any(metrics.values()):
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "📈 Market Metrics"}}]
-                    }
-                })
-                
-                if metrics.get('mentioned_stocks'):
-                    blocks.append({
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {"type": "text", "text": {"content": "**Mentioned Stocks:** "}, "annotations": {"bold": True}},
-                                {"type": "text", "text": {"content": ", ".join(metrics['mentioned_stocks'][:10])}}
-                            ]
-                        }
-                    })
-                
-                if metrics.get('sectors'):
-                    blocks.append({
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [
-                                {"type": "text", "text": {"content": "**Sectors:** "}, "annotations": {"bold": True}},
-                                {"type": "text", "text": {"content": ", ".join(metrics['sectors'])}}
-                            ]
-                        }
-                    })
-            
-            # Outlook
-            if analysis.get('outlook'):
-                blocks.extend([
-                    {
-                        "object": "block",
-                        "type": "heading_2",
-                        "heading_2": {
-                            "rich_text": [{"type": "text", "text": {"content": "🔮 Market Outlook"}}]
-                        }
-                    },
-                    {
-                        "object": "block",
-                        "type": "paragraph",
-                        "paragraph": {
-                            "rich_text": [{"type": "text", "text": {"content": analysis['outlook']}}]
-                        }
-                    }
-                ])
-            
-            # Risk Factors
-            if analysis.get('risk_factors'):
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "⚠️ Risk Factors"}}]
-                    }
-                })
-                
-                for risk in analysis['risk_factors']:
-                    blocks.append({
-                        "object": "block",
-                        "type": "bulleted_list_item",
-                        "bulleted_list_item": {
-                            "rich_text": [{"type": "text", "text": {"content": risk}}]
-                        }
-                    })
-            
-            # Action Items
-            if analysis.get('action_items'):
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [{"type": "text", "text": {"content": "✅ Action Items"}}]
-                    }
-                })
-                
-                for item in analysis['action_items']:
-                    blocks.append({
-                        "object": "block",
-                        "type": "to_do",
-                        "to_do": {
-                            "rich_text": [{"type": "text", "text": {"content": item}}],
-                            "checked": False
-                        }
-                    })
-            
-            # Images
-            if content.get("report_images"):
-                blocks.append({
-                    "object": "block",
-                    "type": "heading_2",
-                    "heading_2": {
-                        "rich_text": [
-                            {
-                                "type": "text",
-                                "text": {"content": "📷 Gallery"}
-                            }
-                        ]
-                    }
-                })
-
-                for img_url in content.get("report_images"):
-                    if img_url.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.gif')):
-                        # Use image block for direct image URLs
-                        blocks.append({
-                            "object": "block",
-                            "type": "image",
-                            "image": {
-                                "type": "external",
-                                "external": {
-                                    "url": img_url
-                                }
-                            }
-                        })
-                    else:
-                        # Use bookmark block for non-direct image URLs (like TradingView)
-                        blocks.append({
-                            "object": "block",
-                            "type": "bookmark",
-                            "bookmark": {
-                                "url": img_url
-                            }
-                        })
-            
-            # # Full Translated Content (collapsible)
-            # if content.get('translated_content'):
-            #     blocks.extend([
-            #         {
-            #             "object": "block",
-            #             "type": "heading_2",
-            #             "heading_2": {
-            #                 "rich_text": [{"type": "text", "text": {"content": "📄 Full Report (Translated)"}}]
-            #             }
-            #         },
-            #         {
-            #             "object": "block",
-            #             "type": "toggle",
-            #             "toggle": {
-            #                 "rich_text": [{"type": "text", "text": {"content": "Click to expand full content"}}],
-            #                 "children": [
-            #                     {
-            #                         "object": "block",
-            #                         "type": "paragraph",
-            #                         "paragraph": {
-            #                             "rich_text": [{"type": "text", "text": {"content": content['translated_content'][:2000]}}]
-            #                         }
-            #                     }
-            #                 ]
-            #             }
-            #         }
-            #     ])
-        
-            # Original Report
-            # Convert HTML to plain text with markdown formatting preserved
-            html_converter = html2text.HTML2Text()
-            html_converter.ignore_links = False  # Keep links if present
-            html_converter.body_width = 0  # Prevent word wrapping
-            if content.get('original_html'):
-                blocks.extend([
-                    {
-                        "object": "block",
-                        "type": "heading_2",
-                        "heading_2": {
-                            "rich_text": [{"type": "text", "text": {"content": "📄 Original Report"}}]
-                        }
-                    },
-                    {
-                        "object": "block",
-                        "type": "toggle",
-                        "toggle": {
-                            "rich_text": [{"type": "text", "text": {"content": "Click to expand full content"}}],
-                            "children": [
-                                {
-                                    "object": "block",
-                                    "type": "paragraph",
-                                    "paragraph": {
-                                        "rich_text": [{"type": "text", "text": {"content": html_converter.handle(content.get("original_html", "")[:2000])}}]
-                                    }
-                                }
-                            ]
-                        }
-                    }
-                ])
-        
-        except Exception as e:
-            logger.error(f"Error building Notion content blocks: {e}")
-            # Fallback basic content
-            blocks = [
-                {
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [{"type": "text", "text": {"content": "Report processed successfully. Error in detailed formatting."}}]
-                    }
-                }
-            ]
-        
-        return blocks
-    
     def update_page_status(self, page_id: str, status: str) -> bool:
         """Update the status of a Notion page"""
         try:
@@ -393,12 +321,8 @@ class NotionClient:
                 }
             }
             
-            response = requests.patch(
-                f"{self.base_url}/pages/{page_id}",
-                headers=self.headers,
-                json=payload,
-                timeout=15
-            )
+            payload["properties"] = self._prepare_properties(payload["properties"])
+            response = self._request("PATCH", f"/pages/{page_id}", payload, timeout=15, priority=PRIORITY_STATUS)
             
             return response.status_code == 200
             
@@ -414,3 +338,4 @@ class NotionClient:
             items = items.strip(")").split(",")
             return [{"name": category}] + [{"name": item.strip()} for item in items]
         return [{"name": value.strip()}]
+
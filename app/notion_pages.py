@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import Config
+from .links import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(content: Dict[str, Any]) -> Optional[str]:
+    """SHA-256 of the report text; BodyStore references already carry it"""
+    text = content.get("original_text")
+    if isinstance(text, dict):
+        return text.get("body_ref")
+    if text:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return None
+
+
+class NotionPageIndex:
+    """
+    Normalized source URL and content hash → Notion page, persisted to a JSON file so
+    upserts don't need a database query per report. `synced_at` is set once the URL
+    entries have been rebuilt from the database.
+    """
+
+    def __init__(self, path: str = None):
+        # An empty path keeps the index in memory only
+        self.path = Config.NOTION_PAGE_INDEX_PATH if path is None else path
+        self._lock = threading.Lock()
+        self.urls: Dict[str, Dict[str, str]] = {}
+        self.hashes: Dict[str, Dict[str, str]] = {}
+        self.synced_at: Optional[float] = None
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                self.urls = data.get("urls", {})
+                self.hashes = data.get("hashes", {})
+                self.synced_at = data.get("synced_at")
+            except (OSError, ValueError) as e:
+                logger.error(f"Could not load Notion page index {self.path}: {e}")
+
+    def lookup(self, source_url: str = None, digest: str = None) -> Optional[Dict[str, str]]:
+        if source_url:
+            page = self.urls.get(normalize_url(source_url))
+            if page:
+                return page
+        if digest:
+            return self.hashes.get(digest)
+        return None
+
+    def add(self, page_id: str, page_url: str, source_url: str = None, digest: str = None):
+        page = {"page_id": page_id, "page_url": page_url}
+        with self._lock:
+            if source_url:
+                self.urls[normalize_url(source_url)] = page
+            if digest:
+                self.hashes[digest] = page
+
+    def remove(self, page_id: str):
+        with self._lock:
+            self.urls = {key: page for key, page in self.urls.items() if page["page_id"] != page_id}
+            self.hashes = {key: page for key, page in self.hashes.items() if page["page_id"] != page_id}
+
+    def replace_urls(self, urls: Dict[str, Dict[str, str]]):
+        """Swap in URL entries rebuilt from the database; hashes of pages that no longer exist are dropped"""
+        page_ids = {page["page_id"] for page in urls.values()}
+        with self._lock:
+            self.urls = {normalize_url(url): page for url, page in urls.items()}
+            self.hashes = {key: page for key, page in self.hashes.items() if page["page_id"] in page_ids}
+            self.synced_at = time.time()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"synced_at": self.synced_at, "urls": self.urls, "hashes": self.hashes}, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,148 @@
+import logging
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import Config
+from .notion_blocks import rich_text
+from .symbols import alias_key
+
+logger = logging.getLogger(__name__)
+
+# Property types a page create/update can write
+_WRITABLE = {"title", "rich_text", "select", "multi_select", "status", "url", "number", "date", "checkbox", "email", "phone_number"}
+_SPACES = re.compile(r"\s+")
+MAX_OPTION_LENGTH = 100
+
+
+def option_name(value: Any) -> str:
+    """Option names can't contain commas and are at most 100 characters"""
+    return _SPACES.sub(" ", str(value).replace(",", " ")).strip()[:MAX_OPTION_LENGTH]
+
+
+def _plain_value(value: Dict[str, Any]) -> Tuple[Optional[str], Any]:
+    """(type, python value) of a property value as _build_page_properties writes it"""
+    for kind in ("title", "rich_text"):
+        if kind in value:
+            return kind, "".join(item.get("text", {}).get("content", "") for item in value[kind] or [])
+    for kind in ("select", "status"):
+        if kind in value:
+            return kind, (value[kind] or {}).get("name")
+    if "multi_select" in value:
+        return "multi_select", [item.get("name") for item in value["multi_select"] or [] if item.get("name")]
+    for kind in ("url", "number", "date", "checkbox", "email", "phone_number"):
+        if kind in value:
+            return kind, value[kind]
+    return None, None
+
+
+class NotionSchema:
+    """Property names, types and select options of a database, matched case- and accent-insensitively"""
+
+    def __init__(self, properties: Dict[str, Dict[str, Any]]):
+        self.properties = properties
+        self._names = {alias_key(name): name for name in properties}
+        self.title_name = next((name for name, prop in properties.items() if prop.get("type") == "title"), None)
+
+    def resolve(self, name: str) -> Optional[str]:
+        return self._names.get(alias_key(name))
+
+    def options(self, name: str) -> Dict[str, str]:
+        prop = self.properties[name]
+        return {alias_key(option["name"]): option["name"] for option in (prop.get(prop["type"]) or {}).get("options", [])}
+
+    def normalize(self, properties: Dict[str, Any], allow_new_options: bool = True) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        """
+        Rename properties to the database's names, convert values to the database's types and map
+        select options to existing ones. Properties the database lacks (or can't be written) are dropped.
+        Returns the properties and, per select property, the option names that don't exist yet;
+        without `allow_new_options` those values are dropped instead.
+        """
+        normalized, missing = {}, {}
+        for name, value in properties.items():
+            kind, plain = _plain_value(value)
+            target = self.resolve(name)
+            if target is None and kind == "title":
+                target = self.title_name
+            if target is None:
+                logger.warning(f"Notion database has no property {name!r}, leaving it out")
+                continue
+            target_type = self.properties[target].get("type")
+            if target_type not in _WRITABLE:
+                logger.warning(f"Notion property {target!r} is a {target_type} property, leaving it out")
+                continue
+
+            converted = self._convert(target, target_type, kind, plain, allow_new_options, missing)
+            if converted is not None:
+                normalized[target] = converted
+        return normalized, missing
+
+    def _convert(self, target: str, target_type: str, kind: Optional[str], plain: Any, allow_new_options: bool,
+                 missing: Dict[str, List[str]]) -> Optional[Dict[str, Any]]:
+        values = plain if isinstance(plain, list) else ([] if plain in (None, "") else [plain])
+        if target_type in ("title", "rich_text"):
+            return {target_type: rich_text(", ".join(str(value) for value in values))}
+        if target_type in ("select", "multi_select", "status"):
+            options = self.options(target)
+            names = []
+            for value in values:
+                name = option_name(value)
+                existing = options.get(alias_key(name))
+                if existing:
+                    names.append(existing)
+                elif name and target_type != "status" and allow_new_options:
+                    # Status options can't be created through the API
+                    names.append(name)
+                    missing.setdefault(target, []).append(name)
+                elif name:
+                    logger.warning(f"Notion property {target!r} has no option {name!r}, leaving it out")
+            names = list(dict.fromkeys(names))
+            if target_type == "multi_select":
+                return {"multi_select": [{"name": name} for name in names]}
+            return {target_type: {"name": names[0]} if names else None}
+        if target_type == "number":
+            if not values or isinstance(values[0], (int, float)):
+                return {"number": values[0] if values else None}
+            try:
+                return {"number": float(values[0])}
+            except (TypeError, ValueError):
+                return None
+        if target_type == "checkbox":
+            return {"checkbox": bool(values and values[0])}
+        if target_type == kind or (target_type in ("url", "email", "phone_number") and kind in ("url", "email", "phone_number", "rich_text", "title")):
+            return {target_type: values[0] if values else None}
+        logger.warning(f"Can't write a {kind} value to Notion {target_type} property {target!r}, leaving it out")
+        return None
+
+
+class NotionSchemaCache:
+    """The database schema, fetched on first use and again after `ttl` seconds or a refresh"""
+
+    def __init__(self, fetch: Callable[[], Optional[Dict[str, Any]]], ttl: float = None, clock=time.monotonic):
+        # fetch() returns the database's "properties" object, or None when it can't be read
+        self.fetch = fetch
+        self.ttl = Config.NOTION_SCHEMA_TTL if ttl is None else ttl
+        self.clock = clock
+        self.schema: Optional[NotionSchema] = None
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, refresh: bool = False) -> Optional[NotionSchema]:
+        with self._lock:
+            if refresh or self.clock() - self._fetched_at > self.ttl:
+                try:
+                    properties = self.fetch()
+                except Exception as e:
+                    logger.error(f"Could not fetch the Notion database schema: {e}")
+                    properties = None
+                if properties is not None:
+                    self.schema = NotionSchema(properties)
+                    logger.info(f"Loaded Notion database schema with {len(properties)} properties")
+                # A failed fetch keeps the previous schema (or none) until the TTL runs out again
+                self._fetched_at = self.clock()
+            return self.schema
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = float("-inf")
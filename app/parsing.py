@@ -0,0 +1,173 @@
+import logging
+import threading
+from typing import Dict, Iterator, List
+
+from bs4 import BeautifulSoup
+
+from .config import Config
+from .html_stream import CHUNK_SIZE, iter_html_text
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text is not part of the report
+_SKIPPED = ("script", "style")
+
+
+class HTMLBackend:
+    """The few HTML operations the pipeline needs, implemented per parser library"""
+
+    name = ""
+
+    def image_sources(self, html: str) -> List[str]:
+        raise NotImplementedError
+
+    def strip_scripts(self, html: str) -> str:
+        raise NotImplementedError
+
+    def iter_text(self, html: str) -> Iterator[str]:
+        """Non-empty, stripped text nodes in document order"""
+        raise NotImplementedError
+
+
+class SoupBackend(HTMLBackend):
+    """BeautifulSoup on top of html.parser or lxml"""
+
+    def __init__(self, features: str):
+        self.name = features
+        self.features = features
+
+    def soup(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html or "", self.features)
+
+    def image_sources(self, html: str) -> List[str]:
+        return [img["src"] for img in self.soup(html).find_all("img") if img.get("src")]
+
+    def strip_scripts(self, html: str) -> str:
+        soup = self.soup(html)
+        for script in soup.find_all("script"):
+            script.decompose()
+        if self.features != "html.parser" and soup.body and "<body" not in (html or "")[:2000].lower():
+            # lxml wraps fragments in <html><body>; keep the fragment as it was
+            return soup.body.decode_contents()
+        return str(soup)
+
+    def iter_text(self, html: str) -> Iterator[str]:
+        if self.features == "lxml":
+            return _iter_lxml_text(html)
+        return iter_html_text(html)
+
+
+class _LxmlTextTarget:
+    """lxml parser target collecting text nodes from parse events, without building a tree"""
+
+    def __init__(self):
+        self.pending: List[str] = []
+        self._text: List[str] = []
+        self._skip_depth = 0
+
+    def flush(self):
+        if self._text:
+            text = "".join(self._text).strip()
+            self._text = []
+            if text and not self._skip_depth:
+                self.pending.append(text)
+
+    def start(self, tag, attrib):
+        self.flush()
+        if tag in _SKIPPED:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self.flush()
+        if tag in _SKIPPED and self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        self._text.append(data)
+
+    def comment(self, text):
+        self.flush()
+
+    def close(self):
+        self.flush()
+
+
+def _iter_lxml_text(html: str) -> Iterator[str]:
+    from lxml import etree
+
+    target = _LxmlTextTarget()
+    parser = etree.HTMLParser(target=target)
+    html = html or ""
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if target.pending:
+            yield from target.pending
+            target.pending = []
+    if html:
+        parser.close()
+    yield from target.pending
+
+
+class SelectolaxBackend(HTMLBackend):
+    """selectolax (Lexbor), the fastest option when the optional package is installed"""
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self._parser = LexborHTMLParser
+
+    def image_sources(self, html: str) -> List[str]:
+        return [node.attributes["src"] for node in self._parser(html or "").css("img") if node.attributes.get("src")]
+
+    def strip_scripts(self, html: str) -> str:
+        tree = self._parser(html or "")
+        tree.strip_tags(["script"])
+        if tree.body is not None and "<body" not in (html or "")[:2000].lower():
+            return "".join(node.html or "" for node in tree.body.iter(include_text=True))
+        return tree.html or ""
+
+    def iter_text(self, html: str) -> Iterator[str]:
+        tree = self._parser(html or "")
+        tree.strip_tags(list(_SKIPPED))
+        root = tree.body if tree.body is not None else tree.root
+        if root is None:
+            return
+        for node in root.traverse(include_text=True):
+            if node.tag == "-text":
+                text = (node.text_content or "").strip()
+                if text:
+                    yield text
+
+
+BACKENDS = ("html.parser", "lxml", "selectolax")
+
+_backends: Dict[str, HTMLBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_html_backend(name: str = None) -> HTMLBackend:
+    """Backend named by HTML_PARSER, falling back to lxml and then html.parser when a library is missing"""
+    name = name or Config.HTML_PARSER
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = _create_backend(name)
+        return _backends[name]
+
+
+def _create_backend(name: str) -> HTMLBackend:
+    if name == "selectolax":
+        try:
+            return SelectolaxBackend()
+        except ImportError:
+            logger.warning("selectolax is not installed, using lxml")
+            name = "lxml"
+    if name == "lxml":
+        try:
+            import lxml  # noqa: F401
+            return SoupBackend("lxml")
+        except ImportError:
+            logger.warning("lxml is not installed, using html.parser")
+    elif name != "html.parser":
+        logger.warning(f"Unknown HTML_PARSER {name!r}, using html.parser")
+    return SoupBackend("html.parser")
@@ -0,0 +1,331 @@
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit durations such as '7.66s', '2m59.56s' or '120' into seconds"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+
+    multipliers = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * multipliers[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilling token bucket"""
+
+    def __init__(self, capacity: float, period: float = 60.0, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.period = period
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated_at = clock()
+
+    @property
+    def refill_rate(self) -> float:
+        return self.capacity / self.period
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (requests larger than the bucket wait for a full bucket)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def set_capacity(self, capacity: float):
+        self._refill()
+        self.capacity = float(capacity)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def set_remaining(self, remaining: float):
+        """Align the bucket with the server's view of what is left"""
+        self._refill()
+        self.tokens = min(self.capacity, float(remaining))
+
+
+class RateLimitScheduler:
+    """
+    Client-side scheduler for an API with requests/minute and tokens/minute limits.
+
+    Callers queue in FIFO order in `acquire` until both buckets have room,
+    the buckets are re-synchronised from the API's rate-limit headers, and
+    429/5xx responses pause the whole queue for `retry-after`.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        period: float = 60.0,
+        clock=time.monotonic,
+    ):
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, period, clock)
+        self.tokens = TokenBucket(tokens_per_minute, period, clock)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.blocked_until = 0.0
+
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    def _wait_time(self, tokens: int) -> float:
+        return max(
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+            self.blocked_until - self.clock(),
+            0.0,
+        )
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request estimated at `tokens` tokens may be sent; returns the time spent queued"""
+        started = self.clock()
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+
+            while True:
+                wait = None
+                if ticket == self._serving:
+                    wait = self._wait_time(tokens)
+                    if wait <= 0:
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        self._serving += 1
+                        self._cond.notify_all()
+                        break
+                self._cond.wait(timeout=wait)
+
+        waited = self.clock() - started
+        if waited > 1:
+            logger.info(f"Rate limiter queued request for {waited:.1f}s")
+        return waited
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]):
+        """
+        Re-synchronise with `x-ratelimit-*` response headers.
+
+        Token headers describe the per-minute window; request headers describe
+        the (daily) request quota, so they only matter once it is exhausted.
+        """
+        if not headers:
+            return
+
+        def header(name):
+            value = headers.get(name)
+            return None if value is None else str(value)
+
+        with self._cond:
+            limit_tokens = header("x-ratelimit-limit-tokens")
+            remaining_tokens = header("x-ratelimit-remaining-tokens")
+            if limit_tokens and limit_tokens.isdigit():
+                self.tokens.set_capacity(int(limit_tokens))
+            if remaining_tokens and remaining_tokens.isdigit():
+                self.tokens.set_remaining(int(remaining_tokens))
+
+            remaining_requests = header("x-ratelimit-remaining-requests")
+            if remaining_requests == "0":
+                reset = parse_duration(header("x-ratelimit-reset-requests"))
+                if reset:
+                    self._block_for(reset)
+
+            self._cond.notify_all()
+
+    def penalize(self, retry_after: Optional[float]):
+        """Pause every queued request after the server rejected one"""
+        if not retry_after:
+            return
+        with self._cond:
+            self._block_for(retry_after)
+            self._cond.notify_all()
+
+    def _block_for(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Jittered exponential backoff; `retry-after` from the server takes precedence"""
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class PriorityRateLimiter:
+    """
+    Requests-per-second token bucket shared by every caller of one API.
+
+    Waiting callers are served by priority (lower value first), then in arrival
+    order; `penalize` pauses the whole queue after a 429, and the time each
+    caller spent queued is kept per priority for metrics.
+    """
+
+    def __init__(self, rate: float, burst: float = None, names: Mapping[int, str] = None, clock=time.monotonic):
+        burst = burst or rate
+        self.rate = rate
+        self.clock = clock
+        self.bucket = TokenBucket(burst, burst / rate, clock)
+        self.names = dict(names or {})
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+        self._cond = threading.Condition()
+        self._queue = []
+        self._tickets = itertools.count()
+        self._waits: Dict[int, deque] = defaultdict(lambda: deque(maxlen=1000))
+
+    def acquire(self, priority: int = 0) -> float:
+        """Block until a request may be sent; returns the time spent queued"""
+        started = self.clock()
+        with self._cond:
+            entry = (priority, next(self._tickets))
+            heapq.heappush(self._queue, entry)
+            while True:
+                wait = None
+                if self._queue[0] == entry:
+                    wait = max(self.bucket.wait_time(1), self.blocked_until - self.clock(), 0.0)
+                    if wait <= 0:
+                        self.bucket.consume(1)
+                        heapq.heappop(self._queue)
+                        self._cond.notify_all()
+                        break
+                self._cond.wait(timeout=wait)
+
+            waited = self.clock() - started
+            self._waits[priority].append(waited)
+
+        if waited > 5:
+            logger.info(f"Rate limiter queued {self.names.get(priority, priority)} request for {waited:.1f}s")
+        return waited
+
+    def penalize(self, retry_after: float):
+        """Pause every queued request after the server answered 429"""
+        with self._cond:
+            self.throttled += 1
+            self.blocked_until = max(self.blocked_until, self.clock() + retry_after)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, 429 count and queue wait (ms) per priority"""
+        with self._cond:
+            waits = {priority: sorted(samples) for priority, samples in self._waits.items()}
+            stats = {"rate_per_second": self.rate, "queued": len(self._queue), "throttled": self.throttled}
+
+        stats["wait"] = {
+            self.names.get(priority, str(priority)): {
+                "count": len(samples),
+                "avg_ms": round(sum(samples) / len(samples) * 1000, 1),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 1),
+                "max_ms": round(samples[-1] * 1000, 1),
+            }
+            for priority, samples in sorted(waits.items()) if samples
+        }
+        return stats
+
+
+class DestinationRateLimiter:
+    """
+    Global send rate plus a separate rate per destination (chat, mailbox).
+
+    `acquire(destination)` blocks until both the shared bucket and the
+    destination's own bucket have room, so one busy destination never holds
+    up the others; `penalize` pauses one destination (or all of them) after
+    a 429.
+    """
+
+    def __init__(self, rate: float, burst: float = None,
+                 destination_rate: Callable[[str], Tuple[float, float]] = None, clock=time.monotonic):
+        burst = burst or rate
+        self.rate = rate
+        self.clock = clock
+        self.bucket = TokenBucket(burst, burst / rate, clock)
+        # destination -> (messages per second, burst)
+        self.destination_rate = destination_rate or (lambda destination: (rate, burst))
+        self.throttled = 0
+
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._blocked_until: Dict[Optional[str], float] = {}
+        self._waiting = 0
+
+    def _bucket(self, destination: str) -> TokenBucket:
+        if destination not in self._buckets:
+            rate, burst = self.destination_rate(destination)
+            self._buckets[destination] = TokenBucket(burst, burst / rate, self.clock)
+        return self._buckets[destination]
+
+    def _wait_time(self, destination: str) -> float:
+        now = self.clock()
+        return max(
+            self.bucket.wait_time(1),
+            self._bucket(destination).wait_time(1),
+            self._blocked_until.get(None, 0.0) - now,
+            self._blocked_until.get(destination, 0.0) - now,
+            0.0,
+        )
+
+    def acquire(self, destination: str) -> float:
+        """Block until a message to `destination` may be sent; returns the time spent waiting"""
+        started = self.clock()
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    wait = self._wait_time(destination)
+                    if wait <= 0:
+                        self.bucket.consume(1)
+                        self._bucket(destination).consume(1)
+                        return self.clock() - started
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiting -= 1
+
+    def penalize(self, retry_after: float, destination: str = None):
+        """Pause `destination`, or every destination when None, after the server answered 429"""
+        with self._cond:
+            self.throttled += 1
+            until = self.clock() + retry_after
+            self._blocked_until[destination] = max(self._blocked_until.get(destination, 0.0), until)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"rate_per_second": self.rate, "destinations": len(self._buckets),
+                    "waiting": self._waiting, "throttled": self.throttled}
@@ -0,0 +1,351 @@
+import html
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import html2text
+
+from .cpu_pool import cpu_pool, payload_size
+from .html_stream import read_body
+from .notion_blocks import rich_text, text_blocks
+from .telegram_messages import TelegramMessage, TelegramPart, bold_span, link_span, text_span
+
+logger = logging.getLogger(__name__)
+
+# What each sink shows of the lists; the document itself keeps everything
+LIMITS = {
+    "telegram": {"key_insights": 3},
+    "notion": {"stocks": 10},
+}
+
+SENTIMENT_EMOJI = {"positive": "📈", "negative": "📉", "neutral": "➡️"}
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".gif")
+
+
+@dataclass
+class ReportDocument:
+    """
+    A processed report in the shape every sink needs, built once from create_summary_structure()
+    output. `render(sink)` formats it for Notion, Telegram or email and remembers the result.
+    """
+
+    title: str
+    timestamp: str
+    source_url: Optional[str] = None
+    word_count: int = 0
+    summary: str = ""
+    key_insights: List[str] = field(default_factory=list)
+    sentiment: Optional[str] = None
+    stocks: List[str] = field(default_factory=list)
+    sectors: List[str] = field(default_factory=list)
+    outlook: str = ""
+    risk_factors: List[str] = field(default_factory=list)
+    action_items: List[str] = field(default_factory=list)
+    confidence_level: str = ""
+    # {"url", "kind"} per report image; kind is None when the asset pipeline didn't check it
+    assets: List[Dict[str, Any]] = field(default_factory=list)
+    inline_images: List[Dict[str, Any]] = field(default_factory=list)
+    # Inline text or a BodyStore reference, read only by the sinks that show it
+    original_html: Union[None, str, Dict[str, Any]] = None
+    translated_content: str = ""
+    # The summary this was built from, for Notion properties and the page index
+    data: Dict[str, Any] = field(default_factory=dict, repr=False)
+    size: int = 0
+
+    def __post_init__(self):
+        self._rendered: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_summary(cls, report_data: Dict[str, Any], source_url: str = None) -> "ReportDocument":
+        metadata = report_data.get("metadata", {})
+        analysis = report_data.get("analysis", {})
+        content = report_data.get("content", {})
+        metrics = analysis.get("market_metrics") or {}
+
+        assets = content.get("report_assets")
+        if assets is None:
+            assets = [{"url": url, "kind": None} for url in content.get("report_images") or []]
+
+        return cls(
+            title=metadata.get("title") or "Market Report",
+            timestamp=metadata.get("timestamp") or "Just now",
+            source_url=source_url,
+            word_count=metadata.get("word_count") or 0,
+            summary=analysis.get("summary") or "",
+            key_insights=list(analysis.get("key_insights") or []),
+            sentiment=metrics.get("market_sentiment"),
+            stocks=list(metrics.get("mentioned_stocks") or []),
+            sectors=list(metrics.get("sectors") or []),
+            outlook=analysis.get("outlook") or "",
+            risk_factors=list(analysis.get("risk_factors") or []),
+            action_items=list(analysis.get("action_items") or []),
+            confidence_level=analysis.get("confidence_level") or "",
+            assets=[{"url": asset["url"], "kind": asset.get("kind")} for asset in assets],
+            inline_images=list(content.get("inline_images") or []),
+            original_html=content.get("original_html"),
+            translated_content=content.get("translated_content") or "",
+            data=report_data,
+            size=payload_size(report_data),
+        )
+
+    @classmethod
+    def of(cls, report: Union["ReportDocument", Dict[str, Any]], source_url: str = None) -> "ReportDocument":
+        """The document itself, or one built from a summary dict"""
+        if isinstance(report, ReportDocument):
+            return report
+        return cls.from_summary(report, source_url)
+
+    def render(self, sink: str, **options) -> Any:
+        """Output of the `sink` renderer, computed once per set of options (in the CPU pool when large)"""
+        key = (sink, tuple(sorted(options.items())))
+        with self._lock:
+            if key in self._rendered:
+                return self._rendered[key]
+        size = self.size if sink in _LARGE_SINKS else 0
+        rendered = cpu_pool.run(render_document, size, self, sink, options)
+        with self._lock:
+            self._rendered[key] = rendered
+        return rendered
+
+    def __getstate__(self):
+        # Rendered output and the lock stay in this process
+        state = dict(self.__dict__)
+        state.pop("_rendered", None)
+        state.pop("_lock", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__post_init__()
+
+
+def render_document(document: ReportDocument, sink: str, options: Dict[str, Any]) -> Any:
+    """Module-level entry point so rendering can run in the CPU pool"""
+    return RENDERERS[sink](document, **options)
+
+
+def _is_image(asset: Dict[str, Any]) -> bool:
+    if asset.get("kind"):
+        return asset["kind"] == "image"
+    return asset["url"].lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _heading(text: str) -> Dict[str, Any]:
+    return {"object": "block", "type": "heading_2", "heading_2": {"rich_text": rich_text(text)}}
+
+
+def _block(block_type: str, text: str, **extra) -> Dict[str, Any]:
+    return {"object": "block", "type": block_type, block_type: {"rich_text": rich_text(text), **extra}}
+
+
+def _labelled(label: str, text: str) -> Dict[str, Any]:
+    return {
+        "object": "block",
+        "type": "paragraph",
+        "paragraph": {
+            "rich_text": [
+                {"type": "text", "text": {"content": label}, "annotations": {"bold": True}},
+                *rich_text(text)
+            ]
+        }
+    }
+
+
+def render_notion(document: ReportDocument) -> List[Dict[str, Any]]:
+    """Notion page blocks; long text is split to the API's limits by notion_blocks"""
+    blocks = []
+    try:
+        if document.summary:
+            blocks.extend([_heading("📊 Summary"), _block("paragraph", document.summary)])
+
+        if document.key_insights:
+            blocks.append(_heading("💡 Key Insights"))
+            blocks.extend(_block("bulleted_list_item", insight) for insight in document.key_insights)
+
+        if document.stocks or document.sectors or document.sentiment:
+            blocks.append(_heading("📈 Market Metrics"))
+            if document.stocks:
+                blocks.append(_labelled("**Mentioned Stocks:** ", ", ".join(document.stocks[:LIMITS["notion"]["stocks"]])))
+            if document.sectors:
+                blocks.append(_labelled("**Sectors:** ", ", ".join(document.sectors)))
+
+        if document.outlook:
+            blocks.extend([_heading("🔮 Market Outlook"), _block("paragraph", document.outlook)])
+
+        if document.risk_factors:
+            blocks.append(_heading("⚠️ Risk Factors"))
+            blocks.extend(_block("bulleted_list_item", risk) for risk in document.risk_factors)
+
+        if document.action_items:
+            blocks.append(_heading("✅ Action Items"))
+            blocks.extend(_block("to_do", item, checked=False) for item in document.action_items)
+
+        # Images (checked assets when the asset pipeline ran, raw URLs otherwise)
+        if document.assets:
+            blocks.append(_heading("📷 Gallery"))
+            for asset in document.assets:
+                if _is_image(asset):
+                    blocks.append({"object": "block", "type": "image", "image": {"type": "external", "external": {"url": asset["url"]}}})
+                else:
+                    # Chart pages (like TradingView) are bookmarks
+                    blocks.append({"object": "block", "type": "bookmark", "bookmark": {"url": asset["url"]}})
+
+        # Original report as Markdown-formatted text, in full
+        if document.original_html:
+            converter = html2text.HTML2Text()
+            converter.ignore_links = False
+            converter.body_width = 0  # Prevent word wrapping
+            blocks.extend([
+                _heading("📄 Original Report"),
+                {
+                    "object": "block",
+                    "type": "toggle",
+                    "toggle": {
+                        "rich_text": rich_text("Click to expand full content"),
+                        "children": text_blocks(converter.handle(read_body(document.original_html)))
+                    }
+                }
+            ])
+
+    except Exception as e:
+        logger.error(f"Error building Notion content blocks: {e}")
+        blocks = [_block("paragraph", "Report processed successfully. Error in detailed formatting.")]
+
+    return blocks
+
+
+def render_telegram(document: ReportDocument, notion_url: str = None,
+                    parse_mode: Optional[str] = "MarkdownV2") -> List[TelegramPart]:
+    """Telegram messages escaped for `parse_mode` and split under the length limit"""
+    message = TelegramMessage(parse_mode)
+    message.add(text_span("📊 "), bold_span(document.title))
+
+    summary = [paragraph.strip() for paragraph in (document.summary or "").split("\n\n") if paragraph.strip()]
+    message.add(text_span("📝 "), bold_span("Summary:"), text_span(f"\n{summary[0] if summary else 'Report processed successfully'}"))
+    for paragraph in summary[1:]:
+        message.add(text_span(paragraph))
+
+    if document.key_insights:
+        insights = "".join(f"\n• {insight}" for insight in document.key_insights[:LIMITS["telegram"]["key_insights"]])
+        message.add(text_span("💡 "), bold_span("Key Insights:"), text_span(insights))
+
+    if document.sentiment:
+        emoji = SENTIMENT_EMOJI.get(document.sentiment, "➡️")
+        message.add(text_span(f"{emoji} "), bold_span("Sentiment:"), text_span(f" {document.sentiment.title()}"))
+
+    footer = [text_span("🔗 "), link_span("View in Notion", notion_url), text_span("\n")] if notion_url else []
+    message.add(*footer, text_span(f"⏰ {document.timestamp}"))
+    return message.parts()
+
+
+_EMAIL_STYLE = """
+                body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+                .header { background-color: #f4f4f4; padding: 20px; border-radius: 5px; }
+                .section { margin: 20px 0; }
+                .insights { background-color: #e8f4fd; padding: 15px; border-radius: 5px; }
+                .risks { background-color: #fff3cd; padding: 15px; border-radius: 5px; }
+                .action-items { background-color: #d4edda; padding: 15px; border-radius: 5px; }
+                ul { padding-left: 20px; }
+                .footer { margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; font-size: 12px; color: #666; }
+"""
+_SCROLL_BOX = "max-height: 300px; overflow-y: auto; border: 1px solid #ddd; padding: 15px; background-color: #f9f9f9;"
+
+
+def _html_list(css_class: str, heading: str, items: List[str]) -> str:
+    entries = "".join(f"<li>{html.escape(item)}</li>" for item in items)
+    return f'<div class="section {css_class}"><h2>{heading}</h2><ul>{entries}</ul></div>'
+
+
+def render_email_html(document: ReportDocument) -> str:
+    """HTML email body; the original report is embedded as is, everything else is escaped"""
+    source = html.escape(document.source_url or "")
+    parts = [
+        f"""<!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="utf-8">
+            <title>Market Report</title>
+            <style>{_EMAIL_STYLE}</style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>📊 {html.escape(document.title)}</h1>
+                <p><strong>Source:</strong> <a href="{source}">{source}</a></p>
+                <p><strong>Processed:</strong> {html.escape(document.timestamp)}</p>
+            </div>
+            <div class="section">
+                <h2>📝 Executive Summary</h2>
+                <p>{html.escape(document.summary or 'Summary not available')}</p>
+            </div>"""
+    ]
+
+    if document.key_insights:
+        parts.append(_html_list("insights", "💡 Key Insights", document.key_insights))
+    if document.outlook:
+        parts.append(f'<div class="section"><h2>🔮 Market Outlook</h2><p>{html.escape(document.outlook)}</p></div>')
+    if document.risk_factors:
+        parts.append(_html_list("risks", "⚠️ Risk Factors", document.risk_factors))
+    if document.action_items:
+        parts.append(_html_list("action-items", "✅ Action Items", document.action_items))
+
+    if document.original_html:
+        parts.append(
+            f'<div class="section"><h2>📄 Original Report </h2>'
+            f'<div style="{_SCROLL_BOX}">{read_body(document.original_html)}</div></div>'
+        )
+    if document.translated_content:
+        translated = html.escape(document.translated_content).replace("\n", "<br>")
+        parts.append(
+            f'<div class="section"><h2>📄 Full Report (Translated)</h2>'
+            f'<div style="{_SCROLL_BOX}"><p>{translated}</p></div></div>'
+        )
+
+    parts.append("""
+            <div class="footer">
+                <p>This report was automatically processed by the Market Report AI system.</p>
+            </div>
+        </body>
+        </html>
+        """)
+    return "\n".join(parts)
+
+
+def render_email_text(document: ReportDocument) -> str:
+    """Plain-text email body"""
+    rule = "-" * 20
+    lines = [
+        f"MARKET REPORT: {document.title}",
+        "=" * 50,
+        "",
+        f"Source: {document.source_url}",
+        f"Processed: {document.timestamp}",
+        "",
+        "EXECUTIVE SUMMARY",
+        rule,
+        document.summary or "Summary not available",
+        "",
+    ]
+    sections = [
+        ("KEY INSIGHTS", [f"• {insight}" for insight in document.key_insights]),
+        ("MARKET OUTLOOK", [document.outlook] if document.outlook else []),
+        ("RISK FACTORS", [f"• {risk}" for risk in document.risk_factors]),
+        ("ACTION ITEMS", [f"• {item}" for item in document.action_items]),
+    ]
+    for heading, body in sections:
+        if body:
+            lines.extend([heading, rule, *body, ""])
+    lines.extend(["", "=" * 50, "This report was automatically processed by the Market Report AI system."])
+    return "\n".join(lines)
+
+
+RENDERERS: Dict[str, Callable[..., Any]] = {
+    "notion": render_notion,
+    "telegram": render_telegram,
+    "email_html": render_email_html,
+    "email_text": render_email_text,
+}
+
+# Sinks whose cost grows with the report body; only these are worth the CPU pool
+_LARGE_SINKS = {"notion", "email_html"}
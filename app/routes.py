@@ -1,11 +1,20 @@
 import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from flask import Blueprint, request, jsonify, current_app
+from .config import Config
 from .scraper import scrape_report_wrapper
 from .extractor import ContentExtractor
-from .ai import GroqAIProcessor
-from .notion_client import NotionClient
-from .notifier import TelegramNotifier, EmailNotifier
+from .ai import GroqAIProcessor, is_fallback_analysis
+from .notion_client import NotionClient, notion_limiter
+from .notifier import TelegramNotifier, EmailNotifier, telegram_limiter
+from .similarity import MinHashIndex
+from .assets import AssetPipeline
+from .usage import usage_scope, usage_tracker
+from .report_document import ReportDocument
+from .http_client import get_http_client
+from .cpu_pool import cpu_pool
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +22,21 @@ api = Blueprint('api', __name__)
 
 # Initialize components
 extractor = ContentExtractor()
-ai_processor = GroqAIProcessor()
+ai_processor = GroqAIProcessor.from_config()
 notion_client = NotionClient()
 telegram_notifier = TelegramNotifier()
 email_notifier = EmailNotifier()
+similarity_index = MinHashIndex() if Config.DUPLICATE_DETECTION_ENABLED else None
+asset_pipeline = AssetPipeline() if Config.ASSET_PIPELINE_ENABLED else None
+asset_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="report-assets")
+
+def _analysis_overrides(data):
+    """Optional per-request reasoning tier settings from the payload"""
+    return {
+        key: data[key]
+        for key in ('analysis_tier', 'reasoning_effort', 'max_completion_tokens')
+        if data.get(key) is not None
+    }
 
 @api.route('/health', methods=['GET'])
 def health_check():
@@ -44,6 +64,9 @@ def process_report():
         subject = data.get('subject', 'Market Report')
         send_email = data.get("send_email", True)
         send_telegram_notification = data.get("send_telegram_notification", True)
+        skip_duplicates = data.get("skip_duplicates", False)
+        analysis_overrides = _analysis_overrides(data)
+        request_id = uuid.uuid4().hex
         
         # Try to extract URLs from both HTML and plain text
         urls = []
@@ -71,42 +94,122 @@ def process_report():
             telegram_notifier.send_error_notification(error_msg, target_url)
             return jsonify({'error': error_msg}), 500
         
+        # Fetch and check report images while the AI step runs
+        assets_future = None
+        if asset_pipeline:
+            assets_future = asset_executor.submit(asset_pipeline.process, scrape_report.get('report_images'), target_url)
+        
         # Process content with AI
         content_text = scrape_report['text_content']
         if not content_text.strip():
             content_text = scrape_report['html_content']
         
-        ai_analysis = ai_processor.translate_and_analyze(content_text)
-        full_response = extractor.create_summary_structure(scrape_report, ai_analysis)
+        cleaned_content = extractor.clean_html_content(scrape_report)
+
+        # Reuse the analysis of a near-identical report instead of calling the AI again
+        duplicate = None
+        signature = None
+        if similarity_index:
+            signature = similarity_index.signature(cleaned_content['main_content'])
+            if signature is not None:
+                duplicate = similarity_index.query(cleaned_content['main_content'], signature)
+
+        if duplicate:
+            changed_lines = duplicate.changed_lines(cleaned_content['main_content'])
+            logger.info(f"Near-duplicate of {duplicate.url} ({duplicate.similarity:.0%}), {len(changed_lines)} changed lines")
+            if skip_duplicates:
+                return jsonify({
+                    'success': True,
+                    'skipped': True,
+                    'source_url': target_url,
+                    'duplicate_of': duplicate.url,
+                    'similarity': round(duplicate.similarity, 3),
+                    'changed_lines': changed_lines
+                })
+            ai_analysis = duplicate.analysis
+        else:
+            with usage_scope(request_id=request_id, report_url=target_url):
+                ai_analysis = ai_processor.translate_and_analyze(
+                    content_text,
+                    word_count=cleaned_content['word_count'],
+                    overrides=analysis_overrides
+                )
+            if signature is not None and not is_fallback_analysis(ai_analysis):
+                similarity_index.add(target_url, cleaned_content['main_content'], ai_analysis, signature)
+
+        if assets_future:
+            try:
+                assets = assets_future.result(timeout=Config.ASSET_PIPELINE_TIMEOUT)
+                scrape_report['report_images'] = [asset.url for asset in assets]
+                scrape_report['report_assets'] = [asset.to_dict() for asset in assets]
+            except FutureTimeoutError:
+                logger.error(f"Asset pipeline took longer than {Config.ASSET_PIPELINE_TIMEOUT:.0f}s, using the raw image URLs")
+            except Exception as e:
+                # Fall back to the raw image URLs
+                logger.error(f"Asset pipeline failed: {e}")
+        
+        full_response = extractor.create_summary_structure(scrape_report, ai_analysis, cleaned_content)
+        # Built once; each sink renders from it and the renderings are memoized
+        document = ReportDocument.from_summary(full_response, target_url)
         
         # Save to Notion
-        notion_result = notion_client.create_report_page(full_response, target_url)
+        if Config.NOTION_UPSERT_ENABLED:
+            notion_result = notion_client.upsert_report_page(document, target_url)
+        else:
+            notion_result = notion_client.create_report_page(document, target_url)
         notion_url = notion_result.get('page_url') if notion_result['success'] else None
         
-        # Send Telegram notification
+        # Outcome per chat and per recipient
+        deliveries = {}
+        
+        # Send Telegram notification to every subscribed chat
         telegram_success = False
         if send_telegram_notification: 
-            telegram_success = telegram_notifier.send_notification(full_response, notion_url)
+            deliveries['telegram'] = telegram_notifier.notify_subscribers(document, notion_url)
+            telegram_success = deliveries['telegram']['success']
         
         # Send email
         email_success = False
+        email_queued = False
         if send_email:
-            email_success = email_notifier.send_report_email(full_response, target_url)
+            if Config.EMAIL_BACKGROUND_ENABLED:
+                # Only accepted for delivery so far: success is unknown (null) until the mailer has sent it
+                email_queued = email_notifier.queue_report_email(document, target_url) is not None
+                email_success = None if email_queued else False
+                # The outcome per recipient is logged when the mailer finishes
+                deliveries['email'] = {
+                    'success': email_success,
+                    'queued': email_queued,
+                    'recipients': len(email_notifier.recipient_emails)
+                }
+            else:
+                deliveries['email'] = email_notifier.deliver_report_email(document, target_url)
+                email_success = deliveries['email']['success']
         
         # Prepare response
         response = {
             'success': True,
+            'request_id': request_id,
             'report_title': scrape_report['title'],
             'source_url': target_url,
             'notion_success': notion_result['success'],
             'telegram_success': telegram_success,
             'email_success': email_success,
+            'email_queued': email_queued,
+            'deliveries': deliveries,
             'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
         if notion_url:
             response['notion_url'] = notion_url
         
+        if duplicate:
+            response['duplicate_of'] = duplicate.url
+            response['similarity'] = round(duplicate.similarity, 3)
+            response['changed_lines'] = changed_lines
+        elif Config.USAGE_TRACKING_ENABLED:
+            response['usage'] = usage_tracker.for_request(request_id)
+        
         logger.info(f"Successfully processed report: {scrape_report['title']}")
         return jsonify(response)
         
@@ -150,13 +253,45 @@ def test_ai():
         if not content:
             return jsonify({'error': 'Content is required'}), 400
         
-        result = ai_processor.translate_and_analyze(content)
+        result = ai_processor.translate_and_analyze(content, overrides=_analysis_overrides(data))
         return jsonify(result)
         
     except Exception as e:
         logger.error(f"Test AI error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@api.route('/ai/tiers', methods=['GET'])
+def ai_tier_stats():
+    """Latency and token usage per analysis tier"""
+    return jsonify(ai_processor.policy.stats())
+
+@api.route('/ai/translation-memory', methods=['GET'])
+def translation_memory_stats():
+    """Hit rate and size of the translation memory"""
+    if not ai_processor.translation_memory:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **ai_processor.translation_memory.stats()})
+
+@api.route('/usage', methods=['GET'])
+def usage_summary():
+    """LLM token usage per day, per model and per report"""
+    try:
+        days = max(1, int(request.args.get('days', 7)))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    return jsonify(usage_tracker.summary(days))
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Notion and Telegram rate limiters, HTTP latency per host, CPU pool timings and SMTP sessions"""
+    return jsonify({
+        'notion_rate_limit': notion_limiter.stats(),
+        'http': get_http_client().stats(),
+        'cpu_pool': cpu_pool.stats(),
+        'telegram_rate_limit': telegram_limiter.stats(),
+        'email': email_notifier.mailer.stats()
+    })
+
 @api.route('/test-telegram', methods=['POST'])
 def test_telegram():
     """Test endpoint for Telegram notifications"""
@@ -175,7 +310,9 @@ def test_telegram():
             }
         }
         
-        success = telegram_notifier.send_notification(sample_data, 'https://notion.so/test')
+        # Only the primary chat, like error alerts; subscribers don't get test messages
+        primary = [telegram_notifier.chat_id] if telegram_notifier.chat_id else telegram_notifier.chat_ids[:1]
+        success = telegram_notifier.send_notification(sample_data, 'https://notion.so/test', chat_ids=primary)
         return jsonify({'success': success})
         
     except Exception as e:
@@ -203,7 +340,9 @@ def test_email():
             }
         }
         
-        success = email_notifier.send_report_email(sample_data, 'https://example.com/test')
+        # Only the first recipient; the rest of the list doesn't get test messages
+        success = email_notifier.send_report_email(sample_data, 'https://example.com/test',
+                                                   recipients=email_notifier.recipient_emails[:1])
         return jsonify({'success': success})
         
     except Exception as e:
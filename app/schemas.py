@@ -0,0 +1,218 @@
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+logger = logging.getLogger(__name__)
+
+_CODE_FENCE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_LIST_SEPARATORS = re.compile(r"\n+|;|,(?![^(]*\))")
+_BULLET = re.compile(r"^\s*(?:[-•*]|\d+[.)])\s*")
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, list):
+        return "\n\n".join(_to_text(item) for item in value if _to_text(item))
+    if isinstance(value, dict):
+        return "\n".join(f"{key}: {_to_text(item)}" for key, item in value.items())
+    return str(value)
+
+
+def _to_text_list(value: Any, split_commas: bool = False) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        split = split_commas or "\n" in value or ";" in value
+        items = _LIST_SEPARATORS.split(value) if split else [value]
+    elif isinstance(value, dict):
+        items = list(value.values())
+    elif isinstance(value, (list, tuple, set)):
+        items = list(value)
+    else:
+        items = [value]
+
+    result = []
+    for item in items:
+        if isinstance(item, dict):
+            # e.g. {"ticker": "AAPL", "name": "Apple"}
+            item = item.get("name") or item.get("ticker") or item.get("symbol") or next(iter(item.values()), "")
+        text = _BULLET.sub("", _to_text(item))
+        if text:
+            result.append(text)
+    return result
+
+
+class MarketMetrics(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    mentioned_stocks: List[str] = Field(default_factory=list, description="List of stocks mentioned (one word per stock)")
+    sectors: List[str] = Field(default_factory=list, description="List of sectors discussed (one word per sector)")
+    market_sentiment: str = Field("neutral", description="positive/negative/neutral")
+
+    @field_validator("mentioned_stocks", "sectors", mode="before")
+    @classmethod
+    def _coerce_list(cls, value):
+        return _to_text_list(value, split_commas=True)
+
+    @field_validator("market_sentiment", mode="before")
+    @classmethod
+    def _coerce_sentiment(cls, value):
+        text = _to_text(value).lower()
+        if any(word in text for word in ("pos", "bull", "alcista")):
+            return "positive"
+        if any(word in text for word in ("neg", "bear", "bajista")):
+            return "negative"
+        return "neutral"
+
+
+class ReportAnalysis(BaseModel):
+    """The analysis returned by the model, coerced into the shape every sink expects"""
+
+    model_config = ConfigDict(extra="allow")
+
+    translated_content: str = Field("", description="Full content translated to English")
+    summary: str = Field("", description="Comprehensive 3-4 paragraph summary highlighting the most critical insights")
+    key_insights: List[str] = Field(default_factory=list, description="List of 5-7 most important, actionable and specific insights from the report")
+    market_metrics: MarketMetrics = Field(default_factory=MarketMetrics, description="Object with mentioned_stocks (list), sectors (list) and market_sentiment (positive/negative/neutral)")
+    outlook: str = Field("", description="Brief outlook or predictions mentioned")
+    risk_factors: List[str] = Field(default_factory=list, description="List of risks or concerns mentioned")
+    action_items: List[str] = Field(default_factory=list, description="Specific, concrete and implementable recommendations for investors/traders")
+    confidence_level: str = Field("Low", description="High/Medium/Low - based on data quality and analysis certainty")
+
+    @field_validator("translated_content", "summary", "outlook", mode="before")
+    @classmethod
+    def _coerce_text(cls, value):
+        return _to_text(value)
+
+    @field_validator("key_insights", "risk_factors", "action_items", mode="before")
+    @classmethod
+    def _coerce_list(cls, value):
+        return _to_text_list(value)
+
+    @field_validator("market_metrics", mode="before")
+    @classmethod
+    def _coerce_metrics(cls, value):
+        return value if isinstance(value, (dict, MarketMetrics)) else {}
+
+    @field_validator("confidence_level", mode="before")
+    @classmethod
+    def _coerce_confidence(cls, value):
+        text = _to_text(value).lower()
+        for level in ("high", "medium", "low"):
+            if text.startswith(level) or level in text.split():
+                return level.title()
+        return "Low"
+
+
+# Fields worth a follow-up request when the model leaves them out
+REQUIRED_FIELDS = ("translated_content", "summary", "key_insights", "market_metrics", "outlook", "risk_factors", "action_items", "confidence_level")
+
+
+# Fields that are useless when empty; elsewhere "" or [] is a valid answer (no risks, already English)
+NON_EMPTY_FIELDS = ("summary",)
+
+
+def missing_fields(data: Dict[str, Any], fields=REQUIRED_FIELDS) -> List[str]:
+    """Fields that are absent or null in the raw model output (or empty, for NON_EMPTY_FIELDS)"""
+    missing = []
+    for name in fields:
+        value = data.get(name)
+        if value is None or (name in NON_EMPTY_FIELDS and isinstance(value, (str, list, dict)) and not value):
+            missing.append(name)
+    return missing
+
+
+def describe_fields(fields: List[str]) -> str:
+    """JSON skeleton of the requested fields, for follow-up prompts"""
+    return json.dumps(
+        {name: ReportAnalysis.model_fields[name].description for name in fields},
+        indent=4,
+    )
+
+
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+
+
+def _scan_json(text: str):
+    """Brackets still open at the end of `text`, and whether it ends inside a string"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    return stack, in_string
+
+
+def _close_truncated_json(text: str) -> str:
+    """Close strings and brackets left open by a truncated response"""
+    stack, in_string = _scan_json(text)
+    if not stack:
+        return text
+
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    if stack[-1] == "}":
+        # A key without a value cannot be completed, drop it
+        text = _DANGLING_KEY.sub(lambda match: "{" if match.group(1) == "{" else "", text)
+    elif text.endswith(":"):
+        text = text[:-1]
+
+    stack, _ = _scan_json(text)
+    return text + "".join(reversed(stack))
+
+
+def repair_json(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Best-effort parse of a model response: strips code fences and leading chatter,
+    removes trailing commas and closes truncated output. Returns None if nothing usable.
+    """
+    if not text:
+        return None
+
+    candidate = _CODE_FENCE.sub("", text.strip())
+    start = candidate.find("{")
+    if start == -1:
+        return None
+    candidate = candidate[start:]
+
+    attempts = [candidate]
+    without_commas = _TRAILING_COMMA.sub(r"\1", candidate)
+    attempts.append(without_commas)
+    attempts.append(_TRAILING_COMMA.sub(r"\1", _close_truncated_json(without_commas)))
+
+    for attempt in attempts:
+        try:
+            data = json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            if attempt is not candidate:
+                logger.warning("Repaired malformed JSON from AI response")
+            return data
+
+    # json.loads stops at the first error; decode the longest valid prefix object instead
+    try:
+        data, _ = json.JSONDecoder().raw_decode(candidate)
+        return data if isinstance(data, dict) else None
+    except json.JSONDecodeError:
+        return None
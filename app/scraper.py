@@ -1,9 +1,10 @@
 import asyncio
 import logging
-from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright, Browser, Page
 from typing import Optional, Dict, Any, List
 from .config import Config
+from .html_stream import externalize_data_uris
+from .parsing import get_html_backend
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +12,7 @@ class WebScraper:
     def __init__(self):
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
+        self.logged_in = False
     
     async def __aenter__(self):
         self.playwright = await async_playwright().start()
@@ -35,19 +37,8 @@ class WebScraper:
         try:
             logger.info(f"Starting scrape for URL: {url}")
             
-            # Navigate to the URL
-            response = await self.page.goto("https://protradingskills.com/wp-login.php", wait_until="networkidle", timeout=60000)
-            
-            if not response or not response.ok:
-                raise Exception(f"Failed to load page: {response.status if response else 'No response'}")
-            
-            # Check if login is required
-            if await self._needs_login():
-                await self._handle_login()
-            
-            # Wait for content to load
-            await self.page.wait_for_load_state("networkidle")
-            await asyncio.sleep(2)  # Additional wait for dynamic content
+            # Log in once per browser session
+            await self.login()
             
             # Extract content
             content = await self._extract_content(url)
@@ -59,7 +50,8 @@ class WebScraper:
                 "title": content.get("title"),
                 "html_content": content.get("html"),
                 "text_content": content.get("text"),
-                "report_images": content.get("images")
+                "report_images": content.get("images"),
+                "inline_images": content.get("inline_images", [])
             }
             
         except Exception as e:
@@ -73,6 +65,26 @@ class WebScraper:
                 "report_images": []
             }
     
+    async def login(self):
+        """Open the login page and sign in, unless this session already did"""
+        if self.logged_in:
+            return
+
+        # Navigate to the URL
+        response = await self.page.goto("https://protradingskills.com/wp-login.php", wait_until="networkidle", timeout=60000)
+        
+        if not response or not response.ok:
+            raise Exception(f"Failed to load page: {response.status if response else 'No response'}")
+        
+        # Check if login is required
+        if await self._needs_login():
+            await self._handle_login()
+        
+        # Wait for content to load
+        await self.page.wait_for_load_state("networkidle")
+        await asyncio.sleep(2)  # Additional wait for dynamic content
+        self.logged_in = True
+
     async def _needs_login(self) -> bool:
         """Check if the page requires login"""
         login_input = await self.page.query_selector('input[id="user_login"]')
@@ -109,6 +121,8 @@ class WebScraper:
             
             html_content = await content_element.inner_html()
             html_content = self._clean_scripts(html_content)
+            # Base64 images would otherwise be carried (and copied) with the HTML everywhere
+            html_content, inline_images = externalize_data_uris(html_content)
             text_content = await content_element.inner_text()
             images = self._get_images(html_content)
 
@@ -116,7 +130,8 @@ class WebScraper:
                 "title": title,
                 "html": html_content,
                 "text": text_content,
-                "images": images
+                "images": images,
+                "inline_images": inline_images
             }
             
         except Exception as e:
@@ -129,27 +144,12 @@ class WebScraper:
             }
         
     def _get_images(self, html_report) -> List[str]:
-        soup = BeautifulSoup(html_report, "html.parser")
-
         # Extract external image URLs
-        images = []
-        for img in soup.find_all("img"):
-            src = img.get("src")
-            if src:
-                images.append(src)
-
-        return images
+        return [src for src in get_html_backend().image_sources(html_report) if not src.startswith("cid:")]
     
     def _clean_scripts(self, html): 
-        # Parse the HTML
-        soup = BeautifulSoup(html, 'html.parser')
-
         # Remove all <script> tags and their contents
-        for script in soup.find_all('script'):
-            script.decompose()
-
-        # Cleaned HTML
-        return str(soup)
+        return get_html_backend().strip_scripts(html)
 
 def scrape_report_wrapper(url: str) -> Dict[str, Any]:
     """Synchronous wrapper for async scraping"""
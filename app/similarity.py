@@ -0,0 +1,160 @@
+import base64
+import difflib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 5) -> set:
+    """Overlapping word n-grams of the lower-cased text"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class DuplicateMatch:
+    def __init__(self, key: str, entry: Dict[str, Any], similarity: float):
+        self.key = key
+        self.url = entry.get("url")
+        self.analysis = entry.get("analysis")
+        self.similarity = similarity
+        self._text = entry.get("text")
+
+    @property
+    def text(self) -> str:
+        if not self._text:
+            return ""
+        return zlib.decompress(base64.b64decode(self._text)).decode("utf-8")
+
+    def changed_lines(self, text: str, limit: int = 20) -> List[str]:
+        """Lines added in `text` compared to the indexed version"""
+        diff = difflib.unified_diff(self.text.splitlines(), text.splitlines(), lineterm="", n=0)
+        added = [line[1:].strip() for line in diff if line.startswith("+") and not line.startswith("+++")]
+        return [line for line in added if line][:limit]
+
+
+class MinHashIndex:
+    """
+    Near-duplicate index over report text: word shingles, MinHash signatures
+    and LSH buckets, persisted to a JSON file.
+    """
+
+    def __init__(self, path: str = None, num_perm: int = 64, bands: int = 16, shingle_size: int = 5, threshold: float = None,
+                 min_shingles: int = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path or Config.DUPLICATE_INDEX_PATH
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold if threshold is not None else Config.DUPLICATE_THRESHOLD
+        self.min_shingles = min_shingles if min_shingles is not None else Config.DUPLICATE_MIN_SHINGLES
+
+        # Fixed seed so signatures stay comparable across restarts
+        rng = random.Random(1)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.buckets: Dict[str, List[str]] = {}
+        self._load()
+
+    def signature(self, text: str) -> Optional[List[int]]:
+        """MinHash signature, or None when the text is too short to compare (empty or failed scrapes)"""
+        text_shingles = shingles(text or "", self.shingle_size)
+        if len(text_shingles) < max(1, self.min_shingles):
+            return None
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in text_shingles
+        ]
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        ]
+
+    def _band_keys(self, signature: List[int]) -> List[str]:
+        return [
+            f"{band}:" + hashlib.md5(str(signature[band * self.rows:(band + 1) * self.rows]).encode()).hexdigest()[:16]
+            for band in range(self.bands)
+        ]
+
+    def query(self, text: str, signature: List[int] = None) -> Optional[DuplicateMatch]:
+        """Most similar indexed report at or above the threshold, if any"""
+        signature = signature or self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            candidates = {key for band_key in self._band_keys(signature) for key in self.buckets.get(band_key, [])}
+            best_key, best_similarity = None, 0.0
+            for key in candidates:
+                other = self.entries[key]["signature"]
+                similarity = sum(1 for a, b in zip(signature, other) if a == b) / self.num_perm
+                if similarity > best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is None or best_similarity < self.threshold:
+                return None
+            return DuplicateMatch(best_key, self.entries[best_key], best_similarity)
+
+    def add(self, url: str, text: str, analysis: Dict[str, Any], signature: List[int] = None):
+        signature = signature or self.signature(text)
+        if signature is None:
+            logger.debug(f"Not indexing {url}: too little text to compare")
+            return
+        key = hashlib.sha1(f"{url}\n{text}".encode("utf-8")).hexdigest()[:16]
+        entry = {
+            "url": url,
+            "signature": signature,
+            "analysis": analysis,
+            "text": base64.b64encode(zlib.compress(text.encode("utf-8"))).decode("ascii"),
+            "added_at": time.time(),
+        }
+        with self._lock:
+            self.entries[key] = entry
+            for band_key in self._band_keys(signature):
+                bucket = self.buckets.setdefault(band_key, [])
+                if key not in bucket:
+                    bucket.append(key)
+            self._save()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load similarity index {self.path}: {e}")
+            self.entries = {}
+        for key, entry in self.entries.items():
+            for band_key in self._band_keys(entry["signature"]):
+                self.buckets.setdefault(band_key, []).append(key)
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
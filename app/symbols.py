@@ -0,0 +1,216 @@
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_SPACES = re.compile(r"\s+")
+_PARENTHESES = re.compile(r"^(.*?)\s*\(([^)]*)\)\s*$")
+_TICKER_LIKE = re.compile(r"^[A-Z][A-Z0-9]{0,5}(?:[.\-][A-Z])?$")
+
+# Aliases this short are too ambiguous to look for in running text ("IT", "ES", "MA")
+_MIN_SCAN_LENGTH = 3
+
+
+def alias_key(value: str) -> str:
+    """Lookup key: lower-case, accents removed, whitespace collapsed, surrounding punctuation stripped"""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return _SPACES.sub(" ", value.lower()).strip(" .,;:$*\"'")
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern at word boundaries"""
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: Any):
+        node = 0
+        for char in pattern:
+            node = self.goto[node].get(char) or self._new_node(node, char)
+        self.outputs[node].append((len(pattern), value))
+        self._built = False
+
+    def _new_node(self, parent: int, char: str) -> int:
+        self.goto.append({})
+        self.fail.append(0)
+        self.outputs.append([])
+        self.goto[parent][char] = len(self.goto) - 1
+        return len(self.goto) - 1
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+        self._built = True
+
+    def find(self, text: str) -> Iterable[Tuple[int, int, Any]]:
+        """Yield (start, end, value) for each match that is a whole word in `text`"""
+        if not self._built:
+            self.build()
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            for length, value in self.outputs[node]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    yield start, end, value
+
+
+class SymbolIndex:
+    """
+    Canonical tickers, indices and sectors from a local alias table (app/data/symbols.json).
+    Exact lookups normalise model output; an Aho-Corasick automaton scans report text for mentions.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.SYMBOLS_PATH
+        self.stocks: Dict[str, str] = {}
+        self.sectors: Dict[str, str] = {}
+        self.stock_sectors: Dict[str, str] = {}
+        self._automaton = AhoCorasick()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                table = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not load symbol table {self.path}: {e}")
+            table = {}
+
+        for entry in table.get("stocks", []) + table.get("indices", []):
+            symbol = entry["symbol"]
+            if entry.get("sector"):
+                self.stock_sectors[symbol] = entry["sector"]
+            for alias in [symbol, entry.get("name")] + entry.get("aliases", []):
+                if alias:
+                    self.stocks.setdefault(alias_key(alias), symbol)
+                    # Names and tickers are matched as written, so "meta" or "cat" in prose don't count
+                    self._add_pattern(alias, ("stock", symbol, alias))
+
+        for sector, aliases in table.get("sectors", {}).items():
+            for alias in [sector] + aliases:
+                self.sectors.setdefault(alias_key(alias), sector)
+                self._add_pattern(alias, ("sector", sector, None))
+
+        self._automaton.build()
+        logger.info(f"Loaded {len(self.stocks)} symbol aliases and {len(self.sectors)} sector aliases")
+
+    def _add_pattern(self, alias: str, value):
+        if len(alias) >= _MIN_SCAN_LENGTH:
+            self._automaton.add(alias.lower(), value)
+
+    def normalize_stock(self, value: str) -> Optional[str]:
+        return self._lookup(self.stocks, value)
+
+    def normalize_sector(self, value: str) -> Optional[str]:
+        return self._lookup(self.sectors, value)
+
+    def _lookup(self, table: Dict[str, str], value: str) -> Optional[str]:
+        if not value:
+            return None
+        found = table.get(alias_key(value))
+        if found:
+            return found
+        # "Apple (AAPL)" / "Technology (Software)"
+        match = _PARENTHESES.match(value)
+        if match:
+            return table.get(alias_key(match.group(2))) or table.get(alias_key(match.group(1)))
+        return None
+
+    def scan(self, text: str) -> Dict[str, List[str]]:
+        """Canonical stocks/indices and sectors mentioned in `text`, in order of first mention"""
+        text = text or ""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters change length when lower-cased; keep offsets aligned
+            lowered = "".join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+        stocks, sectors = {}, {}
+        for start, end, (kind, canonical, alias) in self._automaton.find(lowered):
+            if kind == "stock":
+                written = text[start:end]
+                if written != alias and written != alias.upper():
+                    continue
+                stocks.setdefault(canonical)
+                if canonical in self.stock_sectors:
+                    sectors.setdefault(self.stock_sectors[canonical])
+            else:
+                sectors.setdefault(canonical)
+        return {"stocks": list(stocks), "sectors": list(sectors)}
+
+    def normalize_metrics(self, metrics: Dict[str, Any], text: str = None, limit: int = 10) -> Dict[str, Any]:
+        """
+        Map mentioned_stocks and sectors to canonical names and de-duplicate them.
+        Unknown stocks are kept only when they look like a ticker, unknown sectors as given;
+        mentions found in `text` are appended after the model's own list.
+        """
+        stocks, sectors = {}, {}
+        for value in self._split(metrics.get("mentioned_stocks")):
+            symbol = self.normalize_stock(value)
+            if symbol:
+                stocks.setdefault(symbol)
+            elif _TICKER_LIKE.match(value.lstrip("$")):
+                stocks.setdefault(value.lstrip("$"))
+        for value in self._split(metrics.get("sectors")):
+            sector = self.normalize_sector(value) or value.strip().title()
+            sectors.setdefault(sector)
+
+        if text:
+            found = self.scan(text)
+            for symbol in found["stocks"]:
+                stocks.setdefault(symbol)
+            for sector in found["sectors"]:
+                sectors.setdefault(sector)
+
+        return {
+            **metrics,
+            "mentioned_stocks": list(stocks)[:limit],
+            "sectors": list(sectors)[:limit],
+        }
+
+    def _split(self, values) -> List[str]:
+        """Flatten "Category (A, B)" entries the way Notion multi-selects need them"""
+        result = []
+        for value in values or []:
+            value = str(value).strip()
+            match = _PARENTHESES.match(value)
+            if match and "," in match.group(2):
+                result.append(match.group(1))
+                result.extend(item.strip() for item in match.group(2).split(","))
+            elif value:
+                result.append(value)
+        return [value for value in result if value]
+
+
+_default_index: Optional[SymbolIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_symbol_index() -> SymbolIndex:
+    """Process-wide index, loaded on first use"""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = SymbolIndex()
+        return _default_index
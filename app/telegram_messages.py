@@ -0,0 +1,146 @@
+import html
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Bot API limit on message text, in UTF-16 code units
+MAX_MESSAGE_LENGTH = 4096
+PARSE_MODES = ("MarkdownV2", "HTML")
+
+_MARKDOWN_V2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+_MARKDOWN_V2_URL_SPECIAL = re.compile(r"([)\\])")
+_TOKENS = re.compile(r"\S+\s*|\s+")
+
+# (style, text, url): style is "text", "bold" or "link"
+Span = Tuple[str, str, Optional[str]]
+
+
+def utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def escape_markdown_v2(text: str) -> str:
+    return _MARKDOWN_V2_SPECIAL.sub(r"\\\1", text)
+
+
+def _escape_markdown_v2_url(url: str) -> str:
+    return _MARKDOWN_V2_URL_SPECIAL.sub(r"\\\1", url)
+
+
+def text_span(value: str) -> Span:
+    return ("text", value or "", None)
+
+
+def bold_span(value: str) -> Span:
+    return ("bold", value or "", None)
+
+
+def link_span(label: str, url: str) -> Span:
+    return ("link", label, url)
+
+
+def render_span(span: Span, parse_mode: Optional[str]) -> str:
+    """One span escaped and marked up for `parse_mode` (None is plain text)"""
+    style, value, url = span
+    if parse_mode == "MarkdownV2":
+        if style == "bold":
+            return f"*{escape_markdown_v2(value)}*"
+        if style == "link":
+            return f"[{escape_markdown_v2(value)}]({_escape_markdown_v2_url(url)})"
+        return escape_markdown_v2(value)
+    if parse_mode == "HTML":
+        if style == "bold":
+            return f"<b>{html.escape(value, quote=False)}</b>"
+        if style == "link":
+            return f'<a href="{html.escape(url)}">{html.escape(value, quote=False)}</a>'
+        return html.escape(value, quote=False)
+    if style == "link":
+        return f"{value}: {url}"
+    return value
+
+
+@dataclass
+class TelegramPart:
+    """One message of a split notification; `plain` is the fallback when Telegram can't parse `text`"""
+    text: str
+    plain: str
+
+
+class TelegramMessage:
+    """
+    Paragraphs of spans rendered for one parse_mode and split into messages
+    under the length limit, on paragraph boundaries where possible and on
+    word boundaries inside paragraphs that are too long on their own.
+    """
+
+    def __init__(self, parse_mode: Optional[str] = "MarkdownV2", limit: int = MAX_MESSAGE_LENGTH):
+        if parse_mode not in PARSE_MODES + (None,):
+            raise ValueError(f"Unsupported Telegram parse mode: {parse_mode}")
+        self.parse_mode = parse_mode
+        self.limit = limit
+        self.paragraphs: List[List[Span]] = []
+
+    def add(self, *spans: Span) -> "TelegramMessage":
+        if any(span[1] for span in spans):
+            self.paragraphs.append(list(spans))
+        return self
+
+    def _length(self, spans: List[Span]) -> int:
+        # The plain rendering can be longer than the markup (links spell out their URL)
+        return max(utf16_length("".join(render_span(span, mode) for span in spans)) for mode in (self.parse_mode, None))
+
+    def _fit(self, paragraph: List[Span]) -> List[List[Span]]:
+        """The paragraph as one or more pieces that each fit in a message"""
+        if self._length(paragraph) <= self.limit:
+            return [paragraph]
+        pieces, current, size = [], [], 0
+        for style, value, url in paragraph:
+            tokens = [value] if style == "link" else _TOKENS.findall(value)
+            for token in tokens:
+                for chunk in self._chunks((style, token, url)):
+                    length = self._length([chunk])
+                    if current and size + length > self.limit:
+                        pieces.append(current)
+                        current, size = [], 0
+                    current.append(chunk)
+                    size += length
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _chunks(self, span: Span) -> List[Span]:
+        """A single word longer than a message, cut by characters"""
+        style, value, url = span
+        if style == "link" or self._length([span]) <= self.limit:
+            return [span]
+        # Escaping works character by character, so lengths add up
+        overhead = self._length([(style, "", url)])
+        chunks, current, size = [], "", overhead
+        for char in value:
+            length = self._length([("text", char, None)])
+            if current and size + length > self.limit:
+                chunks.append((style, current, url))
+                current, size = "", overhead
+            current += char
+            size += length
+        chunks.append((style, current, url))
+        return chunks
+
+    def parts(self) -> List[TelegramPart]:
+        separator = "\n\n"
+        parts, texts, plains = [], [], []
+        for paragraph in self.paragraphs:
+            for piece in self._fit(paragraph):
+                rendered = "".join(render_span(span, self.parse_mode) for span in piece).strip()
+                plain = "".join(render_span(span, None) for span in piece).strip()
+                if not rendered:
+                    continue
+                if texts and max(utf16_length(separator.join(texts + [rendered])),
+                                 utf16_length(separator.join(plains + [plain]))) > self.limit:
+                    parts.append(TelegramPart(separator.join(texts), separator.join(plains)))
+                    texts, plains = [], []
+                texts.append(rendered)
+                plains.append(plain)
+        if texts:
+            parts.append(TelegramPart(separator.join(texts), separator.join(plains)))
+        return parts
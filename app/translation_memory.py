@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_LINE_BREAKS = re.compile(r"(\n+)")
+_SENTENCE_END = re.compile(r"(?<=[.!?…:])(\s+)(?=[\"“¿¡(]?[A-ZÁÉÍÓÚÑ0-9])")
+_WHITESPACE = re.compile(r"\s+")
+_HAS_LETTERS = re.compile(r"[^\W\d_]{2,}")
+
+
+def segment_text(text: str) -> List[Tuple[str, str]]:
+    """Split text into (sentence, separator) pairs; joining them restores the original text"""
+    segments = []
+    parts = _LINE_BREAKS.split(text)
+    for index in range(0, len(parts), 2):
+        line = parts[index]
+        line_break = parts[index + 1] if index + 1 < len(parts) else ""
+        pieces = _SENTENCE_END.split(line)
+        for piece_index in range(0, len(pieces), 2):
+            sentence = pieces[piece_index]
+            separator = pieces[piece_index + 1] if piece_index + 1 < len(pieces) else ""
+            if piece_index + 1 >= len(pieces):
+                separator += line_break
+            if sentence or separator:
+                segments.append((sentence, separator))
+    return segments
+
+
+def segment_key(segment: str) -> str:
+    normalized = _WHITESPACE.sub(" ", segment).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+class TranslationPlan:
+    """Segments of one report, split into already-translated and still-to-translate"""
+
+    def __init__(self, segments: List[Tuple[str, str]], known: Dict[str, str]):
+        self.segments = segments
+        self.known = known
+        self.missing: Dict[str, str] = {}  # prompt id -> source segment
+        self._ids: List[Optional[str]] = []
+        self.hits = 0
+
+        keys_seen = {}
+        for sentence, _ in segments:
+            key = segment_key(sentence) if _HAS_LETTERS.search(sentence) else None
+            if key is None:
+                self._ids.append(None)
+            elif key in known:
+                self.hits += 1
+                self._ids.append(None)
+            elif key in keys_seen:
+                self._ids.append(keys_seen[key])
+            else:
+                segment_id = f"s{len(self.missing) + 1}"
+                keys_seen[key] = segment_id
+                self.missing[segment_id] = sentence
+                self._ids.append(segment_id)
+
+    def to_dict(self) -> Dict:
+        return {"segments": self.segments, "known": self.known, "missing": self.missing, "ids": self._ids, "hits": self.hits}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TranslationPlan":
+        plan = cls.__new__(cls)
+        plan.segments = [tuple(segment) for segment in data["segments"]]
+        plan.known = data["known"]
+        plan.missing = data["missing"]
+        plan._ids = data["ids"]
+        plan.hits = data["hits"]
+        return plan
+
+    @property
+    def misses(self) -> int:
+        return len(self.missing)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 1.0
+
+    def tagged_text(self) -> str:
+        """Source text with each segment still needing translation prefixed by its [sN] id"""
+        parts = []
+        for (sentence, separator), segment_id in zip(self.segments, self._ids):
+            parts.append(f"[{segment_id}] {sentence}" if segment_id else sentence)
+            parts.append(separator)
+        return "".join(parts)
+
+    def assemble(self, translations: Dict[str, str]) -> str:
+        """Rebuild the full translation from memory plus the model's new segment translations"""
+        parts = []
+        for (sentence, separator), segment_id in zip(self.segments, self._ids):
+            if segment_id:
+                parts.append(translations.get(segment_id) or sentence)
+            elif _HAS_LETTERS.search(sentence):
+                parts.append(self.known.get(segment_key(sentence), sentence))
+            else:
+                parts.append(sentence)
+            parts.append(separator)
+        return "".join(parts)
+
+    def new_entries(self, translations: Dict[str, str]) -> List[Tuple[str, str]]:
+        return [
+            (source, translations[segment_id])
+            for segment_id, source in self.missing.items()
+            if isinstance(translations.get(segment_id), str) and translations[segment_id].strip()
+        ]
+
+
+class TranslationMemory:
+    """Persistent sentence-level store of previous translations (SQLite)"""
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.TRANSLATION_MEMORY_PATH
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.misses = 0
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with sqlite3.connect(self.path, timeout=10) as conn:
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS segments (
+                        key TEXT PRIMARY KEY,
+                        source TEXT NOT NULL,
+                        translation TEXT NOT NULL,
+                        uses INTEGER NOT NULL DEFAULT 0,
+                        updated_at REAL NOT NULL
+                    )"""
+                )
+            self._initialized = True
+        return sqlite3.connect(self.path, timeout=10)
+
+    def plan(self, text: str) -> TranslationPlan:
+        """Segment `text` and look up every segment we have translated before"""
+        segments = segment_text(text)
+        keys = list({segment_key(sentence) for sentence, _ in segments if _HAS_LETTERS.search(sentence)})
+
+        known = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, translation FROM segments WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                known.update(rows)
+            if known:
+                conn.executemany(
+                    "UPDATE segments SET uses = uses + 1 WHERE key = ?",
+                    [(key,) for key in known],
+                )
+
+        plan = TranslationPlan(segments, known)
+        with self._lock:
+            self.lookups += 1
+            self.hits += plan.hits
+            self.misses += plan.misses
+        logger.info(f"Translation memory: {plan.hits} hits, {plan.misses} misses ({plan.hit_rate:.0%} hit rate)")
+        return plan
+
+    def store(self, entries: List[Tuple[str, str]]):
+        if not entries:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                """INSERT INTO segments (key, source, translation, uses, updated_at) VALUES (?, ?, ?, 0, ?)
+                   ON CONFLICT(key) DO UPDATE SET translation = excluded.translation, updated_at = excluded.updated_at""",
+                [(segment_key(source), source, translation, now) for source, translation in entries],
+            )
+
+    def stats(self) -> Dict[str, float]:
+        with self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "segments_stored": size,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+            }
@@ -0,0 +1,194 @@
+import contextvars
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Request/report the current LLM calls are attributed to
+_usage_context: contextvars.ContextVar = contextvars.ContextVar("usage_context", default={})
+
+
+@contextmanager
+def usage_scope(**fields):
+    """Attribute LLM calls made inside the block to e.g. request_id, report_url or stage"""
+    token = _usage_context.set({**_usage_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def current_usage_context() -> Dict[str, Any]:
+    return dict(_usage_context.get())
+
+
+def _percentile(values: List[float], quantile: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class UsageTracker:
+    """Persists token counts and latency of every LLM call (SQLite) and aggregates them"""
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.USAGE_DB_PATH
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if not self._initialized:
+            with self._lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with sqlite3.connect(self.path, timeout=10) as conn:
+                    conn.execute(
+                        """CREATE TABLE IF NOT EXISTS llm_calls (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            created_at REAL NOT NULL,
+                            day TEXT NOT NULL,
+                            request_id TEXT,
+                            report_url TEXT,
+                            stage TEXT,
+                            backend TEXT,
+                            model TEXT,
+                            prompt_tokens INTEGER,
+                            completion_tokens INTEGER,
+                            reasoning_tokens INTEGER,
+                            total_tokens INTEGER,
+                            latency REAL,
+                            success INTEGER NOT NULL DEFAULT 1
+                        )"""
+                    )
+                    # Databases created by versions without these columns
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_calls)")}
+                    for column, definition in (("reasoning_tokens", "INTEGER"), ("success", "INTEGER NOT NULL DEFAULT 1")):
+                        if column not in columns:
+                            conn.execute(f"ALTER TABLE llm_calls ADD COLUMN {column} {definition}")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_request ON llm_calls (request_id)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_day ON llm_calls (day)")
+                self._initialized = True
+        return sqlite3.connect(self.path, timeout=10)
+
+    def record(self, backend: str, model: str, usage: Dict[str, Any], latency: float, success: bool = True, **context):
+        """Store one call, failed ones included; attribution comes from the active usage_scope unless given explicitly"""
+        context = {**current_usage_context(), **context}
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        completion_tokens = usage.get("completion_tokens") or 0
+        # Reasoning models report these inside the completion tokens (kept by the Groq SDK as an extra field)
+        details = usage.get("completion_tokens_details") or {}
+        reasoning_tokens = (details.get("reasoning_tokens") if isinstance(details, dict) else None) or 0
+
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    """INSERT INTO llm_calls (created_at, day, request_id, report_url, stage, backend, model,
+                       prompt_tokens, completion_tokens, reasoning_tokens, total_tokens, latency, success)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (
+                        time.time(),
+                        datetime.now().strftime("%Y-%m-%d"),
+                        context.get("request_id"),
+                        context.get("report_url"),
+                        context.get("stage"),
+                        backend,
+                        model,
+                        prompt_tokens,
+                        completion_tokens,
+                        reasoning_tokens,
+                        usage.get("total_tokens") or prompt_tokens + completion_tokens,
+                        latency,
+                        int(bool(success)),
+                    ),
+                )
+        except sqlite3.Error as e:
+            # Accounting must never break the pipeline
+            logger.error(f"Failed to record LLM usage: {e}")
+
+    def for_request(self, request_id: str) -> Dict[str, Any]:
+        """Totals per stage for one webhook request"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """SELECT stage, COUNT(*), SUM(1 - success), SUM(prompt_tokens), SUM(completion_tokens),
+                          SUM(COALESCE(reasoning_tokens, 0)), SUM(total_tokens), SUM(latency)
+                   FROM llm_calls WHERE request_id = ? GROUP BY stage""",
+                (request_id,),
+            ).fetchall()
+
+        stages = {
+            stage or "unknown": {
+                "calls": calls,
+                "failed_calls": failed,
+                "prompt_tokens": prompt,
+                "completion_tokens": completion,
+                "reasoning_tokens": reasoning,
+                "total_tokens": total,
+                "latency_seconds": round(latency or 0, 2),
+            }
+            for stage, calls, failed, prompt, completion, reasoning, total, latency in rows
+        }
+        return {
+            "total_tokens": sum(stage["total_tokens"] or 0 for stage in stages.values()),
+            "stages": stages,
+        }
+
+    def summary(self, days: int = 7) -> Dict[str, Any]:
+        """Aggregates per day and per model, plus tokens per report"""
+        since = (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+        with self._connect() as conn:
+            per_day = conn.execute(
+                """SELECT day, COUNT(*), SUM(1 - success), SUM(prompt_tokens), SUM(completion_tokens),
+                          SUM(COALESCE(reasoning_tokens, 0)), SUM(total_tokens)
+                   FROM llm_calls WHERE day >= ? GROUP BY day ORDER BY day""",
+                (since,),
+            ).fetchall()
+            per_model = conn.execute(
+                """SELECT model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens), AVG(latency)
+                   FROM llm_calls WHERE day >= ? GROUP BY model ORDER BY model""",
+                (since,),
+            ).fetchall()
+            per_report = conn.execute(
+                """SELECT COALESCE(report_url, request_id), SUM(total_tokens), SUM(latency),
+                          SUM(COALESCE(reasoning_tokens, 0))
+                   FROM llm_calls WHERE day >= ? AND COALESCE(report_url, request_id) IS NOT NULL
+                   GROUP BY COALESCE(report_url, request_id)""",
+                (since,),
+            ).fetchall()
+
+        report_tokens = [row[1] or 0 for row in per_report]
+        report_latency = [row[2] or 0 for row in per_report]
+        report_reasoning = [row[3] or 0 for row in per_report]
+        return {
+            "since": since,
+            "per_day": [
+                {"day": day, "calls": calls, "failed_calls": failed, "prompt_tokens": prompt,
+                 "completion_tokens": completion, "reasoning_tokens": reasoning, "total_tokens": total}
+                for day, calls, failed, prompt, completion, reasoning, total in per_day
+            ],
+            "per_model": [
+                {"model": model, "calls": calls, "prompt_tokens": prompt, "completion_tokens": completion,
+                 "total_tokens": total, "avg_latency": round(latency or 0, 2)}
+                for model, calls, prompt, completion, total, latency in per_model
+            ],
+            "per_report": {
+                "reports": len(per_report),
+                "avg_tokens": round(sum(report_tokens) / len(report_tokens)) if report_tokens else None,
+                "p95_tokens": _percentile(report_tokens, 0.95),
+                "avg_reasoning_tokens": round(sum(report_reasoning) / len(report_reasoning)) if report_reasoning else None,
+                "p95_latency": round(_percentile(report_latency, 0.95), 2) if report_latency else None,
+            },
+        }
+
+
+usage_tracker = UsageTracker()
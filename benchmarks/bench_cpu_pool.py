@@ -0,0 +1,86 @@
+"""
+CPU-bound pipeline steps inline vs in the CPU pool, under concurrent load.
+
+    python -m benchmarks.bench_cpu_pool [--requests 8] [--threads 4] [--paragraphs 4000]
+
+Each simulated request cleans a large report's HTML, builds its Notion
+blocks and renders the email. Meanwhile a probe thread measures how long
+a trivial task waits for the GIL, which is what other requests in a
+threaded worker experience.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.cpu_pool import CPUPool, payload_size
+from app.extractor import clean_html
+from app.report_document import ReportDocument, render_document
+from benchmarks.bench_parsers import make_report
+
+
+def make_report_data(html: str):
+    cleaned = clean_html("Benchmark report", html)
+    return {
+        "metadata": {"title": "Benchmark report", "word_count": cleaned["word_count"], "timestamp": "now"},
+        "content": {"original_text": cleaned["main_content"], "original_html": html,
+                    "translated_content": cleaned["main_content"], "report_images": []},
+        "analysis": {"summary": "Summary", "key_insights": ["One", "Two"], "market_metrics": {},
+                     "outlook": "Flat", "risk_factors": ["Rates"], "action_items": ["Wait"], "confidence_level": "Medium"},
+    }
+
+
+def handle_request(pool: CPUPool, html: str, report_data):
+    pool.run(clean_html, len(html), "Benchmark report", html)
+    size = payload_size(report_data)
+    document = ReportDocument.from_summary(report_data, "https://example.com/report")
+    pool.run(render_document, size, document, "notion", {})
+    pool.run(render_document, size, document, "email_html", {})
+
+
+def probe(stop: threading.Event, lags: list, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        time.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+def run(pool: CPUPool, html: str, report_data, requests: int, threads: int):
+    lags, stop = [], threading.Event()
+    prober = threading.Thread(target=probe, args=(stop, lags))
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: handle_request(pool, html, report_data), range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    lags.sort()
+    return elapsed, lags[int(0.95 * (len(lags) - 1))], lags[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--paragraphs", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    html = make_report(args.paragraphs)
+    report_data = make_report_data(html)
+    print(f"Report: {len(html) / 1024:.0f} KiB HTML, {args.requests} requests on {args.threads} threads")
+
+    inline = CPUPool(enabled=False)
+    pooled = CPUPool(enabled=True, max_workers=args.workers, inline_threshold=0)
+    pooled.start()
+    try:
+        for name, pool in (("inline", inline), (f"pool x{args.workers}", pooled)):
+            elapsed, p95_lag, max_lag = run(pool, html, report_data, args.requests, args.threads)
+            print(f"{name:<10} total {elapsed:6.2f}s  probe lag p95 {p95_lag * 1000:7.1f} ms  max {max_lag * 1000:7.1f} ms")
+    finally:
+        pooled.shutdown()
+
+
+if __name__ == "__main__":
+    main()
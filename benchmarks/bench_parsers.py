@@ -0,0 +1,103 @@
+"""
+Parse time and output equivalence of the HTML parser backends.
+
+    python -m benchmarks.bench_parsers [--corpus DIR] [--repeat 3]
+
+The corpus is every *.html file in DIR plus the reports recorded by the
+backfill (data/backfill/reports/*.json). Without any recorded HTML a
+synthetic report and marketing email are used. Outputs are compared
+with html.parser, the reference backend.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+from app.config import Config
+from app.parsing import BACKENDS, get_html_backend
+from benchmarks.bench_urls import make_email
+
+OPERATIONS = {
+    "text": lambda backend, html: list(backend.iter_text(html)),
+    "images": lambda backend, html: backend.image_sources(html),
+    "strip_scripts": lambda backend, html: backend.strip_scripts(html),
+}
+
+
+def make_report(paragraphs: int = 400) -> str:
+    body = "".join(
+        f"<h3>Sección {i}</h3><p>El S&amp;P 500 cotiza en <b>{4500 + i}</b> puntos; soporte en {4400 + i}.</p>"
+        f"<p><img src=\"https://protradingskills.com/wp-content/uploads/chart-{i}.png\" width=\"600\"></p>"
+        f"<script>track({i});</script>"
+        for i in range(paragraphs)
+    )
+    return f'<div class="entry-content">{body}</div>'
+
+
+def load_corpus(directory: str = None):
+    corpus = {}
+    if directory:
+        for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                corpus[os.path.basename(path)] = f.read()
+    for path in sorted(glob.glob(os.path.join(Config.BACKFILL_STATE_DIR, "reports", "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            html = json.load(f).get("html_content")
+        if html:
+            corpus[f"backfill/{os.path.basename(path)}"] = html
+    if not corpus:
+        corpus = {"synthetic-report": make_report(), "synthetic-email": make_email(2000)}
+    return corpus
+
+
+def timed(func, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="directory of recorded .html files")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"Corpus: {len(corpus)} documents, {sum(map(len, corpus.values())) / 1024:.0f} KiB")
+
+    backends = {}
+    for name in BACKENDS:
+        backend = get_html_backend(name)
+        if backend.name == name:
+            backends[name] = backend
+        else:
+            print(f"{name}: not installed, skipped")
+
+    reference = backends["html.parser"]
+    print(f"{'backend':<12} {'operation':<14} {'total ms':>10} {'speedup':>8}  equivalent")
+    for operation, run in OPERATIONS.items():
+        baseline = None
+        for name, backend in backends.items():
+            total, mismatches = 0.0, []
+            for document, html in corpus.items():
+                elapsed, result = timed(lambda: run(backend, html), args.repeat)
+                total += elapsed
+                # Serialised HTML differs in formatting between parsers; compare its text instead
+                if operation == "strip_scripts":
+                    result = list(reference.iter_text(result))
+                    expected = list(reference.iter_text(reference.strip_scripts(html)))
+                else:
+                    expected = run(reference, html)
+                if result != expected:
+                    mismatches.append(document)
+            baseline = baseline or total
+            equivalent = "yes" if not mismatches else f"no ({', '.join(mismatches[:3])})"
+            print(f"{name:<12} {operation:<14} {total * 1000:>10.1f} {baseline / total:>7.1f}x  {equivalent}")
+
+
+if __name__ == "__main__":
+    main()
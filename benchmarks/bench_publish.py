@@ -0,0 +1,94 @@
+"""
+Publishing throughput against the local Notion, Telegram and SMTP stand-ins.
+
+    python -m benchmarks.bench_publish [--reports 10] [--threads 4] [--chats 3] [--recipients 20] [--latency 0.05]
+
+Each report is published to all three sinks the way the /api routes do it,
+with the fakes enforcing the real rate limits. Prints reports per second,
+per-sink latency and how often each service throttled us.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import Config
+from app.http_client import HTTPClient
+from app.notifier import EmailNotifier, TelegramNotifier
+from app.notion_client import NotionClient
+from app.notion_pages import NotionPageIndex
+from app.rate_limit import PriorityRateLimiter
+from app.report_document import ReportDocument
+from benchmarks.bench_cpu_pool import make_report_data
+from benchmarks.bench_parsers import make_report
+from benchmarks.fake_services import Faults, FakeNotionAPI, FakeSMTPServer, FakeTelegramAPI
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[int(share * (len(values) - 1))] if values else 0.0
+
+
+def timed(timings, sink, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings.setdefault(sink, []).append(time.perf_counter() - started)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reports", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--chats", type=int, default=3, help="Telegram subscribers (every third one a group)")
+    parser.add_argument("--recipients", type=int, default=20, help="email subscribers")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.latency / 2, args.error_rate, seed=1)
+    report_data = make_report_data(make_report(args.paragraphs))
+    with FakeNotionAPI(faults) as notion, FakeTelegramAPI(faults) as telegram, FakeSMTPServer(faults) as smtp:
+        http = HTTPClient()
+        notion_client = NotionClient(http=http, limiter=PriorityRateLimiter(Config.NOTION_REQUESTS_PER_SECOND, Config.NOTION_BURST),
+                                     page_index=NotionPageIndex(""))
+        notion_client.base_url = f"{notion.url}/v1"
+        notion_client.database_id = notion.database_id
+        telegram_notifier = TelegramNotifier(http=http)
+        telegram_notifier.base_url = f"{telegram.url}/bot{telegram_notifier.bot_token}"
+        telegram_notifier.chat_ids = [f"-{1001 + i}" if i % 3 == 2 else str(1001 + i) for i in range(args.chats)]
+        email_notifier = EmailNotifier()
+        email_notifier.smtp_server, email_notifier.smtp_port = smtp.host, smtp.port
+        email_notifier.email_address = "bench@example.com"
+        email_notifier.recipient_emails = [f"reader{i}@example.com" for i in range(args.recipients)]
+        email_notifier.email_password = "password"
+
+        timings, failures = {}, {}
+
+        def publish(index):
+            source_url = f"https://example.com/report-{index}"
+            document = ReportDocument.from_summary(report_data, source_url)
+            page = timed(timings, "notion", notion_client.create_report_page, document, source_url)
+            sent = {
+                "notion": page["success"],
+                "telegram": timed(timings, "telegram", telegram_notifier.send_notification, document, page.get("page_url")),
+                "email": timed(timings, "email", email_notifier.send_report_email, document, source_url),
+            }
+            for sink, ok in sent.items():
+                failures[sink] = failures.get(sink, 0) + (not ok)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            list(executor.map(publish, range(args.reports)))
+        elapsed = time.perf_counter() - started
+
+        print(f"{args.reports} reports on {args.threads} threads in {elapsed:.2f}s ({args.reports / elapsed:.2f} reports/s)")
+        throttled = {"notion": notion.throttled, "telegram": telegram.throttled, "email": smtp.throttled}
+        for sink, values in timings.items():
+            print(f"{sink:<9} p50 {percentile(values, 0.5) * 1000:8.1f} ms  p95 {percentile(values, 0.95) * 1000:8.1f} ms"
+                  f"  failed {failures.get(sink, 0)}  throttled {throttled[sink]}")
+        print(f"notion requests {len(notion.requests)}, smtp connections {smtp.connections}, logins {smtp.logins}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Render time per report: one shared document vs rebuilding it for each sink.
+
+    python -m benchmarks.bench_render [--paragraphs 500,2000,8000] [--rounds 5]
+
+"rebuild" converts the summary dict again for every sink, as each sink did
+before; "shared" builds one ReportDocument and renders every sink from it.
+The memoized column is the cost of asking a sink for its output again
+(e.g. the Telegram message after a retry).
+"""
+import argparse
+import time
+
+from app.report_document import RENDERERS, ReportDocument, render_document
+from benchmarks.bench_cpu_pool import make_report_data
+from benchmarks.bench_parsers import make_report
+
+SOURCE_URL = "https://example.com/report"
+
+
+def best_of(rounds: int, func):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def rebuild(report_data):
+    for sink in RENDERERS:
+        render_document(ReportDocument.from_summary(report_data, SOURCE_URL), sink, {})
+
+
+def shared(report_data):
+    document = ReportDocument.from_summary(report_data, SOURCE_URL)
+    for sink in RENDERERS:
+        render_document(document, sink, {})
+
+
+def memoized(document: ReportDocument):
+    for sink in RENDERERS:
+        document.render(sink)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--paragraphs", default="500,2000,8000")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'paragraphs':>10} {'HTML KiB':>9} {'rebuild':>10} {'shared':>10} {'memoized':>10}")
+    for paragraphs in (int(value) for value in args.paragraphs.split(",")):
+        html = make_report(paragraphs)
+        report_data = make_report_data(html)
+        document = ReportDocument.from_summary(report_data, SOURCE_URL)
+        memoized(document)
+        print(
+            f"{paragraphs:>10} {len(html) / 1024:>9.0f}"
+            f" {best_of(args.rounds, lambda: rebuild(report_data)) * 1000:>8.1f}ms"
+            f" {best_of(args.rounds, lambda: shared(report_data)) * 1000:>8.1f}ms"
+            f" {best_of(args.rounds, lambda: memoized(document)) * 1000:>8.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Report link extraction on a large marketing email.
+
+    python -m benchmarks.bench_urls [--links 5000] [--repeat 5]
+
+Compares a full BeautifulSoup parse (the previous implementation) with the
+regex scan in app.links. Redirect resolution is disabled so only parsing is timed.
+"""
+import argparse
+import random
+import time
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from app.links import LinkExtractor, RedirectCache
+
+
+def make_email(links: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(links):
+        if i == links // 2:
+            href = "https://protradingskills.com/analysis/weekly-outlook/?utm_source=email"
+        else:
+            href = f"https://shop.example.com/product/{rng.randrange(10 ** 6)}?utm_campaign=sale&amp;ref={i}"
+        rows.append(
+            f'<tr><td style="padding:8px;font-family:Arial"><img src="https://cdn.example.com/{i}.png" '
+            f'width="120" height="80" alt=""><a href="{href}" style="color:#0a66c2">Offer {i}</a>'
+            f'<p>{"Lorem ipsum dolor sit amet. " * 4}</p></td></tr>'
+        )
+    return f"<html><body><table>{''.join(rows)}</table></body></html>"
+
+
+def extract_with_soup(email_html: str):
+    soup = BeautifulSoup(email_html, "html.parser")
+    urls = []
+    for link in soup.find_all("a", href=True):
+        parsed = urlparse(link["href"])
+        if parsed.netloc.lower() == "protradingskills.com" and parsed.path.startswith("/analysis"):
+            urls.append(link["href"])
+    return urls
+
+
+def timed(func, email_html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(email_html)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--links", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    email_html = make_email(args.links)
+    extractor = LinkExtractor(cache=RedirectCache(path=""), resolve_redirects=False)
+    assert extractor.extract(email_html) == ["https://protradingskills.com/analysis/weekly-outlook/"]
+
+    print(f"Email: {len(email_html) / 1024:.0f} KiB, {args.links} links")
+    soup_time = timed(extract_with_soup, email_html, args.repeat)
+    scan_time = timed(extractor.extract, email_html, args.repeat)
+    print(f"BeautifulSoup: {soup_time * 1000:8.1f} ms")
+    print(f"Regex scan:    {scan_time * 1000:8.1f} ms  ({soup_time / scan_time:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,945 @@
+"""
+Local stand-ins for the Notion, Telegram and SMTP services the app publishes to.
+
+    python -m benchmarks.fake_services [--latency 0.05] [--jitter 0.05] [--error-rate 0.01]
+
+Each fake implements only the endpoints this app calls, enforces the real
+service's size and rate limits, and can add latency and random failures,
+so publishing throughput can be measured without touching real pages,
+chats or mailboxes. Point the app at them with NOTION_BASE_URL,
+TELEGRAM_API_BASE_URL, SMTP_SERVER and SMTP_PORT; the SMTP fake offers
+STARTTLS with a throwaway self-signed certificate made at start-up
+(needs the openssl command).
+"""
+import argparse
+import atexit
+import base64
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import socketserver
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from app.rate_limit import TokenBucket
+
+_certificate: Optional[Tuple[str, str]] = None
+_certificate_lock = threading.Lock()
+
+
+def self_signed_certificate() -> Tuple[str, str]:
+    """(certificate, key) files for localhost, generated once per process and deleted at exit"""
+    global _certificate
+    with _certificate_lock:
+        if _certificate is None:
+            directory = tempfile.mkdtemp(prefix="fake-smtp-")
+            atexit.register(shutil.rmtree, directory, True)
+            certificate, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+            subprocess.run(
+                ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                 "-subj", "/CN=localhost", "-keyout", key, "-out", certificate],
+                check=True, capture_output=True,
+            )
+            _certificate = (certificate, key)
+        return _certificate
+
+# Published limits of the real services (https://developers.notion.com/reference/request-limits,
+# https://core.telegram.org/bots/faq, Gmail SMTP)
+NOTION_RATE = 3.0
+NOTION_MAX_PAYLOAD_BYTES = 500 * 1000
+NOTION_MAX_BLOCKS = 1000
+NOTION_MAX_CHILDREN = 100
+NOTION_MAX_NESTING = 2
+NOTION_MAX_TEXT_LENGTH = 2000
+NOTION_MAX_RICH_TEXT_ITEMS = 100
+TELEGRAM_MAX_TEXT_LENGTH = 4096
+TELEGRAM_GLOBAL_RATE = 30.0
+TELEGRAM_CHAT_RATE = 1.0
+TELEGRAM_GROUP_RATE = 20 / 60
+SMTP_MAX_RECIPIENTS = 100
+SMTP_MAX_MESSAGE_BYTES = 25 * 1024 * 1024
+
+
+def utf16_length(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+class Faults:
+    """Latency and random failures added to every request or SMTP command"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter else 0.0
+        if self.latency or extra:
+            time.sleep(self.latency + extra)
+
+    def failed(self) -> bool:
+        with self._lock:
+            return self.error_rate > 0 and self._random.random() < self.error_rate
+
+
+class RejectingLimiter:
+    """Token bucket that refuses instead of waiting: `check()` is 0 when allowed, else seconds until it would be"""
+
+    def __init__(self, rate: Optional[float], burst: int = 1, clock=time.monotonic):
+        self.bucket = TokenBucket(burst, burst / rate, clock) if rate else None
+        self._lock = threading.Lock()
+
+    def check(self) -> float:
+        if self.bucket is None:
+            return 0.0
+        with self._lock:
+            wait = self.bucket.wait_time(1)
+            if wait == 0:
+                self.bucket.consume(1)
+            return wait
+
+
+class FakeHTTPService:
+    """Threaded keep-alive JSON server; subclasses implement `handle`"""
+
+    def __init__(self, faults: Faults = None, host: str = "127.0.0.1", port: int = 0):
+        self.faults = faults or Faults()
+        self.requests: List[Tuple[str, str]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with service._lock:
+                    service.connections += 1
+
+            def _answer(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                status, body, headers = service._dispatch(self.command, self.path, self.headers, raw)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeHTTPService":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _dispatch(self, method: str, path: str, headers, raw: bytes):
+        self.faults.delay()
+        with self._lock:
+            self.requests.append((method, path))
+        if self.faults.failed():
+            return self.server_error()
+        return self.handle(method, path, headers, raw)
+
+    def server_error(self):
+        raise NotImplementedError
+
+    def handle(self, method: str, path: str, headers, raw: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        raise NotImplementedError
+
+
+DEFAULT_NOTION_SCHEMA = {
+    "Title": {"type": "title"},
+    "Source URL": {"type": "url"},
+    "Date": {"type": "date"},
+    "Status": {"type": "select", "options": ["New", "Processed", "Reviewed"]},
+    "Market Sentiment": {"type": "select", "options": ["Positive", "Neutral", "Negative"]},
+    "Word Count": {"type": "number"},
+    "Confidence Level": {"type": "select", "options": ["High", "Medium", "Low"]},
+    "Sectors": {"type": "multi_select", "options": []},
+    "Stocks": {"type": "multi_select", "options": []},
+}
+
+
+def notion_error(status: int, code: str, message: str, headers: Dict[str, str] = None):
+    return status, {"object": "error", "status": status, "code": code, "message": message}, headers or {}
+
+
+class FakeNotionAPI(FakeHTTPService):
+    """
+    Notion API subset under /v1: databases (read, update options, query),
+    pages (create, update properties) and block children (list, append, delete).
+
+    Requests beyond `rate` per second get 429 with Retry-After; payload, block
+    count, nesting and rich-text limits answer 400 validation_error like Notion.
+    """
+
+    def __init__(self, faults: Faults = None, rate: Optional[float] = NOTION_RATE, burst: int = 3,
+                 database_id: str = "fake-database", schema: Dict[str, Dict[str, Any]] = None, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.limiter = RejectingLimiter(rate, burst)
+        self.database_id = database_id
+        self.schema = json.loads(json.dumps(schema or DEFAULT_NOTION_SCHEMA))
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.blocks: Dict[str, Dict[str, Any]] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.throttled = 0
+        self._store = threading.Lock()
+
+    def server_error(self):
+        return notion_error(503, "service_unavailable", "Notion is unavailable, please try again later.")
+
+    def handle(self, method, path, headers, raw):
+        if len(headers.get("Authorization") or "") <= len("Bearer ") or not headers["Authorization"].startswith("Bearer "):
+            return notion_error(401, "unauthorized", "API token is invalid.")
+        if not headers.get("Notion-Version"):
+            return notion_error(400, "missing_version", "Notion-Version header failed validation.")
+        wait = self.limiter.check()
+        if wait:
+            with self._lock:
+                self.throttled += 1
+            return notion_error(429, "rate_limited", "You have been rate limited. Please try again in a few minutes.",
+                                {"Retry-After": str(math.ceil(wait))})
+        if len(raw) > NOTION_MAX_PAYLOAD_BYTES:
+            return notion_error(413, "payload_too_large", f"Request body too large ({len(raw)} bytes).")
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            return notion_error(400, "invalid_json", "Error parsing JSON body.")
+
+        url = urlsplit(path)
+        parts = url.path.strip("/").split("/")
+        if parts[0] != "v1" or len(parts) < 2:
+            return notion_error(400, "invalid_request_url", "Invalid request URL.")
+        route = (method, parts[1], len(parts))
+        with self._store:
+            if route == ("GET", "databases", 3):
+                return self._get_database(parts[2])
+            if route == ("PATCH", "databases", 3):
+                return self._update_database(parts[2], payload)
+            if route == ("POST", "databases", 4) and parts[3] == "query":
+                return self._query(parts[2], payload)
+            if route == ("POST", "pages", 2):
+                return self._create_page(payload)
+            if route == ("PATCH", "pages", 3):
+                return self._update_page(parts[2], payload)
+            if route == ("GET", "blocks", 4) and parts[3] == "children":
+                return self._list_children(parts[2], parse_qs(url.query))
+            if route == ("PATCH", "blocks", 4) and parts[3] == "children":
+                return self._append(parts[2], payload.get("children"))
+            if route == ("DELETE", "blocks", 3):
+                return self._delete(parts[2])
+        return notion_error(400, "invalid_request_url", "Invalid request URL.")
+
+    def _database(self):
+        properties = {}
+        for name, spec in self.schema.items():
+            config = {"options": [{"id": f"{name}-{option}", "name": option} for option in spec["options"]]} if "options" in spec else {}
+            properties[name] = {"id": name, "name": name, "type": spec["type"], spec["type"]: config}
+        return {"object": "database", "id": self.database_id, "properties": properties}
+
+    def _get_database(self, database_id):
+        if database_id != self.database_id:
+            return notion_error(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        return 200, self._database(), {}
+
+    def _update_database(self, database_id, payload):
+        if database_id != self.database_id:
+            return notion_error(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        for name, update in (payload.get("properties") or {}).items():
+            spec = self.schema.get(name)
+            if spec is None or "options" not in spec:
+                return notion_error(400, "validation_error", f"{name} is not a select property that exists.")
+            spec["options"] = [option["name"] for option in (update.get(spec["type"]) or {}).get("options", [])]
+        return 200, self._database(), {}
+
+    def _check_properties(self, properties) -> Optional[str]:
+        for name, value in properties.items():
+            spec = self.schema.get(name)
+            if spec is None:
+                return f"{name} is not a property that exists."
+            prop_type = spec["type"]
+            if prop_type not in value:
+                return f"{name} is expected to be {prop_type}."
+            if prop_type in ("select", "status") and value[prop_type] is not None:
+                option = value[prop_type].get("name")
+                if not isinstance(option, str) or not option:
+                    return f"body.properties.{name}.{prop_type}.name should be a string."
+                if "," in option:
+                    return f"Select option names cannot contain commas: {option}."
+            if prop_type == "multi_select":
+                for option in value[prop_type]:
+                    if "," in option.get("name", ""):
+                        return f"Multi-select option names cannot contain commas: {option['name']}."
+        return None
+
+    def _add_options(self, properties):
+        # Like Notion, writing an unknown select option creates it
+        for name, value in properties.items():
+            spec = self.schema[name]
+            if spec["type"] == "select" and value["select"]:
+                options = [value["select"]["name"]]
+            elif spec["type"] == "multi_select":
+                options = [option["name"] for option in value["multi_select"]]
+            else:
+                continue
+            spec["options"].extend(option for option in options if option not in spec["options"])
+
+    def _check_blocks(self, blocks, depth: int = 0, counter: List[int] = None) -> Optional[str]:
+        counter = counter if counter is not None else [0]
+        if not isinstance(blocks, list):
+            return "body.children should be an array."
+        if len(blocks) > NOTION_MAX_CHILDREN:
+            return f"body.children.length should be ≤ `{NOTION_MAX_CHILDREN}`, instead was `{len(blocks)}`."
+        for block in blocks:
+            counter[0] += 1
+            if counter[0] > NOTION_MAX_BLOCKS:
+                return f"A request may contain at most {NOTION_MAX_BLOCKS} blocks."
+            content = block.get(block.get("type"))
+            if not isinstance(content, dict):
+                return f"body.children[].{block.get('type')} should be defined."
+            rich_text = content.get("rich_text") or []
+            if len(rich_text) > NOTION_MAX_RICH_TEXT_ITEMS:
+                return f"rich_text.length should be ≤ `{NOTION_MAX_RICH_TEXT_ITEMS}`, instead was `{len(rich_text)}`."
+            for item in rich_text:
+                length = utf16_length((item.get("text") or {}).get("content", ""))
+                if length > NOTION_MAX_TEXT_LENGTH:
+                    return f"rich_text[].text.content.length should be ≤ `{NOTION_MAX_TEXT_LENGTH}`, instead was `{length}`."
+            if content.get("children"):
+                if depth >= NOTION_MAX_NESTING:
+                    return f"Blocks may be nested at most {NOTION_MAX_NESTING} levels deep in one request."
+                error = self._check_blocks(content["children"], depth + 1, counter)
+                if error:
+                    return error
+        return None
+
+    def _store_blocks(self, parent_id, blocks) -> List[Dict[str, Any]]:
+        created = []
+        for block in blocks:
+            block_id = str(uuid.uuid4())
+            content = dict(block[block["type"]])
+            nested = content.pop("children", None) or []
+            self.blocks[block_id] = {"object": "block", "id": block_id, "type": block["type"], block["type"]: content,
+                                     "has_children": bool(nested), "parent_id": parent_id}
+            self.children.setdefault(parent_id, []).append(block_id)
+            self._store_blocks(block_id, nested)
+            created.append({"object": "block", "id": block_id, "type": block["type"], "has_children": bool(nested)})
+        return created
+
+    def _create_page(self, payload):
+        parent = (payload.get("parent") or {}).get("database_id")
+        if parent != self.database_id:
+            return notion_error(404, "object_not_found", f"Could not find database with ID: {parent}.")
+        properties = payload.get("properties") or {}
+        error = self._check_properties(properties) or self._check_blocks(payload.get("children") or [])
+        if error:
+            return notion_error(400, "validation_error", error)
+        self._add_options(properties)
+        page_id = str(uuid.uuid4())
+        self.pages[page_id] = {
+            "object": "page",
+            "id": page_id,
+            "url": f"https://www.notion.so/{page_id.replace('-', '')}",
+            "created_time": datetime.now(timezone.utc).isoformat(),
+            "archived": False,
+            "properties": properties,
+        }
+        self.children[page_id] = []
+        self._store_blocks(page_id, payload.get("children") or [])
+        return 200, self.pages[page_id], {}
+
+    def _update_page(self, page_id, payload):
+        page = self.pages.get(page_id)
+        if page is None or page["archived"]:
+            return notion_error(404, "object_not_found", f"Could not find page with ID: {page_id}.")
+        properties = payload.get("properties") or {}
+        error = self._check_properties(properties)
+        if error:
+            return notion_error(400, "validation_error", error)
+        self._add_options(properties)
+        page["properties"].update(properties)
+        if "archived" in payload:
+            page["archived"] = bool(payload["archived"])
+        return 200, page, {}
+
+    def _query(self, database_id, payload):
+        if database_id != self.database_id:
+            return notion_error(404, "object_not_found", f"Could not find database with ID: {database_id}.")
+        pages = sorted((page for page in self.pages.values() if not page["archived"]),
+                       key=lambda page: page["created_time"], reverse=True)
+        return 200, self._paginate(pages, payload.get("start_cursor"), payload.get("page_size")), {}
+
+    def _paginate(self, items, cursor, page_size):
+        start = int(cursor) if cursor else 0
+        size = min(int(page_size or NOTION_MAX_CHILDREN), NOTION_MAX_CHILDREN)
+        end = start + size
+        has_more = end < len(items)
+        return {"object": "list", "results": items[start:end], "has_more": has_more, "next_cursor": str(end) if has_more else None}
+
+    def _list_children(self, block_id, query):
+        if block_id not in self.children:
+            return notion_error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        blocks = [self.blocks[child] for child in self.children[block_id]]
+        return 200, self._paginate(blocks, (query.get("start_cursor") or [None])[0], (query.get("page_size") or [None])[0]), {}
+
+    def _append(self, block_id, children):
+        if block_id not in self.children:
+            return notion_error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        error = self._check_blocks(children)
+        if error:
+            return notion_error(400, "validation_error", error)
+        return 200, {"object": "list", "results": self._store_blocks(block_id, children)}, {}
+
+    def _delete(self, block_id):
+        block = self.blocks.pop(block_id, None)
+        if block is None:
+            return notion_error(404, "object_not_found", f"Could not find block with ID: {block_id}.")
+        self.children[block["parent_id"]].remove(block_id)
+        return 200, {**block, "archived": True}, {}
+
+    def page_texts(self, page_id: str) -> List[str]:
+        """Plain text of a page's top-level blocks, in order"""
+        texts = []
+        for block_id in self.children.get(page_id, []):
+            block = self.blocks[block_id]
+            rich_text = block[block["type"]].get("rich_text") or []
+            texts.append("".join((item.get("text") or {}).get("content", "") for item in rich_text))
+        return texts
+
+
+class _TelegramHTML(HTMLParser):
+    TAGS = {"b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "span", "tg-spoiler", "a", "code", "pre",
+            "blockquote", "tg-emoji"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.text = []
+        self.error = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self.TAGS:
+            self.error = self.error or f'Unsupported start tag "{tag}"'
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if not self.stack or self.stack[-1] != tag:
+            self.error = self.error or f'Unexpected end tag "{tag}"'
+        else:
+            self.stack.pop()
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+
+_HTML_ENTITY = re.compile(r"&(lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);")
+_MARKDOWN_V2_RESERVED = set("_*[]()~`>#+-=|{}.!")
+
+
+def _parse_html(text: str) -> Tuple[str, Optional[str]]:
+    for match in re.finditer("&", text):
+        if not _HTML_ENTITY.match(text, match.start()):
+            return "", f"Can't parse entities: unsupported entity at byte offset {match.start()}"
+    stray = re.search(r"<(?![a-zA-Z/])", text)
+    if stray:
+        return "", f"Can't parse entities: unsupported start tag at byte offset {stray.start()}"
+    parser = _TelegramHTML()
+    parser.feed(text)
+    parser.close()
+    if parser.error:
+        return "", f"Can't parse entities: {parser.error}"
+    if parser.stack:
+        return "", f'Can\'t parse entities: Can\'t find end tag corresponding to start tag "{parser.stack[-1]}"'
+    return "".join(parser.text), None
+
+
+def _parse_markdown(text: str) -> Tuple[str, Optional[str]]:
+    """Legacy Markdown: *bold*, _italic_, `code`, ```pre```, [text](url); \\ escapes outside entities"""
+    plain, i = [], 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text) and text[i + 1] in "_*`[":
+            plain.append(text[i + 1])
+            i += 2
+            continue
+        if char in "*_`":
+            marker = "```" if text.startswith("```", i) else char
+            end = text.find(marker, i + len(marker))
+            if end == -1:
+                offset = len(text[:i].encode())
+                return "", f"Can't parse entities: Can't find end of the entity starting at byte offset {offset}"
+            plain.append(text[i + len(marker):end])
+            i = end + len(marker)
+            continue
+        if char == "[":
+            match = re.match(r"\[([^\]]*)\]\(([^)]*)\)", text[i:])
+            if match:
+                plain.append(match.group(1))
+                i += match.end()
+                continue
+        plain.append(char)
+        i += 1
+    return "".join(plain), None
+
+
+def _parse_markdown_v2(text: str) -> Tuple[str, Optional[str]]:
+    """MarkdownV2: every reserved character outside an entity must be escaped with a backslash"""
+    plain, stack, i = [], [], 0
+    while i < len(text):
+        char = text[i]
+        offset = len(text[:i].encode())
+        in_code = bool(stack) and stack[-1] in ("`", "```")
+        if char == "\\":
+            if i + 1 < len(text):
+                plain.append(text[i + 1])
+            i += 2
+            continue
+        if in_code:
+            if text.startswith(stack[-1], i):
+                i += len(stack.pop())
+            else:
+                plain.append(char)
+                i += 1
+            continue
+        marker = next((m for m in ("```", "__", "||", "`", "*", "_", "~") if text.startswith(m, i)), None)
+        if marker:
+            if stack and stack[-1] == marker:
+                stack.pop()
+            else:
+                stack.append(marker)
+            i += len(marker)
+            continue
+        if char == "[":
+            stack.append("[")
+            i += 1
+            continue
+        if char == "]" and stack and stack[-1] == "[":
+            match = re.match(r"\]\(((?:\\.|[^)\\])*)\)", text[i:])
+            if not match:
+                return "", f"Can't parse entities: Can't find end of the URL at byte offset {offset}"
+            stack.pop()
+            i += match.end()
+            continue
+        if char == ">" and (i == 0 or text[i - 1] == "\n"):
+            i += 1
+            continue
+        if char in _MARKDOWN_V2_RESERVED:
+            return "", f"Can't parse entities: Character '{char}' is reserved and must be escaped with the preceding '\\'"
+        plain.append(char)
+        i += 1
+    if stack:
+        return "", f"Can't parse entities: Can't find end of {stack[-1]} entity"
+    return "".join(plain), None
+
+
+def parse_telegram_text(text: str, parse_mode: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Visible text of a message and the Bad Request description Telegram would give, if any"""
+    if not parse_mode:
+        return text, None
+    parsers = {"html": _parse_html, "markdown": _parse_markdown, "markdownv2": _parse_markdown_v2}
+    parser = parsers.get(parse_mode.lower())
+    if parser is None:
+        return "", "Unsupported parse_mode"
+    return parser(text)
+
+
+class FakeTelegramAPI(FakeHTTPService):
+    """
+    Bot API `sendMessage` under /bot<token>/.
+
+    Checks parse_mode entities and the 4096-character limit like Telegram,
+    and answers 429 with parameters.retry_after beyond the global or
+    per-chat message rate (group chats, negative ids, are slower).
+    """
+
+    def __init__(self, faults: Faults = None, token: Optional[str] = None, chat_ids=None,
+                 global_rate: Optional[float] = TELEGRAM_GLOBAL_RATE, chat_rate: Optional[float] = TELEGRAM_CHAT_RATE,
+                 group_rate: Optional[float] = TELEGRAM_GROUP_RATE, chat_burst: int = 3, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.token = token
+        self.chat_ids = {str(chat_id) for chat_id in chat_ids} if chat_ids else None
+        self.global_limiter = RejectingLimiter(global_rate, max(1, int(global_rate or 1)))
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.chat_limiters: Dict[str, RejectingLimiter] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.throttled = 0
+        self._message_ids = itertools.count(1)
+
+    def server_error(self):
+        return 502, {"ok": False, "error_code": 502, "description": "Bad Gateway"}, {}
+
+    def _error(self, code: int, description: str, **parameters):
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return code, body, {}
+
+    def _chat_limiter(self, chat_id: str) -> RejectingLimiter:
+        with self._lock:
+            if chat_id not in self.chat_limiters:
+                rate = self.group_rate if chat_id.startswith("-") else self.chat_rate
+                self.chat_limiters[chat_id] = RejectingLimiter(rate, self.chat_burst)
+            return self.chat_limiters[chat_id]
+
+    def handle(self, method, path, headers, raw):
+        match = re.fullmatch(r"/bot([^/]*)/(\w+)", urlsplit(path).path)
+        if not match or (self.token is not None and match.group(1) != self.token):
+            return self._error(401, "Unauthorized")
+        if match.group(2) != "sendMessage":
+            return self._error(404, "Not Found")
+        try:
+            if (headers.get("Content-Type") or "").startswith("application/json"):
+                payload = json.loads(raw or b"{}")
+            else:
+                payload = {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+        except ValueError:
+            return self._error(400, "Bad Request: can't parse JSON")
+
+        chat_id = str(payload.get("chat_id") or "")
+        if not chat_id or (self.chat_ids is not None and chat_id not in self.chat_ids):
+            return self._error(400, "Bad Request: chat not found")
+        text = payload.get("text") or ""
+        plain, error = parse_telegram_text(text, payload.get("parse_mode"))
+        if error:
+            return self._error(400, f"Bad Request: {error}")
+        if not plain.strip():
+            return self._error(400, "Bad Request: message text is empty")
+        if utf16_length(plain) > TELEGRAM_MAX_TEXT_LENGTH:
+            return self._error(400, "Bad Request: message is too long")
+
+        wait = max(self.global_limiter.check(), self._chat_limiter(chat_id).check())
+        if wait:
+            with self._lock:
+                self.throttled += 1
+            retry_after = math.ceil(wait)
+            return self._error(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+
+        message = {"message_id": next(self._message_ids), "chat": {"id": chat_id}, "date": int(time.time()),
+                   "text": plain, "parse_mode": payload.get("parse_mode")}
+        with self._lock:
+            self.messages.setdefault(chat_id, []).append(message)
+        return 200, {"ok": True, "result": message}, {}
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    server: "_SMTPServer"
+
+    def setup(self):
+        super().setup()
+        self.service = self.server.service
+        self.tls = False
+        self.authenticated = False
+        self.greeted = False
+        self.sent = 0
+        self._reset()
+
+    def _reset(self):
+        self.mail_from = None
+        self.recipients = []
+
+    def reply(self, code: int, *lines: str):
+        lines = lines or ("",)
+        data = "".join(f"{code}{'-' if i < len(lines) - 1 else ' '}{line}\r\n" for i, line in enumerate(lines))
+        self.connection.sendall(data.encode())
+
+    def read_line(self) -> Optional[str]:
+        line = self.rfile.readline(8192)
+        return line.decode("utf-8", "replace").rstrip("\r\n") if line else None
+
+    def handle(self):
+        service = self.service
+        with service._lock:
+            service.connections += 1
+        self.connection.settimeout(service.idle_timeout)
+        self.reply(220, f"{service.hostname} ESMTP fake ready")
+        try:
+            while True:
+                line = self.read_line()
+                if line is None:
+                    return
+                service.faults.delay()
+                command, _, argument = line.partition(" ")
+                with service._lock:
+                    service.commands.append(command.upper())
+                handler = getattr(self, f"smtp_{command.upper()}", None)
+                if handler is None:
+                    self.reply(502, "5.5.1 Unrecognized command.")
+                elif handler(argument.strip()) is False:
+                    return
+        except socket.timeout:
+            self.reply(421, "4.4.2 Connection timed out, closing")
+        except (ConnectionError, ssl.SSLError, OSError):
+            pass
+
+    def smtp_EHLO(self, argument):
+        self._reset()
+        self.greeted = True
+        extensions = [f"SIZE {self.service.max_message_bytes}", "8BITMIME", "PIPELINING", "SMTPUTF8"]
+        if not self.tls:
+            extensions.append("STARTTLS")
+        if self.tls or not self.service.require_tls:
+            extensions.append("AUTH LOGIN PLAIN")
+        self.reply(250, f"{self.service.hostname} at your service", *extensions)
+
+    def smtp_HELO(self, argument):
+        self._reset()
+        self.greeted = True
+        self.reply(250, self.service.hostname)
+
+    def smtp_STARTTLS(self, argument):
+        if self.tls:
+            self.reply(503, "5.5.1 TLS already active.")
+            return
+        self.reply(220, "2.0.0 Ready to start TLS")
+        self.connection = self.service.tls_context.wrap_socket(self.connection, server_side=True)
+        self.rfile = self.connection.makefile("rb")
+        self.tls = True
+        self.greeted = False
+        self._reset()
+
+    def _read_auth_line(self) -> str:
+        line = self.read_line()
+        return base64.b64decode(line or "").decode()
+
+    def smtp_AUTH(self, argument):
+        if self.service.require_tls and not self.tls:
+            self.reply(530, "5.7.0 Must issue a STARTTLS command first.")
+            return
+        mechanism, _, initial = argument.partition(" ")
+        try:
+            if mechanism.upper() == "PLAIN":
+                if not initial:
+                    self.reply(334, "")
+                    initial = self.read_line() or ""
+                _, username, password = base64.b64decode(initial).decode().split("\0")
+            elif mechanism.upper() == "LOGIN":
+                self.reply(334, base64.b64encode(b"Username:").decode())
+                username = self._read_auth_line()
+                self.reply(334, base64.b64encode(b"Password:").decode())
+                password = self._read_auth_line()
+            else:
+                self.reply(504, "5.7.4 Unrecognized authentication type.")
+                return
+        except ValueError:
+            self.reply(501, "5.5.2 Cannot decode response.")
+            return
+        if self.service.credentials is not None and (username, password) != self.service.credentials:
+            self.reply(535, "5.7.8 Username and Password not accepted.")
+            return
+        self.authenticated = True
+        with self.service._lock:
+            self.service.logins += 1
+        self.reply(235, "2.7.0 Accepted")
+
+    def smtp_MAIL(self, argument):
+        match = re.match(r"FROM:\s*<([^>]*)>(.*)", argument, re.IGNORECASE)
+        if not match:
+            self.reply(501, "5.5.4 Syntax: MAIL FROM:<address>")
+            return
+        if self.service.require_auth and not self.authenticated:
+            self.reply(530, "5.7.0 Authentication Required.")
+            return
+        size = re.search(r"SIZE=(\d+)", match.group(2), re.IGNORECASE)
+        if size and int(size.group(1)) > self.service.max_message_bytes:
+            self.reply(552, "5.3.4 Message size exceeds fixed maximum message size.")
+            return
+        if self.service.limiter.check():
+            with self.service._lock:
+                self.service.throttled += 1
+            self.reply(451, "4.7.0 Temporary System Problem. Try again later.")
+            return
+        self.mail_from = match.group(1)
+        self.recipients = []
+        self.reply(250, "2.1.0 OK")
+
+    def smtp_RCPT(self, argument):
+        match = re.match(r"TO:\s*<([^>]*)>", argument, re.IGNORECASE)
+        if self.mail_from is None:
+            self.reply(503, "5.5.1 MAIL first.")
+        elif not match:
+            self.reply(501, "5.5.4 Syntax: RCPT TO:<address>")
+        elif len(self.recipients) >= self.service.max_recipients:
+            self.reply(452, "4.5.3 Your message has too many recipients.")
+        else:
+            self.recipients.append(match.group(1))
+            self.reply(250, "2.1.5 OK")
+
+    def smtp_DATA(self, argument):
+        if not self.recipients:
+            self.reply(503, "5.5.1 RCPT first.")
+            return
+        self.reply(354, "Go ahead")
+        lines, size = [], 0
+        while True:
+            line = self.rfile.readline(8192)
+            if not line or line in (b".\r\n", b".\n"):
+                break
+            line = line[1:] if line.startswith(b"..") else line
+            size += len(line)
+            if size <= self.service.max_message_bytes:
+                lines.append(line)
+        if size > self.service.max_message_bytes:
+            self.reply(552, "5.3.4 Message size exceeds fixed maximum message size.")
+        elif self.service.faults.failed():
+            self.reply(451, "4.3.0 Temporary failure, please try again later.")
+        else:
+            with self.service._lock:
+                self.service.messages.append({"from": self.mail_from, "to": list(self.recipients), "data": b"".join(lines)})
+            self.sent += 1
+            self.reply(250, f"2.0.0 OK {uuid.uuid4().hex[:12]}")
+        self._reset()
+        if self.service.max_messages_per_connection and self.sent >= self.service.max_messages_per_connection:
+            self.reply(421, "4.7.0 Too many messages for this connection, closing")
+            return False
+
+    def smtp_RSET(self, argument):
+        self._reset()
+        self.reply(250, "2.1.5 Flushed")
+
+    def smtp_NOOP(self, argument):
+        self.reply(250, "2.0.0 OK")
+
+    def smtp_QUIT(self, argument):
+        self.reply(221, "2.0.0 closing connection")
+        return False
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class FakeSMTPServer:
+    """
+    ESMTP submission server with STARTTLS (self-signed certificate) and AUTH
+    PLAIN/LOGIN. Accepted messages are kept in `messages`; `connections`
+    and `logins` show how often clients set up a session.
+    """
+
+    def __init__(self, faults: Faults = None, credentials: Optional[Tuple[str, str]] = None,
+                 require_tls: bool = True, require_auth: bool = True, max_recipients: int = SMTP_MAX_RECIPIENTS,
+                 max_message_bytes: int = SMTP_MAX_MESSAGE_BYTES, max_messages_per_connection: Optional[int] = None,
+                 messages_per_second: Optional[float] = None, idle_timeout: Optional[float] = 300,
+                 certificate: Optional[Tuple[str, str]] = None, host: str = "127.0.0.1", port: int = 0):
+        self.faults = faults or Faults()
+        self.credentials = credentials
+        self.require_tls = require_tls
+        self.require_auth = require_auth
+        self.max_recipients = max_recipients
+        self.max_message_bytes = max_message_bytes
+        self.max_messages_per_connection = max_messages_per_connection
+        self.limiter = RejectingLimiter(messages_per_second, max(1, int(messages_per_second or 1)))
+        self.idle_timeout = idle_timeout
+        self.hostname = "smtp.fake.local"
+        self.tls_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        self.tls_context.load_cert_chain(*(certificate or self_signed_certificate()))
+        self.messages: List[Dict[str, Any]] = []
+        self.commands: List[str] = []
+        self.connections = 0
+        self.logins = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self.server = _SMTPServer((host, port), _SMTPHandler)
+        self.server.service = self
+
+    @property
+    def host(self) -> str:
+        return self.server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "FakeSMTPServer":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--notion-port", type=int, default=8701)
+    parser.add_argument("--telegram-port", type=int, default=8702)
+    parser.add_argument("--smtp-port", type=int, default=8725)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a server error")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.jitter, args.error_rate)
+    notion = FakeNotionAPI(faults, host=args.host, port=args.notion_port).start()
+    telegram = FakeTelegramAPI(faults, host=args.host, port=args.telegram_port).start()
+    smtp = FakeSMTPServer(faults, host=args.host, port=args.smtp_port).start()
+    print(f"NOTION_BASE_URL={notion.url}/v1")
+    print(f"NOTION_DATABASE_ID={notion.database_id}")
+    print(f"TELEGRAM_API_BASE_URL={telegram.url}")
+    print(f"SMTP_SERVER={smtp.host}")
+    print(f"SMTP_PORT={smtp.port}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"notion {len(notion.requests)} requests ({notion.throttled} throttled), "
+                  f"telegram {sum(map(len, telegram.messages.values()))} messages ({telegram.throttled} throttled), "
+                  f"smtp {len(smtp.messages)} messages over {smtp.connections} connections")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for service in (notion, telegram, smtp):
+            service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import routes
+from app.ai import AnalysisPolicy
+from app.config import Config
+
+
+def test_tier_follows_word_count_thresholds():
+    policy = AnalysisPolicy(light_max_words=300, standard_max_words=1200)
+    assert policy.choose(300) == {"tier": "light", "reasoning_effort": "low", "max_completion_tokens": 2048}
+    assert policy.choose(301)["tier"] == "standard"
+    assert policy.choose(1200)["tier"] == "standard"
+    assert policy.choose(1201) == {"tier": "deep", "reasoning_effort": "high", "max_completion_tokens": 8192}
+
+    # An explicit 0 is a threshold, not "use the default"
+    assert AnalysisPolicy(light_max_words=0, standard_max_words=0).choose(1)["tier"] == "deep"
+
+
+def test_overrides_are_validated_and_clamped():
+    policy = AnalysisPolicy(light_max_words=300, standard_max_words=1200)
+    settings = policy.choose(100, {"analysis_tier": "deep", "reasoning_effort": "medium", "max_completion_tokens": "1000"})
+    assert settings == {"tier": "deep", "reasoning_effort": "medium", "max_completion_tokens": 1000}
+
+    assert policy.choose(100, {"analysis_tier": "huge", "reasoning_effort": "extreme"})["tier"] == "light"
+    assert policy.choose(100, {"reasoning_effort": "extreme"})["reasoning_effort"] == "low"
+    assert policy.choose(100, {"max_completion_tokens": 0})["max_completion_tokens"] == 256
+    assert policy.choose(100, {"max_completion_tokens": 10})["max_completion_tokens"] == 256
+    assert policy.choose(100, {"max_completion_tokens": 10 ** 9})["max_completion_tokens"] == Config.AI_MAX_COMPLETION_TOKENS
+    assert policy.choose(100, {"max_completion_tokens": "lots"})["max_completion_tokens"] == 2048
+
+
+def test_record_and_stats_per_tier():
+    policy = AnalysisPolicy(light_max_words=300, standard_max_words=1200)
+    light = policy.choose(100)
+    policy.record(light, 100, 1.0, {"completion_tokens": 500})
+    policy.record(light, 200, 3.0, {"completion_tokens": 2048})
+    policy.record(policy.choose(5000), 5000, 10.0)
+
+    stats = policy.stats()
+    assert stats["light"] == {
+        "count": 2,
+        "avg_latency": 2.0,
+        "p95_latency": 3.0,
+        "avg_words": 150,
+        "avg_completion_tokens": 1274,
+        "budget_hits": 1,
+    }
+    assert stats["deep"]["count"] == 1 and stats["deep"]["avg_completion_tokens"] is None
+    assert stats["standard"]["count"] == 0 and stats["standard"]["avg_latency"] is None
+
+
+def test_overrides_from_payload_and_tier_stats_route(monkeypatch):
+    assert routes._analysis_overrides({"analysis_tier": "deep", "max_completion_tokens": 0, "reasoning_effort": None, "x": 1}) == {
+        "analysis_tier": "deep",
+        "max_completion_tokens": 0,
+    }
+
+    policy = AnalysisPolicy(light_max_words=300, standard_max_words=1200)
+    policy.record(policy.choose(100), 100, 1.5)
+    monkeypatch.setattr(routes.ai_processor, "policy", policy)
+    app = Flask(__name__)
+    app.register_blueprint(routes.api, url_prefix="/api")
+
+    response = app.test_client().get("/api/ai/tiers")
+    assert response.status_code == 200
+    assert response.get_json()["light"]["count"] == 1
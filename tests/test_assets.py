@@ -0,0 +1,135 @@
+import os
+import struct
+import sys
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.assets import AssetCache, AssetPipeline, IMAGE, LINK, image_info
+
+
+def png(width, height):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(b"".join(b"\x00" + b"\x00\x00\x00" * width for _ in range(height)))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+class AssetServer:
+    """Serves a few images, a chart page and broken URLs, counting requests"""
+
+    def __init__(self):
+        chart = png(4, 3)
+        self.routes = {
+            "/chart.png": ("image/png", chart),
+            "/copy-of-chart.png": ("image/png", chart),
+            "/other.png": ("image/png", png(2, 2)),
+            "/snapshot/": ("text/html", b"<html>chart</html>"),
+            "/fake.png": ("image/png", b"not really a png"),
+            "/go/snapshot": ("redirect", b"/snapshot/"),
+        }
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                if self.path not in server.routes:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                content_type, body = server.routes[self.path]
+                if content_type == "redirect":
+                    self.send_response(302)
+                    self.send_header("Location", body.decode())
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_image_info_reads_dimensions():
+    assert image_info(png(640, 480)) == ("png", 640, 480)
+    assert image_info(b"GIF89a" + struct.pack("<HH", 10, 20)) == ("gif", 10, 20)
+    assert image_info(b"<html></html>") is None
+
+
+def test_pipeline_keeps_valid_unique_assets_and_caches_them(tmp_path):
+    server = AssetServer()
+    try:
+        pipeline = AssetPipeline(cache=AssetCache(str(tmp_path)))
+        urls = ["/chart.png", "/copy-of-chart.png", "/other.png", "/snapshot/", "/missing.png", "/fake.png", "data:image/png;base64,AAAA"]
+        assets = pipeline.process(urls, base_url=f"{server.url}/analysis/report/")
+
+        assert [(asset.url[len(server.url):], asset.kind) for asset in assets] == [
+            ("/chart.png", IMAGE),
+            ("/other.png", IMAGE),
+            ("/snapshot/", LINK),
+        ]
+        assert (assets[0].width, assets[0].height, assets[0].duplicates) == (4, 3, 1)
+        assert os.path.exists(assets[0].path)
+
+        # A second run serves valid assets from the cache
+        requests_before = server.requests
+        again = AssetPipeline(cache=AssetCache(str(tmp_path))).process(urls, base_url=server.url)
+        assert [asset.url for asset in again] == [asset.url for asset in assets]
+        assert server.requests - requests_before == 2  # only the broken URLs are retried
+    finally:
+        server.close()
+
+
+def test_redirected_chart_links_are_served_from_cache(tmp_path):
+    server = AssetServer()
+    try:
+        url = f"{server.url}/go/snapshot"
+        [asset] = AssetPipeline(cache=AssetCache(str(tmp_path))).process([url])
+        assert (asset.url, asset.kind) == (url, LINK)
+
+        requests_before = server.requests
+        assert [a.url for a in AssetPipeline(cache=AssetCache(str(tmp_path))).process([url])] == [url]
+        assert server.requests == requests_before
+    finally:
+        server.close()
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    server = AssetServer()
+    try:
+        cache = AssetCache(str(tmp_path), max_bytes=len(png(2, 2)))
+        AssetPipeline(cache=cache).process([f"{server.url}/chart.png"])
+        AssetPipeline(cache=cache).process([f"{server.url}/other.png"])
+        assert cache.lookup(f"{server.url}/chart.png") is None
+        assert cache.lookup(f"{server.url}/other.png") is not None
+    finally:
+        server.close()
+
+
+def test_cache_evicts_inline_images_too(tmp_path):
+    inline = tmp_path / "inline"
+    inline.mkdir()
+    old = inline / "old.png"
+    old.write_bytes(b"x" * 100)
+    os.utime(old, (1, 1))
+    recent = inline / "recent.png"
+    recent.write_bytes(b"y" * 100)
+
+    AssetCache(str(tmp_path), max_bytes=150).save()
+    assert not old.exists() and recent.exists()
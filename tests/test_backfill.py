@@ -0,0 +1,156 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ai import GroqAIProcessor
+from app.backfill import ANALYZED, FAILED, PUBLISHED, SCRAPED, Backfill, BackfillState, LocalBatchSubmitter, load_urls
+from app.extractor import ContentExtractor
+
+urls = [
+    "https://protradingskills.com/analysis/report-1/",
+    "https://protradingskills.com/analysis/report-2/",
+    "https://protradingskills.com/analysis/report-3/",
+]
+
+
+class RecordingNotion:
+    def __init__(self):
+        self.pages = []
+
+    def create_report_page(self, analysis, source_url):
+        self.pages.append(source_url)
+        return {"success": True, "page_id": str(len(self.pages)), "page_url": f"https://notion.so/{len(self.pages)}"}
+
+
+def canned_completion(messages, **params):
+    return json.dumps({
+        "translated_content": "Translated",
+        "summary": "Summary",
+        "key_insights": ["Insight"],
+        "market_metrics": {"mentioned_stocks": [], "sectors": [], "market_sentiment": "neutral"},
+        "outlook": "Flat",
+        "risk_factors": ["None"],
+        "action_items": ["Wait"],
+        "confidence_level": "Medium",
+    })
+
+
+def scraped(url):
+    return {
+        "success": True,
+        "url": url,
+        "title": url.rstrip("/").rsplit("/", 1)[-1],
+        "html_content": "<p>El mercado sube.</p>",
+        "text_content": "El mercado sube.",
+        "report_images": [],
+    }
+
+
+def test_load_urls_from_sitemap(tmp_path):
+    sitemap = tmp_path / "sitemap.xml"
+    sitemap.write_text(
+        "<urlset>"
+        f"<url><loc>{urls[0]}</loc></url>"
+        "<url><loc>https://protradingskills.com/about/</loc></url>"
+        f"<url><loc>{urls[0]}</loc></url>"
+        "</urlset>"
+    )
+    assert load_urls(str(sitemap)) == [urls[0]]
+
+
+def test_backfill_publishes_and_resumes(tmp_path):
+    state = BackfillState(str(tmp_path))
+    state.add(urls)
+    notion = RecordingNotion()
+    backfill = Backfill(
+        state,
+        LocalBatchSubmitter(canned_completion),
+        ai_processor=GroqAIProcessor(router=object()),
+        notion_client=notion,
+        extractor=ContentExtractor(),
+        batch_size=2,
+    )
+    for url in urls:
+        backfill.store_scraped(url, scraped(url))
+
+    summary = backfill.run(urls)
+    assert summary["status"] == {PUBLISHED: 3}
+    assert sorted(notion.pages) == sorted(urls)
+    assert summary["processed"]["analyze"] == 3
+
+    # A second run with the same state does not redo any work
+    resumed = Backfill(
+        BackfillState(str(tmp_path)),
+        LocalBatchSubmitter(canned_completion),
+        ai_processor=GroqAIProcessor(router=object()),
+        notion_client=notion,
+        extractor=ContentExtractor(),
+    )
+    summary = resumed.run(urls)
+    assert summary["processed"] == {"scrape": 0, "analyze": 0, "publish": 0}
+    assert len(notion.pages) == 3
+
+
+def test_failed_batch_jobs_are_retried(tmp_path):
+    state = BackfillState(str(tmp_path))
+    state.add(urls[:1])
+    backfill = Backfill(
+        state,
+        LocalBatchSubmitter(lambda messages, **params: None),
+        ai_processor=GroqAIProcessor(router=object()),
+        notion_client=RecordingNotion(),
+        extractor=ContentExtractor(),
+    )
+    backfill.store_scraped(urls[0], scraped(urls[0]))
+    summary = backfill.run(urls[:1])
+    assert summary["status"] == {SCRAPED: 1}
+
+
+class BrokenNotion(RecordingNotion):
+    def create_report_page(self, analysis, source_url):
+        if source_url == urls[1]:
+            raise RuntimeError("connection reset")
+        return super().create_report_page(analysis, source_url)
+
+
+def test_unparseable_analyses_are_never_published(tmp_path):
+    state = BackfillState(str(tmp_path))
+    state.add(urls[:2])
+    notion = RecordingNotion()
+    backfill = Backfill(
+        state,
+        LocalBatchSubmitter(lambda messages, **params: "Sorry, I can't help with that."),
+        ai_processor=GroqAIProcessor(router=object()),
+        notion_client=notion,
+        extractor=ContentExtractor(),
+    )
+    for url in urls[:2]:
+        backfill.store_scraped(url, scraped(url))
+
+    summary = backfill.run(urls[:2])
+    assert summary["status"] == {FAILED: 2}
+    assert state.entries[urls[0]]["stage"] == "analyze"
+    assert notion.pages == []
+    assert os.listdir(tmp_path / "analyses") == []
+
+
+def test_one_failing_report_does_not_stop_publishing(tmp_path):
+    state = BackfillState(str(tmp_path))
+    state.add(urls)
+    notion = BrokenNotion()
+    backfill = Backfill(
+        state,
+        LocalBatchSubmitter(canned_completion),
+        ai_processor=GroqAIProcessor(router=object()),
+        notion_client=notion,
+        extractor=ContentExtractor(),
+    )
+    for url in urls:
+        backfill.store_scraped(url, scraped(url))
+
+    summary = backfill.run(urls)
+    assert summary["status"] == {PUBLISHED: 2, ANALYZED: 1}
+    assert state.entries[urls[1]]["error"] == "connection reset"
+    assert sorted(notion.pages) == [urls[0], urls[2]]
@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.cpu_pool import CPUPool, payload_size
+from app.extractor import clean_html
+
+report_html = "<div><p>El mercado <b>sube</b></p><script>x()</script><p>Soporte en 4.500</p></div>"
+
+
+def test_payload_size_counts_body_references():
+    assert payload_size({"a": "xx", "b": ["yyy", {"body_ref": "abc", "path": "/tmp/x", "chars": 100}], "c": 5}) == 105
+
+
+def test_pool_and_inline_give_the_same_result():
+    inline = CPUPool(enabled=False)
+    pooled = CPUPool(enabled=True, max_workers=1, inline_threshold=10)
+    try:
+        expected = inline.run(clean_html, len(report_html), "Report", report_html)
+        assert pooled.run(clean_html, len(report_html), "Report", report_html) == expected
+        # Below the threshold the work stays on the calling thread
+        assert pooled.run(clean_html, 5, "Report", report_html) == expected
+        stats = pooled.stats()
+        assert (stats["pool"]["count"], stats["inline"]["count"]) == (1, 1)
+    finally:
+        pooled.shutdown()
@@ -0,0 +1,128 @@
+import os
+import smtplib
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.http_client import HTTPClient
+from app.notifier import EmailNotifier, TelegramNotifier
+from app.notion_client import NotionClient
+from app.rate_limit import DestinationRateLimiter, PriorityRateLimiter
+from benchmarks.fake_services import FakeNotionAPI, FakeSMTPServer, FakeTelegramAPI, parse_telegram_text
+
+NOTION_HEADERS = {"Authorization": "Bearer secret", "Notion-Version": "2022-06-28"}
+
+report = {
+    "metadata": {"title": "Daily report", "word_count": 120, "timestamp": "2024-05-01 08:00:00"},
+    "content": {"original_html": "<p>" + "</p><p>".join(f"Paragraph {i}" for i in range(150)) + "</p>"},
+    "analysis": {
+        "summary": "Stocks rose",
+        "key_insights": ["Breadth improved"],
+        "market_metrics": {"market_sentiment": "positive", "mentioned_stocks": ["AAPL"], "sectors": ["Technology"]},
+        "confidence_level": "High",
+    },
+}
+
+
+def paragraph(text):
+    return {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+
+
+def test_notion_client_publishes_a_full_page_to_the_fake():
+    with FakeNotionAPI(rate=None) as notion:
+        client = NotionClient(http=HTTPClient(backoff_factor=0), limiter=PriorityRateLimiter(rate=1000))
+        client.base_url = f"{notion.url}/v1"
+        client.database_id = notion.database_id
+
+        result = client.create_report_page(report, "https://example.com/report")
+
+        assert result["success"] and result["complete"]
+        page = notion.pages[result["page_id"]]
+        assert page["properties"]["Market Sentiment"] == {"select": {"name": "Positive"}}
+        toggle_id = notion.children[result["page_id"]][-1]
+        assert len(notion.children[toggle_id]) == 150
+        assert client.update_page_status(result["page_id"], "Processed")
+
+
+def test_notion_fake_enforces_limits_and_rate():
+    with FakeNotionAPI(rate=1, burst=1) as notion:
+        url = f"{notion.url}/v1/pages"
+        page = {"parent": {"database_id": notion.database_id}, "properties": {}}
+
+        assert requests.post(url, json=page, headers={"Notion-Version": "2022-06-28"}).status_code == 401
+        response = requests.post(url, json={**page, "children": [paragraph("x")] * 101}, headers=NOTION_HEADERS)
+        assert response.status_code == 400 and response.json()["code"] == "validation_error"
+        response = requests.post(url, json=page, headers=NOTION_HEADERS)
+        assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+
+    with FakeNotionAPI(rate=None) as notion:
+        url = f"{notion.url}/v1/pages"
+        page = {"parent": {"database_id": notion.database_id}, "properties": {}}
+        too_long = requests.post(url, json={**page, "children": [paragraph("y" * 2001)]}, headers=NOTION_HEADERS)
+        unknown = requests.post(url, json={**page, "properties": {"Quality": {"number": 1}}}, headers=NOTION_HEADERS)
+        assert too_long.status_code == unknown.status_code == 400
+        assert requests.post(url, json={**page, "children": [paragraph("z" * 300)] * 100}, headers=NOTION_HEADERS).status_code == 200
+
+
+def test_telegram_entity_parsing():
+    assert parse_telegram_text("*bold* and _it_", "Markdown") == ("bold and it", None)
+    assert parse_telegram_text("S_and_P *rally", "Markdown")[1].startswith("Can't parse entities")
+    assert parse_telegram_text("Up 2\\.5% \\(SPX\\) *bold*", "MarkdownV2") == ("Up 2.5% (SPX) bold", None)
+    assert "reserved" in parse_telegram_text("Up 2.5%", "MarkdownV2")[1]
+    assert parse_telegram_text("<b>AT&amp;T</b> &lt; 20", "HTML") == ("AT&T < 20", None)
+    assert parse_telegram_text("AT&T", "HTML")[1] is not None
+    assert parse_telegram_text("<b>open", "HTML")[1] is not None
+
+
+def test_telegram_notifier_against_the_fake():
+    with FakeTelegramAPI(token="123:abc", chat_burst=2) as telegram:
+        # Client-side limits off, so the fake's own 429s come through
+        notifier = TelegramNotifier(http=HTTPClient(backoff_factor=0), limiter=DestinationRateLimiter(1000))
+        notifier.max_retries = 0
+        notifier.base_url = f"{telegram.url}/bot123:abc"
+        notifier.chat_id = "42"
+
+        assert notifier.send_error_notification("timeout", "scraper")
+        assert notifier.send_error_notification("timeout again")
+        assert not notifier.send_error_notification("throttled")
+        assert telegram.throttled == 1
+        assert telegram.messages["42"][0]["text"].startswith("🚨 Market Report Processing Error")
+
+        response = notifier._send_message({"chat_id": "7", "text": "x" * 4097})
+        assert response.status_code == 400 and response.json()["description"] == "Bad Request: message is too long"
+
+
+def test_email_notifier_uses_starttls_and_login_on_the_fake():
+    with FakeSMTPServer(credentials=("bot@example.com", "app-password")) as smtp:
+        notifier = EmailNotifier()
+        notifier.smtp_server, notifier.smtp_port = smtp.host, smtp.port
+        notifier.email_address, notifier.email_password = "bot@example.com", "app-password"
+        notifier.recipient_emails = ["desk@example.com"]
+
+        assert notifier.send_report_email(report, "https://example.com/report")
+        assert smtp.logins == 1 and smtp.commands[:4] == ["EHLO", "STARTTLS", "EHLO", "AUTH"]
+        assert smtp.messages[0]["to"] == ["desk@example.com"]
+        assert b"Subject: Pro-Trading Skills Report: Daily report" in smtp.messages[0]["data"]
+
+        rejected = EmailNotifier()
+        rejected.smtp_server, rejected.smtp_port = smtp.host, smtp.port
+        rejected.email_address, rejected.email_password = "bot@example.com", "wrong"
+        assert not rejected.send_report_email(report, "https://example.com/report")
+
+
+def test_smtp_fake_requires_tls_before_auth():
+    with FakeSMTPServer(max_recipients=2) as smtp:
+        with smtplib.SMTP(smtp.host, smtp.port) as client:
+            client.ehlo()
+            assert not client.has_extn("auth")
+            with pytest.raises(smtplib.SMTPNotSupportedError):
+                client.login("user", "password")
+            client.starttls()
+            client.login("user", "password")
+            client.mail("bot@example.com")
+            assert client.rcpt("a@example.com")[0] == 250
+            assert client.rcpt("b@example.com")[0] == 250
+            assert client.rcpt("c@example.com")[0] == 452
@@ -0,0 +1,60 @@
+import base64
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bs4 import BeautifulSoup
+
+from app.extractor import ContentExtractor
+from app.html_stream import BodyStore, externalize_data_uris, iter_html_text, read_body
+
+report_html = (
+    "<!DOCTYPE html><div><h2>Informe</h2><p>Hola &amp; adiós <b>mercado</b></p>"
+    "<script>var x = '<p>no</p>';</script><style>p {}</style>"
+    "<ul><li> uno </li><li>dos</li></ul><br/>texto &lt;suelto&gt;<!-- comment --><p>fin</p></div>"
+)
+
+
+def test_streaming_text_matches_beautifulsoup_for_any_chunk_size():
+    expected = BeautifulSoup(report_html, "html.parser").get_text(separator="\n", strip=True)
+    for chunk_size in (1, 5, 64, 10 ** 6):
+        assert "\n".join(iter_html_text(report_html, chunk_size=chunk_size)) == expected
+
+    cleaned = ContentExtractor().clean_html_content({"title": " Informe ", "html_content": report_html})
+    assert cleaned["main_content"] == expected
+    assert cleaned["word_count"] == len(expected.split())
+
+
+def test_data_uris_are_externalized_once(tmp_path):
+    pixel = base64.b64encode(b"\x89PNG\r\n\x1a\n fake image bytes").decode()
+    html = f'<p>Chart</p><img src="data:image/png;base64,{pixel}"><img src="data:image/png;base64,{pixel}">'
+
+    stripped, images = externalize_data_uris(html, str(tmp_path))
+    assert len(images) == 1
+    assert "base64" not in stripped
+    assert stripped.count(f"cid:{images[0]['cid']}") == 2
+    with open(images[0]["path"], "rb") as f:
+        assert f.read().startswith(b"\x89PNG")
+
+
+def test_large_bodies_are_referenced_not_copied(tmp_path):
+    store = BodyStore(str(tmp_path), inline_limit=10)
+    assert store.put("short") == "short"
+
+    ref = store.put("x" * 100)
+    assert ref["chars"] == 100
+    assert read_body(ref) == "x" * 100
+    assert read_body(ref, 5) == "xxxxx"
+    assert read_body("inline text", 6) == "inline"
+
+
+def test_body_store_evicts_least_recently_written_bodies(tmp_path):
+    store = BodyStore(str(tmp_path), inline_limit=10, max_bytes=250)
+    first = store.put("a" * 100)
+    os.utime(first["path"], (1, 1))
+    second = store.put("b" * 100)
+    third = store.put("c" * 100)
+
+    assert not os.path.exists(first["path"])
+    assert read_body(second) == "b" * 100 and read_body(third) == "c" * 100
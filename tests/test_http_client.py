@@ -0,0 +1,113 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.http_client import HTTPClient
+from app.notifier import TelegramNotifier
+from app.notion_client import NotionClient
+
+
+class APIServer:
+    """Answers every request with the next queued status (200 when empty), counting connections"""
+
+    def __init__(self):
+        self.statuses = []
+        self.requests = []
+        self.connections = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                server.connections += 1
+
+            def _answer(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                server.requests.append((self.command, self.path, body))
+                status = server.statuses.pop(0) if server.statuses else 200
+                data = json.dumps({"ok": status == 200, "id": "page-1", "url": "https://notion.so/page-1"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_requests_reuse_one_connection():
+    server = APIServer()
+    try:
+        client = HTTPClient(backoff_factor=0)
+        for _ in range(5):
+            assert client.get(f"{server.url}/ping").status_code == 200
+        assert server.connections == 1
+        stats = client.stats()[server.url.split("//")[1]]
+        assert stats["requests"] == 5 and stats["errors"] == 0
+    finally:
+        server.close()
+
+
+def test_idempotent_requests_are_retried_on_5xx_but_posts_are_not():
+    server = APIServer()
+    try:
+        client = HTTPClient(backoff_factor=0)
+        server.statuses = [503, 502]
+        assert client.get(f"{server.url}/status").status_code == 200
+        assert len(server.requests) == 3
+
+        server.requests.clear()
+        server.statuses = [503]
+        assert client.post(f"{server.url}/send", json={}).status_code == 503
+        assert len(server.requests) == 1
+    finally:
+        server.close()
+
+
+def test_timing_hooks_see_every_request():
+    server = APIServer()
+    calls = []
+    try:
+        client = HTTPClient(backoff_factor=0)
+        client.add_hook(lambda method, url, status, elapsed, error: calls.append((method, status, error)))
+        client.patch(f"{server.url}/pages/1", json={})
+        assert calls == [("PATCH", 200, None)]
+    finally:
+        server.close()
+
+
+def test_notion_and_telegram_share_the_client():
+    server = APIServer()
+    try:
+        client = HTTPClient(backoff_factor=0)
+        notion = NotionClient(http=client)
+        notion.base_url = server.url
+        notion.schema_cache = None
+        telegram = TelegramNotifier(http=client)
+        telegram.base_url = server.url
+
+        assert notion.update_page_status("page-1", "Done")
+        assert telegram.send_error_notification("boom")
+        assert [request[:2] for request in server.requests] == [("PATCH", "/pages/page-1"), ("POST", "/sendMessage")]
+        assert server.requests[0][2]["properties"]["Status"]["select"]["name"] == "Done"
+        assert server.connections == 1
+    finally:
+        server.close()
@@ -12,7 +12,7 @@ from app.extractor import ContentExtractor
 from app.notifier import TelegramNotifier
 from app.notifier import EmailNotifier
 
-ai_processor = GroqAIProcessor()
+ai_processor = GroqAIProcessor.from_config()
 notion_client = NotionClient()
 content_extractor = ContentExtractor()
 telegram_notifier = TelegramNotifier()
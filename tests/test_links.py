@@ -0,0 +1,80 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.extractor import ContentExtractor
+from app.links import LinkExtractor, RedirectCache, is_tracking_host, normalize_url
+
+report = "https://protradingskills.com/analysis/weekly-outlook/"
+
+
+class FakeResponse:
+    def __init__(self, url, status_code=200):
+        self.url = url
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+
+class RedirectingSession:
+    """Resolves every tracking link to the report"""
+
+    def __init__(self):
+        self.calls = []
+
+    def head(self, url, **kwargs):
+        self.calls.append(url)
+        return FakeResponse(report)
+
+
+def make_extractor(tmp_path, session=None):
+    return ContentExtractor(LinkExtractor(
+        cache=RedirectCache(str(tmp_path / "links.json")),
+        session=session or RedirectingSession(),
+    ))
+
+
+def test_extracts_links_from_html_and_plain_text(tmp_path):
+    extractor = make_extractor(tmp_path)
+    email_html = f"""
+        <a href="https://protradingskills.com/account/">Account</a>
+        <a href='{report}?utm_source=newsletter&amp;utm_medium=email'>Read</a>
+        <a href="https://WWW.protradingskills.com/analysis/weekly-outlook/#top">Again</a>
+    """
+    assert extractor.extract_urls_from_email(email_html) == [report]
+
+    email_text = f"New report is out ({report}).\nUnsubscribe: https://example.com/u"
+    assert extractor.extract_urls_from_email(email_text) == [report]
+
+
+def test_unwraps_tracking_redirects(tmp_path):
+    session = RedirectingSession()
+    extractor = make_extractor(tmp_path, session)
+
+    # Target in the query string: no request needed
+    wrapped = "https://click.mailer.com/track?u=https%3A%2F%2Fprotradingskills.com%2Fanalysis%2Fweekly-outlook%2F"
+    assert extractor.extract_urls_from_email(f'<a href="{wrapped}">Read</a>') == [report]
+    assert session.calls == []
+
+    # Opaque redirect: followed once, then served from the cache
+    opaque = "https://abc.ct.sendgrid.net/ls/click?upn=xyz"
+    assert extractor.extract_urls_from_email(f'<a href="{opaque}">Read</a>') == [report]
+    assert extractor.extract_urls_from_email(f'<a href="{opaque}">Read</a>') == [report]
+    assert session.calls == [opaque]
+
+    reloaded = RedirectCache(str(tmp_path / "links.json"))
+    assert reloaded.get(opaque) == report
+
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://www.Example.com/a?b=1&utm_campaign=x#frag") == "https://example.com/a?b=1"
+    assert normalize_url("www.example.com") == "https://example.com/"
+
+
+def test_only_known_trackers_are_resolved():
+    assert is_tracking_host("abc.ct.sendgrid.net")
+    assert is_tracking_host("click.mailer.com") and is_tracking_host("links.example.com")
+    for host in ("e.example.com", "t.co.example.com", "go.protradingskills.com", "email.example.com", "link.springer.com"):
+        assert not is_tracking_host(host)
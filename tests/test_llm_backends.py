@@ -0,0 +1,172 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.llm_backends import (
+    CircuitBreaker,
+    GroqBackend,
+    LLMRouter,
+    OpenAICompatibleBackend,
+)
+from app.rate_limit import RateLimitScheduler
+
+
+class FakeOpenAIServer:
+    """Local OpenAI-compatible chat completions endpoint with scripted behaviour"""
+
+    def __init__(self, content='{"summary": "ok"}', delay=0.0, status=200):
+        self.content = content
+        self.delay = delay
+        self.status = status
+        self.calls = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server.calls += 1
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(server.delay)
+                body = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": server.content}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15,
+                              "completion_tokens_details": {"reasoning_tokens": 3}},
+                }).encode()
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_backend(name, server, backend_class=OpenAICompatibleBackend, **kwargs):
+    base_url = server.url if backend_class is GroqBackend else f"{server.url}/v1"
+    return backend_class(
+        name,
+        "test-model",
+        api_key="test",
+        base_url=base_url,
+        scheduler=RateLimitScheduler(1000, 1_000_000, max_retries=0),
+        timeout=5,
+        **kwargs,
+    )
+
+
+def test_groq_backend_against_fake_server():
+    server = FakeOpenAIServer()
+    try:
+        result = make_backend("groq", server, GroqBackend).complete([{"role": "user", "content": "hi"}])
+        assert result.content == '{"summary": "ok"}'
+        assert result.usage["total_tokens"] == 15
+        # Not declared on groq's CompletionUsage, but kept as an extra field
+        assert result.usage["completion_tokens_details"]["reasoning_tokens"] == 3
+    finally:
+        server.close()
+
+
+def test_hedge_returns_faster_backend():
+    slow = FakeOpenAIServer(content='{"from": "slow"}', delay=2.0)
+    fast = FakeOpenAIServer(content='{"from": "fast"}')
+    try:
+        router = LLMRouter(
+            [make_backend("slow", slow), make_backend("fast", fast)],
+            hedge_initial_delay=0.2,
+            hedge_min_delay=0.1,
+        )
+        started = time.monotonic()
+        result = router.complete([{"role": "user", "content": "hi"}], validate=json.loads)
+        assert result.backend == "fast"
+        assert time.monotonic() - started < 1.5
+        assert slow.calls == 1
+    finally:
+        slow.close()
+        fast.close()
+
+
+def test_failover_on_error_and_invalid_json():
+    broken = FakeOpenAIServer(status=500)
+    garbled = FakeOpenAIServer(content="not json")
+    healthy = FakeOpenAIServer(content='{"from": "healthy"}')
+    try:
+        router = LLMRouter(
+            [make_backend("broken", broken), make_backend("garbled", garbled), make_backend("healthy", healthy)],
+            hedge=False,
+        )
+        result = router.complete([{"role": "user", "content": "hi"}], validate=json.loads)
+        assert result.backend == "healthy"
+    finally:
+        broken.close()
+        garbled.close()
+        healthy.close()
+
+
+def test_circuit_breaker_skips_unhealthy_backend():
+    broken = FakeOpenAIServer(status=503)
+    healthy = FakeOpenAIServer()
+    try:
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        router = LLMRouter(
+            [make_backend("broken", broken, breaker=breaker), make_backend("healthy", healthy)],
+            hedge=False,
+        )
+        for _ in range(3):
+            router.complete([{"role": "user", "content": "hi"}], validate=json.loads)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert broken.calls == 2
+        assert healthy.calls == 3
+    finally:
+        broken.close()
+        healthy.close()
+
+
+def test_half_open_fallback_stays_usable_while_primary_succeeds():
+    primary = FakeOpenAIServer()
+    fallback = FakeOpenAIServer()
+    clock = [0.0]
+    try:
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: clock[0])
+        breaker.record_failure()
+        router = LLMRouter(
+            [make_backend("primary", primary), make_backend("fallback", fallback, breaker=breaker)],
+            hedge=False,
+        )
+        clock[0] = 20
+        assert router.complete([{"role": "user", "content": "hi"}]).backend == "primary"
+        # The fallback was never called, so its probe is still available
+        assert fallback.calls == 0 and breaker.state == CircuitBreaker.OPEN
+
+        clock[0] = 1000
+        primary.close()
+        assert router.complete([{"role": "user", "content": "hi"}]).backend == "fallback"
+        assert breaker.state == CircuitBreaker.CLOSED
+    finally:
+        fallback.close()
+
+
+def test_unresolved_half_open_probe_expires():
+    clock = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 10
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow() and not breaker.available()
+
+    clock[0] = 25
+    assert breaker.available()
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
@@ -0,0 +1,95 @@
+import asyncio
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.mailer import BackgroundMailer, SMTPConnectionPool
+from app.notifier import EmailNotifier
+from benchmarks.fake_services import FakeSMTPServer
+
+report = {
+    "metadata": {"title": "Daily report", "word_count": 120},
+    "content": {},
+    "analysis": {"summary": "Stocks rose", "key_insights": ["Breadth improved"]},
+}
+
+
+def message(subject="Report"):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "bot@example.com"
+    msg["To"] = "desk@example.com"
+    msg.set_content("body")
+    return msg
+
+
+def pool_for(smtp, **kwargs):
+    return SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "secret", **kwargs)
+
+
+def test_messages_reuse_one_authenticated_session():
+    with FakeSMTPServer() as smtp:
+        pool = pool_for(smtp, size=1)
+        for i in range(5):
+            pool.send(message(f"Report {i}"))
+        assert len(smtp.messages) == 5
+        assert smtp.connections == 1 and smtp.logins == 1
+        assert pool.stats()["idle"] == 1
+        pool.close()
+        assert smtp.commands[-1] == "QUIT"
+
+
+def test_idle_sessions_are_checked_with_noop_and_replaced_when_dropped():
+    clock = [0.0]
+    with FakeSMTPServer(idle_timeout=0.2) as smtp:
+        pool = pool_for(smtp, noop_after=30, clock=lambda: clock[0])
+        pool.send(message())
+        clock[0] = 10
+        pool.send(message())
+        assert "NOOP" not in smtp.commands
+
+        # The server times the session out, NOOP notices and a new session is opened
+        time.sleep(0.4)
+        clock[0] = 60
+        pool.send(message())
+        assert smtp.logins == 2 and len(smtp.messages) == 3
+        assert pool.stats()["noops"] == 1 and pool.stats()["reconnects"] == 1
+
+
+def test_a_session_closed_mid_use_is_retried_once():
+    with FakeSMTPServer(max_messages_per_connection=2) as smtp:
+        pool = pool_for(smtp, noop_after=3600)
+        for i in range(5):
+            pool.send(message(f"Report {i}"))
+        assert [msg["data"].count(b"Report ") for msg in smtp.messages] == [1] * 5
+        assert smtp.connections == 3
+        assert pool.stats()["failed"] == 0
+
+
+def test_background_mailer_reports_outcomes():
+    with FakeSMTPServer(credentials=("bot@example.com", "secret")) as smtp:
+        mailer = BackgroundMailer(pool_for(smtp), workers=2)
+        futures = [mailer.submit(message(f"Report {i}")) for i in range(4)]
+        assert all(future.result(timeout=10) == {"desk@example.com": {"success": True}} for future in futures)
+        assert asyncio.run(mailer.send_async(message("Async")))["desk@example.com"]["success"]
+        mailer.shutdown()
+        assert len(smtp.messages) == 5 and smtp.logins <= 2
+
+        failing = BackgroundMailer(SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "wrong"))
+        outcome = failing.submit(message()).result(timeout=10)["desk@example.com"]
+        assert not outcome["success"] and "535" in outcome["error"]
+        assert failing.stats()["queued"] == 0
+        failing.shutdown()
+
+
+def test_email_notifier_queues_reports():
+    with FakeSMTPServer() as smtp:
+        notifier = EmailNotifier(BackgroundMailer(pool_for(smtp)))
+        notifier.recipient_emails = ["desk@example.com"]
+        future = notifier.queue_report_email(report, "https://example.com/report")
+        assert future.result(timeout=10)["desk@example.com"]["success"]
+        assert notifier.send_report_email(report, "https://example.com/report")
+        assert len(smtp.messages) == 2 and smtp.logins == 1
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ai import GroqAIProcessor
+from app.extractor import extract_market_facts, format_market_facts
+from app.llm_backends import CompletionResult
+
+
+class ScriptedRouter:
+    """Returns canned completions in order and records the prompts it was sent"""
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.prompts = []
+
+    def complete(self, messages, validate=None, **params):
+        self.prompts.append(messages[-1]["content"])
+        content = self.contents.pop(0)
+        if validate:
+            validate(content)
+        return CompletionResult(content, "scripted", "test-model")
+
+
+report = (
+    "El S&P 500 cayó un -1,2% ayer. El soporte clave está en 4.520 y luego 4.480; la resistencia en 4.600,50.\n"
+    "Apple (AAPL) subió 3.5 % tras resultados y la FED (FED) mantiene tipos. Vigilamos $NVDA con objetivo 950."
+)
+
+
+def test_extracts_levels_tickers_and_percentages():
+    facts = extract_market_facts(report)
+    assert facts["tickers"] == ["AAPL", "NVDA"]
+    assert facts["indices"] == ["S&P 500"]
+    assert [(level["kind"], level["value"]) for level in facts["levels"]] == [
+        ("support", 4520.0),
+        ("support", 4480.0),
+        ("resistance", 4600.5),
+        ("target", 950.0),
+    ]
+    assert [percentage["value"] for percentage in facts["percentages"]] == [-1.2, 3.5]
+
+    block = format_market_facts(facts)
+    assert "Level (support): 4.520, 4.480 |" in block
+    assert format_market_facts(extract_market_facts("Nothing numeric here")) == ""
+
+
+def test_facts_reach_the_prompt_and_fill_missing_metrics():
+    answer = json.dumps({
+        "translated_content": "Translated",
+        "summary": "Summary",
+        "key_insights": ["Insight"],
+        "outlook": "Flat",
+        "risk_factors": ["Rates"],
+        "action_items": ["Wait"],
+        "confidence_level": "High",
+    })
+    router = ScriptedRouter(answer)
+    analysis = GroqAIProcessor(router=router).translate_and_analyze(report)
+
+    assert "Level (resistance): 4.600,50" in router.prompts[0]
+    # market_metrics came from the extraction, no follow-up request was needed
+    assert len(router.prompts) == 1
+    assert analysis["market_metrics"]["mentioned_stocks"] == ["AAPL", "NVDA", "S&P 500"]
+    assert analysis["market_metrics"]["price_levels"][0] == {"kind": "support", "value": 4520.0}
@@ -0,0 +1,122 @@
+import os
+import sys
+
+from flask import Flask
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import routes
+from app.http_client import HTTPClient
+from app.mailer import BackgroundMailer, SMTPConnectionPool
+from app.notifier import EmailNotifier, TelegramNotifier
+from app.rate_limit import DestinationRateLimiter
+from benchmarks.fake_services import FakeSMTPServer, FakeTelegramAPI
+
+report = {
+    "metadata": {"title": "Daily report", "word_count": 120},
+    "content": {},
+    "analysis": {"summary": "Stocks rose", "key_insights": ["Breadth improved"]},
+}
+
+
+def test_report_goes_to_every_chat_with_an_outcome_per_chat():
+    with FakeTelegramAPI(chat_ids=["1", "2", "-100"], chat_rate=5, group_rate=2, chat_burst=1) as telegram:
+        # A little under the fake's per-chat and group rates
+        limiter = DestinationRateLimiter(30, destination_rate=lambda chat: (1.5, 1) if chat.startswith("-") else (4, 1))
+        notifier = TelegramNotifier(http=HTTPClient(backoff_factor=0), limiter=limiter)
+        notifier.base_url = f"{telegram.url}/botTOKEN"
+        notifier.chat_ids = ["1", "2", "-100", "404"]
+
+        first = notifier.notify_subscribers(report, "https://notion.so/page")
+        second = notifier.notify_subscribers(report)
+
+        assert first["sent"] == 3 and first["failed"] == 1 and not first["success"]
+        assert first["destinations"]["1"] == {"success": True, "parts_sent": 1}
+        assert first["destinations"]["404"]["status"] == 400
+        assert "chat not found" in first["destinations"]["404"]["error"]
+        # The client waits for each chat's limit instead of being throttled
+        assert second["sent"] == 3 and telegram.throttled == 0
+        assert {chat: len(messages) for chat, messages in telegram.messages.items()} == {"1": 2, "2": 2, "-100": 2}
+
+
+def test_telegram_429s_are_retried_after_retry_after():
+    with FakeTelegramAPI(chat_burst=1) as telegram:
+        notifier = TelegramNotifier(http=HTTPClient(backoff_factor=0), limiter=DestinationRateLimiter(1000))
+        notifier.base_url = f"{telegram.url}/botTOKEN"
+        notifier.chat_ids = ["7"]
+
+        assert notifier.send_notification(report)
+        assert notifier.send_notification(report)
+        assert telegram.throttled == 1 and len(telegram.messages["7"]) == 2
+        assert notifier.limiter.stats()["throttled"] == 1
+
+
+def test_recipients_are_batched_per_smtp_transaction():
+    with FakeSMTPServer(max_recipients=4) as smtp:
+        mailer = BackgroundMailer(SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "secret"), max_recipients=4)
+        notifier = EmailNotifier(mailer)
+        notifier.email_address = "bot@example.com"
+        notifier.recipient_emails = [f"reader{i}@example.com" for i in range(10)]
+
+        result = notifier.deliver_report_email(report, "https://example.com/report")
+
+        assert result["success"] and result["sent"] == 10
+        assert [len(message["to"]) for message in smtp.messages] == [4, 4, 2]
+        assert smtp.connections == 1
+        assert b"To: undisclosed-recipients:;" in smtp.messages[0]["data"]
+        assert b"reader" not in smtp.messages[0]["data"]
+
+
+def test_refused_recipients_are_reported_individually():
+    with FakeSMTPServer(max_recipients=2) as smtp:
+        # The client batches more recipients than the server accepts per message
+        mailer = BackgroundMailer(SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "secret"), max_recipients=3)
+        notifier = EmailNotifier(mailer)
+        notifier.recipient_emails = ["a@example.com", "b@example.com", "c@example.com"]
+
+        result = notifier.deliver_report_email(report, "https://example.com/report")
+
+        assert result["sent"] == 2 and not result["success"]
+        assert result["destinations"]["c@example.com"]["error"].startswith("452")
+        assert smtp.messages[0]["to"] == ["a@example.com", "b@example.com"]
+
+
+def test_queued_email_outcome_is_logged_and_no_recipients_short_circuits(caplog):
+    with FakeSMTPServer(max_recipients=1) as smtp:
+        notifier = EmailNotifier(BackgroundMailer(SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "secret")))
+        notifier.recipient_emails = ["a@example.com", "b@example.com"]
+
+        with caplog.at_level("INFO", logger="app.notifier"):
+            notifier.queue_report_email(report, "https://example.com/report")
+            # Callbacks have run once the workers are done
+            notifier.mailer.shutdown()
+        assert "sent to 1/2 recipients, failed: {'b@example.com': '452" in caplog.text
+
+        notifier.recipient_emails = []
+        assert notifier.queue_report_email(report, "https://example.com/report") is None
+        assert notifier.deliver_report_email(report, "https://example.com/report") == {
+            "success": False, "sent": 0, "failed": 0, "destinations": {}
+        }
+        assert len(smtp.messages) == 1
+
+
+def test_test_endpoints_only_reach_the_primary_chat_and_first_recipient(monkeypatch):
+    with FakeTelegramAPI(chat_ids=["1", "2", "3"]) as telegram, FakeSMTPServer(max_recipients=10) as smtp:
+        telegram_notifier = TelegramNotifier(http=HTTPClient(backoff_factor=0), limiter=DestinationRateLimiter(1000))
+        telegram_notifier.base_url = f"{telegram.url}/botTOKEN"
+        telegram_notifier.chat_id = "2"
+        telegram_notifier.chat_ids = ["1", "2", "3"]
+        email_notifier = EmailNotifier(BackgroundMailer(SMTPConnectionPool(smtp.host, smtp.port, "bot@example.com", "secret")))
+        email_notifier.recipient_emails = ["a@example.com", "b@example.com", "c@example.com"]
+        monkeypatch.setattr(routes, "telegram_notifier", telegram_notifier)
+        monkeypatch.setattr(routes, "email_notifier", email_notifier)
+        app = Flask(__name__)
+        app.register_blueprint(routes.api, url_prefix="/api")
+        client = app.test_client()
+
+        assert client.post("/api/test-telegram").get_json() == {"success": True}
+        assert client.post("/api/test-email").get_json() == {"success": True}
+
+        assert list(telegram.messages) == ["2"]
+        assert [message["to"] for message in smtp.messages] == [["a@example.com"]]
+        assert b"To: a@example.com" in smtp.messages[0]["data"]
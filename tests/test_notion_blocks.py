@@ -0,0 +1,119 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.notion_blocks import MAX_TEXT_LENGTH, NotionBlockWriter, next_batch, split_text, text_blocks
+from app.report_document import ReportDocument
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+        self.text = str(data)
+
+    def json(self):
+        return self.data
+
+
+class FakeNotion:
+    """In-memory block tree behind the writer's request(method, path, payload) callable"""
+
+    def __init__(self, fail_appends=False):
+        self.children = {}
+        self.calls = []
+        self.fail_appends = fail_appends
+        self._lock = threading.Lock()
+
+    def _create(self, parent_id, blocks):
+        created = []
+        with self._lock:
+            for block in blocks:
+                block_id = f"block-{sum(len(items) for items in self.children.values()) + 1}"
+                self.children.setdefault(parent_id, []).append((block_id, block))
+                created.append({"id": block_id})
+                nested = block[block["type"]].get("children")
+                if nested:
+                    self.children[block_id] = []
+        for item, block in zip(created, blocks):
+            if block[block["type"]].get("children"):
+                self._create(item["id"], block[block["type"]]["children"])
+        return created
+
+    def request(self, method, path, payload=None):
+        self.calls.append((method, path.split("?")[0], len((payload or {}).get("children", []))))
+        if method == "POST":
+            self._create("page", payload["children"])
+            return FakeResponse(200, {"id": "page", "url": "https://notion.so/page"})
+        parent_id = path.split("/")[2]
+        if method == "GET":
+            return FakeResponse(200, {"results": [{"id": block_id} for block_id, _ in self.children[parent_id][:100]]})
+        if self.fail_appends:
+            return FakeResponse(400, {"message": "validation_error"})
+        return FakeResponse(200, {"results": self._create(parent_id, payload["children"])})
+
+    def texts(self, parent_id):
+        return [block[block["type"]]["rich_text"][0]["text"]["content"] for _, block in self.children.get(parent_id, [])]
+
+
+def paragraph(text, children=None):
+    block = {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+    if children:
+        block["paragraph"]["children"] = children
+    return block
+
+
+def test_split_text_keeps_every_character_within_the_limit():
+    text = ("word " * 900) + "\n" + ("x" * 4500) + " 📈" * 1200
+    pieces = split_text(text)
+    assert "".join(pieces) == text
+    assert all(len(piece.encode("utf-16-le")) // 2 <= MAX_TEXT_LENGTH for piece in pieces)
+
+
+def test_text_blocks_split_paragraphs_and_long_text():
+    blocks = text_blocks("First paragraph\n\n" + "y" * 5000)
+    assert len(blocks) == 2
+    assert [len(item["text"]["content"]) for item in blocks[1]["paragraph"]["rich_text"]] == [2000, 2000, 1000]
+
+
+def test_next_batch_defers_children_beyond_the_limit():
+    blocks = [paragraph(f"p{i}") for i in range(5)] + [paragraph("toggle", [paragraph(f"c{i}") for i in range(150)])]
+    batch, deferred, index = next_batch(blocks, 0)
+    assert index == 6
+    assert len(batch[5]["paragraph"]["children"]) == 100
+    assert [block["paragraph"]["rich_text"][0]["text"]["content"] for block in deferred[5]] == [f"c{i}" for i in range(100, 150)]
+
+
+def test_writer_creates_the_page_then_appends_in_order():
+    notion = FakeNotion()
+    blocks = [paragraph("toggle", [paragraph(f"c{i}") for i in range(130)])] + [paragraph(f"p{i}") for i in range(240)]
+    result = NotionBlockWriter(notion.request, max_concurrency=2).create_page({"properties": {}}, blocks)
+
+    assert result["success"] and result["complete"]
+    assert notion.texts("page") == ["toggle"] + [f"p{i}" for i in range(240)]
+    toggle_id = notion.children["page"][0][0]
+    assert notion.texts(toggle_id) == [f"c{i}" for i in range(130)]
+    assert notion.calls[0] == ("POST", "/pages", 100)
+    assert sorted(call for call in notion.calls if call[0] == "PATCH") == [
+        ("PATCH", f"/blocks/{toggle_id}/children", 30),
+        ("PATCH", "/blocks/page/children", 41),
+        ("PATCH", "/blocks/page/children", 100),
+    ]
+
+
+def test_failed_appends_are_reported():
+    notion = FakeNotion(fail_appends=True)
+    result = NotionBlockWriter(notion.request).create_page({}, [paragraph(f"p{i}") for i in range(150)])
+    assert result["success"] and not result["complete"]
+    assert result["page_url"] == "https://notion.so/page"
+
+
+def test_original_report_is_no_longer_truncated():
+    report = "<p>" + "</p><p>".join(f"Paragraph {i} " + "z" * 300 for i in range(40)) + "</p>"
+    blocks = ReportDocument.from_summary({"analysis": {"summary": "s" * 4500}, "content": {"original_html": report}}).render("notion")
+    assert len(blocks[1]["paragraph"]["rich_text"]) == 3
+    toggle = blocks[-1]["toggle"]
+    assert len(toggle["children"]) == 40
+    assert "Paragraph 39" in toggle["children"][-1]["paragraph"]["rich_text"][0]["text"]["content"]
@@ -0,0 +1,196 @@
+import itertools
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.notion_client import NotionClient
+from app.notion_pages import NotionPageIndex, content_hash
+from app.rate_limit import PriorityRateLimiter
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+        self.headers = {}
+        self.text = str(self.data)
+
+    def json(self):
+        return self.data
+
+
+class FakeNotionAPI:
+    """Just enough of the Notion API for upserts: pages with properties and top-level blocks"""
+
+    timeout = (5, 30)
+
+    def __init__(self):
+        self.pages = {}
+        self.blocks = {}
+        self.calls = []
+        # Scripted failures: PATCH /pages answers this error, POST /pages fails
+        self.update_error = None
+        self.fail_create = False
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add_page(self, source_url, texts=()):
+        page_id = f"page-{next(self._ids)}"
+        self.pages[page_id] = {"properties": {"Source URL": {"url": source_url}}, "archived": False}
+        self.blocks[page_id] = [self._block(text) for text in texts]
+        return page_id
+
+    def _block(self, text):
+        return {"id": f"block-{next(self._ids)}", "text": text}
+
+    def texts(self, page_id):
+        return [block["text"] for block in self.blocks[page_id]]
+
+    def request(self, method, url, json=None, **kwargs):
+        path = url.split("/v1", 1)[1].split("?")[0]
+        parts = path.strip("/").split("/")
+        with self._lock:
+            self.calls.append((method, "/".join(part if not part[-1].isdigit() else "{id}" for part in parts)))
+            if method == "POST" and parts == ["pages"]:
+                if self.fail_create:
+                    return FakeResponse(400, {"code": "validation_error", "message": "body failed validation"})
+                page_id = self.add_page(json["properties"]["Source URL"]["url"])
+                self.pages[page_id]["properties"] = json["properties"]
+                self.blocks[page_id] = [self._block(_text(block)) for block in json["children"]]
+                return FakeResponse(200, {"id": page_id, "url": f"https://notion.so/{page_id}"})
+            if method == "PATCH" and parts[0] == "pages":
+                page = self.pages.get(parts[1])
+                if not page:
+                    return FakeResponse(404, {"code": "object_not_found"})
+                if page["archived"]:
+                    message = "Can't edit block that is archived. You must unarchive the block before editing."
+                    return FakeResponse(400, {"code": "validation_error", "message": message})
+                if self.update_error:
+                    return FakeResponse(*self.update_error)
+                page["properties"].update(json["properties"])
+                return FakeResponse(200, {"id": parts[1]})
+            if method == "POST" and parts[0] == "databases":
+                live = [page_id for page_id, page in self.pages.items() if not page["archived"]]
+                start = int(json.get("start_cursor") or 0)
+                results = [
+                    {"id": page_id, "url": f"https://notion.so/{page_id}", "properties": self.pages[page_id]["properties"]}
+                    for page_id in live[start:start + 2]
+                ]
+                more = start + 2 < len(live)
+                return FakeResponse(200, {"results": results, "has_more": more, "next_cursor": str(start + 2) if more else None})
+            if method == "GET" and parts[0] == "blocks":
+                return FakeResponse(200, {"results": [{"id": block["id"]} for block in self.blocks[parts[1]]], "has_more": False})
+            if method == "PATCH" and parts[0] == "blocks":
+                created = [self._block(_text(block)) for block in json["children"]]
+                self.blocks[parts[1]].extend(created)
+                return FakeResponse(200, {"results": [{"id": block["id"]} for block in created]})
+            if method == "DELETE":
+                for blocks in self.blocks.values():
+                    blocks[:] = [block for block in blocks if block["id"] != parts[1]]
+                return FakeResponse(200, {})
+        return FakeResponse(400, {"code": "validation_error"})
+
+
+def _text(block):
+    rich_text = block[block["type"]].get("rich_text") or [{"text": {"content": block["type"]}}]
+    return rich_text[0]["text"]["content"]
+
+
+def report(summary, text="Report body"):
+    return {
+        "metadata": {"title": "Daily report", "word_count": 2},
+        "content": {"original_text": text},
+        "analysis": {"summary": summary, "market_metrics": {}, "confidence_level": "high"},
+    }
+
+
+def client_for(api, index=None):
+    client = NotionClient(http=api, limiter=PriorityRateLimiter(rate=1000), page_index=index or NotionPageIndex(path=""))
+    client.database_id = "db-1"
+    return client
+
+
+def test_index_lookup_by_normalized_url_or_hash(tmp_path):
+    index = NotionPageIndex(path=str(tmp_path / "pages.json"))
+    index.add("page-1", "https://notion.so/page-1", "https://www.example.com/report?utm_source=mail", "abc")
+    index.save()
+
+    reloaded = NotionPageIndex(path=str(tmp_path / "pages.json"))
+    assert reloaded.lookup("https://example.com/report")["page_id"] == "page-1"
+    assert reloaded.lookup("https://example.com/other", "abc")["page_id"] == "page-1"
+    assert reloaded.lookup("https://example.com/other", "def") is None
+    assert content_hash({"original_text": {"body_ref": "f00"}}) == "f00"
+
+
+def test_existing_page_found_by_rebuild_is_updated_in_place():
+    api = FakeNotionAPI()
+    for number in range(3):
+        api.add_page(f"https://example.com/other-{number}")
+    page_id = api.add_page("https://example.com/report", ["old summary"])
+    client = client_for(api)
+
+    result = client.upsert_report_page(report("new summary"), "https://example.com/report")
+
+    assert result["success"] and result["updated"] and result["page_id"] == page_id
+    assert "old summary" not in api.texts(page_id) and "new summary" in api.texts(page_id)
+    assert ("POST", "pages") not in api.calls
+    assert client.page_index.synced_at and len(client.page_index.urls) == 4
+
+
+def test_new_reports_are_created_and_indexed_then_updated():
+    api = FakeNotionAPI()
+    client = client_for(api)
+
+    created = client.upsert_report_page(report("first"), "https://example.com/new")
+    assert created["success"] and not created["updated"]
+
+    # Same report text under a different URL is the same report
+    updated = client.upsert_report_page(report("second"), "https://example.com/mirror")
+    assert updated["updated"] and updated["page_id"] == created["page_id"]
+    assert api.calls.count(("POST", "databases/{id}/query")) == 1
+
+
+def test_deleted_pages_are_recreated():
+    api = FakeNotionAPI()
+    index = NotionPageIndex(path="")
+    client = client_for(api, index)
+    first = client.upsert_report_page(report("first"), "https://example.com/gone")
+    api.pages[first["page_id"]]["archived"] = True
+
+    second = client.upsert_report_page(report("again"), "https://example.com/gone")
+    assert second["success"] and not second["updated"]
+    assert second["page_id"] != first["page_id"]
+    assert index.lookup("https://example.com/gone")["page_id"] == second["page_id"]
+
+
+def test_validation_errors_keep_the_indexed_page():
+    api = FakeNotionAPI()
+    index = NotionPageIndex(path="")
+    client = client_for(api, index)
+    first = client.upsert_report_page(report("first"), "https://example.com/report")
+
+    api.update_error = (400, {"code": "validation_error", "message": "Quality is not a property that exists."})
+    failed = client.upsert_report_page(report("second"), "https://example.com/report")
+    assert not failed["success"] and failed["status"] == 400
+    assert len(api.pages) == 1
+    assert index.lookup("https://example.com/report")["page_id"] == first["page_id"]
+
+
+def test_index_entry_survives_a_failed_recreate():
+    api = FakeNotionAPI()
+    index = NotionPageIndex(path="")
+    client = client_for(api, index)
+    first = client.upsert_report_page(report("first"), "https://example.com/report")
+    del api.pages[first["page_id"]]
+
+    api.fail_create = True
+    assert not client.upsert_report_page(report("second"), "https://example.com/report")["success"]
+    assert index.lookup("https://example.com/report")["page_id"] == first["page_id"]
+
+    api.fail_create = False
+    third = client.upsert_report_page(report("third"), "https://example.com/report")
+    assert third["success"] and not third["updated"]
+    assert index.lookup("https://example.com/report")["page_id"] == third["page_id"]
+    assert len(api.pages) == 1
@@ -0,0 +1,142 @@
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.notion_client import NotionClient
+from app.notion_schema import NotionSchema, NotionSchemaCache
+from app.rate_limit import PriorityRateLimiter
+
+
+def database(**overrides):
+    properties = {
+        "Name": {"id": "title", "type": "title", "title": {}},
+        "Source URL": {"id": "u", "type": "url", "url": {}},
+        "Date": {"id": "d", "type": "date", "date": {}},
+        "Status": {"id": "s", "type": "status", "status": {"options": [{"id": "s1", "name": "New"}, {"id": "s2", "name": "Done"}]}},
+        "Market Sentiment": {"id": "m", "type": "select", "select": {"options": [{"id": "m1", "name": "Positive"}]}},
+        "Word Count": {"id": "w", "type": "number", "number": {}},
+        "Confidence Level": {"id": "c", "type": "rich_text", "rich_text": {}},
+        "Stocks": {"id": "k", "type": "multi_select", "multi_select": {"options": [{"id": "k1", "name": "AAPL"}]}},
+        "Created": {"id": "t", "type": "created_time", "created_time": {}},
+    }
+    properties.update(overrides)
+    return properties
+
+
+built = {
+    "Title": {"title": [{"text": {"content": "Daily report"}}]},
+    "Source URL": {"url": "https://example.com/report"},
+    "Status": {"select": {"name": "new"}},
+    "Market Sentiment": {"select": {"name": "positive"}},
+    "Word Count": {"number": 120},
+    "Confidence Level": {"select": {"name": "High"}},
+    "Stocks": {"multi_select": [{"name": "aapl"}, {"name": "Nvidia, Corp"}]},
+    "Sectors": {"multi_select": [{"name": "Technology"}]},
+    "Created": {"date": {"start": "2024-01-01"}},
+}
+
+
+def test_normalize_maps_names_types_and_options():
+    properties, missing = NotionSchema(database()).normalize(built)
+
+    assert properties["Name"]["title"][0]["text"]["content"] == "Daily report"
+    assert properties["Status"] == {"status": {"name": "New"}}
+    assert properties["Market Sentiment"] == {"select": {"name": "Positive"}}
+    assert properties["Confidence Level"]["rich_text"][0]["text"]["content"] == "High"
+    assert properties["Stocks"] == {"multi_select": [{"name": "AAPL"}, {"name": "Nvidia Corp"}]}
+    assert "Sectors" not in properties and "Created" not in properties and "Title" not in properties
+    assert missing == {"Stocks": ["Nvidia Corp"]}
+
+    properties, _ = NotionSchema(database()).normalize(built, allow_new_options=False)
+    assert properties["Stocks"] == {"multi_select": [{"name": "AAPL"}]}
+
+
+def test_schema_cache_expires_and_refreshes():
+    fetched = []
+    clock = [0.0]
+    cache = NotionSchemaCache(lambda: fetched.append(1) or database(), ttl=60, clock=lambda: clock[0])
+    cache.get()
+    cache.get()
+    assert len(fetched) == 1
+    clock[0] = 61
+    cache.get()
+    cache.get(refresh=True)
+    assert len(fetched) == 3
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+        self.headers = {}
+        self.text = str(self.data)
+
+    def json(self):
+        return self.data
+
+
+class SchemaAPI:
+    """Notion database whose schema changes after it has been cached once"""
+
+    timeout = (5, 30)
+
+    def __init__(self):
+        self.schema = database()
+        self.calls = []
+
+    def request(self, method, url, json=None, **kwargs):
+        path = url.split("/v1", 1)[1]
+        self.calls.append((method, path, json))
+        if path.startswith("/databases/"):
+            if method == "PATCH":
+                for name, update in json["properties"].items():
+                    self.schema[name] = {**self.schema[name], **update}
+            return FakeResponse(200, {"properties": copy.deepcopy(self.schema)})
+        if method == "POST" and path == "/pages":
+            unknown = set(json["properties"]) - set(self.schema)
+            if unknown:
+                return FakeResponse(400, {"code": "validation_error", "message": f"{unknown} is not a property"})
+            return FakeResponse(200, {"id": "page-1", "url": "https://notion.so/page-1"})
+        return FakeResponse(200, {"id": "page-1"})
+
+
+def report():
+    return {
+        "metadata": {"title": "Daily report", "word_count": 120},
+        "content": {},
+        "analysis": {"confidence_level": "", "market_metrics": {"market_sentiment": "positive", "mentioned_stocks": ["MSFT"]}},
+    }
+
+
+def test_client_creates_missing_options_before_the_page():
+    api = SchemaAPI()
+    client = NotionClient(http=api, limiter=PriorityRateLimiter(rate=1000))
+    client.database_id = "db-1"
+
+    result = client.create_report_page(report(), "https://example.com/report")
+
+    assert result["success"]
+    methods = [(method, path) for method, path, _ in api.calls]
+    assert methods == [("GET", "/databases/db-1"), ("PATCH", "/databases/db-1"), ("POST", "/pages")]
+    assert [option["name"] for option in api.schema["Stocks"]["multi_select"]["options"]] == ["AAPL", "MSFT"]
+    page = api.calls[-1][2]["properties"]
+    assert page["Stocks"] == {"multi_select": [{"name": "MSFT"}]}
+    assert page["Confidence Level"] == {"rich_text": []}
+
+
+def test_client_refreshes_the_schema_after_a_validation_error():
+    api = SchemaAPI()
+    client = NotionClient(http=api, limiter=PriorityRateLimiter(rate=1000))
+    client.database_id = "db-1"
+    client.schema_cache.get()
+    # Renamed in Notion after the schema was cached
+    api.schema["Words"] = api.schema.pop("Word Count")
+
+    result = client.create_report_page(report(), "https://example.com/report")
+
+    assert result["success"]
+    posts = [payload for method, path, payload in api.calls if path == "/pages"]
+    assert len(posts) == 2
+    assert "Word Count" in posts[0]["properties"] and "Word Count" not in posts[1]["properties"]
@@ -0,0 +1,29 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.parsing import get_html_backend
+
+report_html = (
+    "<div><p>El S&amp;P 500 <b>sube</b></p><script>track('<p>no</p>');</script>"
+    "<img src=\"https://example.com/chart.png\"><!-- nota --><p>Soporte en 4.500</p></div>"
+)
+
+
+def test_backends_agree():
+    reference = get_html_backend("html.parser")
+    lxml_backend = get_html_backend("lxml")
+
+    assert list(reference.iter_text(report_html)) == ["El S&P 500", "sube", "Soporte en 4.500"]
+    for backend in (reference, lxml_backend):
+        assert list(backend.iter_text(report_html)) == list(reference.iter_text(report_html))
+        assert backend.image_sources(report_html) == ["https://example.com/chart.png"]
+        stripped = backend.strip_scripts(report_html)
+        assert "<script" not in stripped
+        assert stripped.startswith("<div>")
+
+
+def test_unknown_or_missing_backend_falls_back():
+    assert get_html_backend("no-such-parser").name == "html.parser"
+    assert get_html_backend("selectolax").name in ("selectolax", "lxml")
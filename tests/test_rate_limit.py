@@ -0,0 +1,157 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.notion_client import NotionClient
+from app.rate_limit import DestinationRateLimiter, PriorityRateLimiter, RateLimitScheduler, TokenBucket, parse_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_duration():
+    assert parse_duration("7.66s") == 7.66
+    assert abs(parse_duration("2m59.56s") - 179.56) < 1e-9
+    assert parse_duration("250ms") == 0.25
+    assert parse_duration("12") == 12.0
+    assert parse_duration("") is None
+    assert parse_duration(None) is None
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, period=60, clock=clock)
+    bucket.consume(60)
+    assert bucket.wait_time(1) == 1.0
+
+    clock.now = 30
+    assert bucket.wait_time(30) == 0.0
+    # Oversized requests only wait for a full bucket
+    assert bucket.wait_time(1000) == 30.0
+
+
+def test_scheduler_syncs_with_headers():
+    clock = FakeClock()
+    scheduler = RateLimitScheduler(30, 8000, clock=clock)
+    scheduler.update_from_headers({
+        "x-ratelimit-limit-tokens": "6000",
+        "x-ratelimit-remaining-tokens": "100",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "1m",
+    })
+    assert scheduler.tokens.capacity == 6000
+    assert scheduler.tokens.tokens == 100
+    assert scheduler.blocked_until == 60
+
+
+def test_scheduler_queues_instead_of_failing():
+    scheduler = RateLimitScheduler(2, 1000, period=0.2)
+    order = []
+
+    def worker(index):
+        scheduler.acquire(10)
+        order.append(index)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert order == [0, 1, 2, 3]
+    # Two requests fit in the burst, the other two wait for the refill
+    assert time.monotonic() - started >= 0.15
+
+
+def test_backoff_honors_retry_after():
+    scheduler = RateLimitScheduler(30, 8000, backoff_base=1.0, backoff_max=8.0)
+    assert 5.0 <= scheduler.backoff_delay(0, retry_after=5.0) <= 6.0
+    for attempt in range(10):
+        assert 0 <= scheduler.backoff_delay(attempt) <= 8.0
+
+
+def test_priority_limiter_serves_page_creation_first():
+    limiter = PriorityRateLimiter(rate=10, burst=1, names={0: "page", 1: "status"})
+    limiter.acquire(1)
+    served = []
+
+    def worker(priority, name):
+        limiter.acquire(priority)
+        served.append(name)
+
+    threads = [threading.Thread(target=worker, args=(1, "status"))]
+    threads[0].start()
+    time.sleep(0.02)
+    threads.append(threading.Thread(target=worker, args=(0, "page")))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+
+    assert served == ["page", "status"]
+    stats = limiter.stats()
+    assert stats["queued"] == 0
+    assert stats["wait"]["status"]["count"] == 2 and stats["wait"]["page"]["count"] == 1
+
+
+def test_destination_limiter_paces_each_destination_separately():
+    # 100/s overall, 10/s per chat, 2/s for the group
+    limiter = DestinationRateLimiter(100, destination_rate=lambda chat: (2, 1) if chat.startswith("-") else (10, 1))
+    started = time.monotonic()
+    for _ in range(3):
+        for chat in ("1", "2", "3"):
+            limiter.acquire(chat)
+    # Three chats at 10/s each take ~0.2s together, not 0.9s in sequence
+    assert 0.15 <= time.monotonic() - started < 0.5
+
+    limiter.acquire("-5")
+    assert limiter.acquire("-5") >= 0.4
+
+
+def test_destination_limiter_penalizes_one_destination():
+    limiter = DestinationRateLimiter(1000)
+    limiter.penalize(0.3, "busy")
+    assert limiter.acquire("other") < 0.05
+    assert limiter.acquire("busy") >= 0.25
+    assert limiter.stats()["throttled"] == 1 and limiter.stats()["destinations"] == 2
+
+
+class ScriptedHTTP:
+    timeout = (5, 30)
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.sent = 0
+
+    def request(self, method, url, **kwargs):
+        self.sent += 1
+        return self.responses.pop(0)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+
+def test_notion_requests_retry_after_429():
+    limiter = PriorityRateLimiter(rate=100)
+    http = ScriptedHTTP([FakeResponse(429, {"Retry-After": "0.2"}), FakeResponse(200)])
+    client = NotionClient(http=http, limiter=limiter)
+    client.schema_cache = None
+
+    started = time.monotonic()
+    assert client.update_page_status("page-1", "Done")
+    assert time.monotonic() - started >= 0.2
+    assert http.sent == 2
+    assert limiter.stats()["throttled"] == 1
@@ -0,0 +1,78 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.report_document import RENDERERS, ReportDocument
+
+summary = {
+    "metadata": {"title": "S&P 500 <daily>", "word_count": 250, "timestamp": "2024-05-01 08:00:00"},
+    "content": {
+        "original_html": "<p>El mercado <b>sube</b></p>",
+        "translated_content": "Line one\nLine two",
+        "report_images": ["https://example.com/chart.png", "https://www.tradingview.com/x/abc/"],
+    },
+    "analysis": {
+        "summary": "Stocks rose & bonds fell",
+        "key_insights": ["First", "Second", "Third", "Fourth"],
+        "market_metrics": {"market_sentiment": "positive", "mentioned_stocks": ["AAPL"], "sectors": ["Technology"]},
+        "outlook": "Higher",
+        "risk_factors": ["Rates"],
+        "action_items": ["Watch 4500"],
+        "confidence_level": "high",
+    },
+}
+
+
+def test_document_is_built_once_from_the_summary():
+    document = ReportDocument.from_summary(summary, "https://example.com/report")
+    assert document.title == "S&P 500 <daily>"
+    assert document.assets == [
+        {"url": "https://example.com/chart.png", "kind": None},
+        {"url": "https://www.tradingview.com/x/abc/", "kind": None},
+    ]
+    assert ReportDocument.of(document) is document
+    assert ReportDocument.of(summary).summary == "Stocks rose & bonds fell"
+
+
+def test_renderings_are_memoized_per_options(monkeypatch):
+    calls = []
+    original = RENDERERS["telegram"]
+    monkeypatch.setitem(RENDERERS, "telegram", lambda document, **options: calls.append(options) or original(document, **options))
+    document = ReportDocument.from_summary(summary)
+
+    first = document.render("telegram", notion_url="https://notion.so/page")
+    assert document.render("telegram", notion_url="https://notion.so/page") is first
+    document.render("telegram")
+    assert calls == [{"notion_url": "https://notion.so/page"}, {}]
+
+
+def test_sinks_share_content_with_their_own_limits():
+    document = ReportDocument.from_summary(summary, "https://example.com/report")
+
+    [message] = document.render("telegram", notion_url="https://notion.so/page")
+    assert "• Third" in message.text and "Fourth" not in message.text
+    assert "[View in Notion](https://notion.so/page)" in message.text
+    assert "View in Notion: https://notion.so/page" in message.plain
+
+    blocks = document.render("notion")
+    types = [block["type"] for block in blocks]
+    assert types.count("bulleted_list_item") == 5 and "to_do" in types
+    assert [block["type"] for block in blocks if block["type"] in ("image", "bookmark")] == ["image", "bookmark"]
+
+    email = document.render("email_html")
+    assert "S&amp;P 500 &lt;daily&gt;" in email and "Stocks rose &amp; bonds fell" in email
+    assert "<b>sube</b>" in email and "Line one<br>Line two" in email
+    assert "<li>Fourth</li>" in email
+
+    text = document.render("email_text")
+    assert "KEY INSIGHTS\n--------------------\n• First" in text and "MARKET OUTLOOK\n--------------------\nHigher" in text
+
+
+def test_pickled_documents_leave_renderings_behind():
+    document = ReportDocument.from_summary(summary)
+    document.render("email_text")
+    copy = pickle.loads(pickle.dumps(document))
+    assert copy._rendered == {}
+    assert copy.render("email_text") == document.render("email_text")
@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.ai import GroqAIProcessor
+from app.llm_backends import CompletionResult
+from app.schemas import ReportAnalysis, missing_fields, repair_json
+
+
+class ScriptedRouter:
+    """Returns canned completions in order and records the prompts it was sent"""
+
+    def __init__(self, *contents):
+        self.contents = list(contents)
+        self.prompts = []
+
+    def complete(self, messages, validate=None, **params):
+        self.prompts.append(messages[-1]["content"])
+        content = self.contents.pop(0)
+        if validate:
+            validate(content)
+        return CompletionResult(content, "scripted", "test-model")
+
+
+def test_repair_truncated_and_fenced_json():
+    assert repair_json('```json\n{"summary": "a", "key_insights": ["x", "y",],}\n```') == {
+        "summary": "a",
+        "key_insights": ["x", "y"],
+    }
+    assert repair_json('{"summary": "ok", "key_insights": ["one", "tw') == {
+        "summary": "ok",
+        "key_insights": ["one", "tw"],
+    }
+    assert repair_json('{"summary": "ok", "outlook": "up", "risk') == {"summary": "ok", "outlook": "up"}
+    assert repair_json("no json here") is None
+
+
+def test_schema_coerces_types():
+    analysis = ReportAnalysis.model_validate({
+        "summary": ["First paragraph", "Second paragraph"],
+        "key_insights": "- one\n- two",
+        "market_metrics": {
+            "mentioned_stocks": [{"ticker": "AAPL"}, 7],
+            "sectors": "Technology, Energy",
+            "market_sentiment": "Bullish",
+        },
+        "confidence_level": None,
+    }).model_dump()
+
+    assert analysis["summary"] == "First paragraph\n\nSecond paragraph"
+    assert analysis["key_insights"] == ["one", "two"]
+    assert analysis["market_metrics"] == {
+        "mentioned_stocks": ["AAPL", "7"],
+        "sectors": ["Technology", "Energy"],
+        "market_sentiment": "positive",
+    }
+    assert analysis["confidence_level"] == "Low"
+
+
+def test_missing_fields_are_requested_separately():
+    first = json.dumps({
+        "translated_content": "Text",
+        "summary": "Summary",
+        "key_insights": ["Insight"],
+        "market_metrics": {"mentioned_stocks": ["AAPL"], "sectors": ["Tech"], "market_sentiment": "positive"},
+        "outlook": "Up",
+        "confidence_level": "High",
+    })[:-1]  # truncated
+    follow_up = json.dumps({"risk_factors": ["Fed"], "action_items": ["Buy dips"]})
+    router = ScriptedRouter(first, follow_up)
+
+    processor = GroqAIProcessor(router=router)
+    analysis = processor.translate_and_analyze("Report text")
+
+    assert len(router.prompts) == 2
+    assert '"risk_factors"' in router.prompts[1]
+    assert '"summary"' not in router.prompts[1].split("Analysis so far")[0]
+    assert analysis["risk_factors"] == ["Fed"]
+    assert analysis["action_items"] == ["Buy dips"]
+    assert analysis["summary"] == "Summary"
+    assert missing_fields(analysis) == []
+
+
+def test_empty_values_are_answers_not_missing_fields():
+    complete = {
+        "translated_content": "",
+        "summary": "Summary",
+        "key_insights": ["Insight"],
+        "market_metrics": {},
+        "outlook": "Up",
+        "risk_factors": [],
+        "action_items": [],
+        "confidence_level": "High",
+    }
+    assert missing_fields(complete) == []
+    assert missing_fields({**complete, "summary": ""}) == ["summary"]
+    assert missing_fields({**complete, "risk_factors": None}) == ["risk_factors"]
+
+    router = ScriptedRouter(json.dumps(complete))
+    analysis = GroqAIProcessor(router=router).translate_and_analyze("Report text")
+    assert len(router.prompts) == 1
+    assert analysis["risk_factors"] == [] and analysis["action_items"] == []
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.similarity import MinHashIndex
+
+morning = "\n".join(
+    f"Linea {i}: el S&P 500 mantiene el soporte en {4400 + i} puntos mientras el mercado espera a la Fed."
+    for i in range(40)
+)
+evening = morning + "\nActualizacion: el Nasdaq cierra en maximos del dia."
+unrelated = "\n".join(f"Crypto note {i}: bitcoin dominance keeps rising on ETF flows and halving talk." for i in range(40))
+
+
+def test_near_duplicate_is_found_and_persisted(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = MinHashIndex(path, threshold=0.8)
+    index.add("https://protradingskills.com/analysis/morning/", morning, {"summary": "Morning"})
+
+    match = index.query(evening)
+    assert match is not None
+    assert match.url == "https://protradingskills.com/analysis/morning/"
+    assert match.similarity >= 0.8
+    assert match.analysis == {"summary": "Morning"}
+    assert match.changed_lines(evening) == ["Actualizacion: el Nasdaq cierra en maximos del dia."]
+
+    assert index.query(unrelated) is None
+
+    # Signatures and buckets survive a restart
+    reloaded = MinHashIndex(path, threshold=0.8)
+    assert reloaded.query(evening).url == match.url
+
+
+def test_empty_or_short_text_is_never_matched_or_indexed(tmp_path):
+    index = MinHashIndex(str(tmp_path / "index.json"), threshold=0.8)
+    index.add("https://example.com/empty/", "", {"summary": "Stale"})
+    index.add("https://example.com/short/", "Login required", {"summary": "Stale"})
+
+    assert index.entries == {}
+    assert index.signature("   ") is None
+    assert index.query("   ") is None and index.query("Login required") is None
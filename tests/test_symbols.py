@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.symbols import AhoCorasick, SymbolIndex
+
+index = SymbolIndex()
+
+
+def test_aho_corasick_matches_whole_words_only():
+    automaton = AhoCorasick()
+    for pattern in ("he", "she", "hers", "his"):
+        automaton.add(pattern, pattern)
+    assert [value for _, _, value in automaton.find("ushers he his")] == ["he", "his"]
+
+
+def test_normalizes_aliases_to_canonical_names():
+    assert index.normalize_stock("Apple Inc.") == "AAPL"
+    assert index.normalize_stock("$aapl") == "AAPL"
+    assert index.normalize_stock("Nasdaq-100") == "Nasdaq 100"
+    assert index.normalize_sector("tecnologia") == "Technology"
+    assert index.normalize_sector("Banks") == "Financials"
+    assert index.normalize_stock("Unknown Corp") is None
+
+
+def test_scan_finds_mentions_as_written():
+    found = index.scan("Las tecnológicas lideran: Apple y NVIDIA suben, la meta del S&P 500 es 5000.")
+    assert found["stocks"] == ["AAPL", "NVDA", "S&P 500"]
+    assert found["sectors"] == ["Technology"]
+
+
+def test_normalize_metrics_dedups_and_drops_free_text():
+    metrics = index.normalize_metrics({
+        "mentioned_stocks": ["Apple", "AAPL", "Nvidia Corp", "Zoom Video", "ZM", "Technology (AAPL, MSFT)"],
+        "sectors": ["tech", "Tecnología", "Space"],
+        "market_sentiment": "neutral",
+    })
+    assert metrics == {
+        "mentioned_stocks": ["AAPL", "NVDA", "ZM", "MSFT"],
+        "sectors": ["Technology", "Space"],
+        "market_sentiment": "neutral",
+    }
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.http_client import HTTPClient
+from app.notifier import TelegramNotifier
+from app.rate_limit import DestinationRateLimiter
+from app.report_document import ReportDocument
+from app.telegram_messages import (MAX_MESSAGE_LENGTH, TelegramMessage, TelegramPart, bold_span, link_span,
+                                   render_span, text_span, utf16_length)
+from benchmarks.fake_services import FakeTelegramAPI, parse_telegram_text
+
+RESERVED = "S&P 500 <up> 2.5% (a_b) *c* [d] ~e~ `f` #g +h -i =j |k| {l} !m \\n"
+
+
+def test_reserved_characters_are_escaped_for_each_mode():
+    spans = [bold_span("AT&T_*"), text_span(" " + RESERVED + " "), link_span("Notion (page)", "https://notion.so/a_(b)")]
+    for parse_mode in ("MarkdownV2", "HTML"):
+        rendered = "".join(render_span(span, parse_mode) for span in spans)
+        plain, error = parse_telegram_text(rendered, parse_mode)
+        assert error is None
+        assert plain == "AT&T_* " + RESERVED + " Notion (page)"
+    assert render_span(link_span("Notion", "https://notion.so"), None) == "Notion: https://notion.so"
+
+
+def test_long_messages_split_on_paragraphs_under_the_limit():
+    message = TelegramMessage("MarkdownV2")
+    paragraphs = [f"Paragraph {i}: " + "1.5% (up) " * 60 for i in range(20)]
+    for paragraph in paragraphs:
+        message.add(text_span(paragraph))
+    message.add(text_span("📈" * 3000))
+
+    parts = message.parts()
+    assert len(parts) > 2
+    for part in parts:
+        assert utf16_length(part.text) <= MAX_MESSAGE_LENGTH and utf16_length(part.plain) <= MAX_MESSAGE_LENGTH
+        assert parse_telegram_text(part.text, "MarkdownV2") == (part.plain, None)
+    # Paragraphs are only cut when they don't fit on their own, and everything arrives in order
+    pieces = [piece for part in parts for piece in part.plain.split("\n\n")]
+    assert pieces[:20] == [paragraph.strip() for paragraph in paragraphs]
+    assert "".join(pieces[20:]) == "📈" * 3000
+
+
+def test_report_parts_arrive_in_order_and_unparseable_parts_fall_back_to_plain_text():
+    document = ReportDocument.from_summary({
+        "metadata": {"title": "S&P 500 closes at 5,000.5 (record)"},
+        "analysis": {"summary": "\n\n".join(f"Section {i}: " + "word " * 500 for i in range(5))},
+    })
+    parts = document.render("telegram", notion_url="https://notion.so/page")
+    broken = TelegramPart("*unterminated", "unterminated")
+
+    with FakeTelegramAPI(chat_burst=100, chat_rate=100) as telegram:
+        notifier = TelegramNotifier(http=HTTPClient(backoff_factor=0), limiter=DestinationRateLimiter(1000))
+        notifier.base_url = f"{telegram.url}/botTOKEN"
+
+        assert notifier._deliver_parts("1", parts) == {"success": True, "parts_sent": len(parts)}
+        shown = [parse_telegram_text(part.text, "MarkdownV2")[0] for part in parts]
+        assert [message["text"] for message in telegram.messages["1"]] == shown
+        assert telegram.messages["1"][0]["text"].startswith("📊 S&P 500 closes at 5,000.5 (record)")
+
+        outcome = notifier._deliver_parts("2", [parts[0], broken, parts[1]])
+        assert outcome == {"success": True, "parts_sent": 3}
+        assert [message["text"] for message in telegram.messages["2"]] == [shown[0], "unterminated", shown[1]]
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.translation_memory import TranslationMemory, segment_text
+
+report = (
+    "Instrucciones antes de la FED.\n"
+    "El S&P 500 sube 1,5%. Soporte en 4.500 puntos.\n\n"
+    "Aviso legal: esto no es asesoría.\n"
+    "123"
+)
+
+
+def test_segments_round_trip():
+    segments = segment_text(report)
+    assert "".join(sentence + separator for sentence, separator in segments) == report
+    assert ("Soporte en 4.500 puntos.", "\n\n") in segments
+
+
+def test_only_unseen_segments_are_sent(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "tm.sqlite3"))
+
+    first = memory.plan(report)
+    assert first.hits == 0
+    assert len(first.missing) == 4
+    memory.store(first.new_entries({
+        "s1": "Instructions before the FED.",
+        "s4": "Disclaimer: this is not advice.",
+    }))
+
+    second = memory.plan(report)
+    assert second.hits == 2
+    assert list(second.missing.values()) == ["El S&P 500 sube 1,5%.", "Soporte en 4.500 puntos."]
+    assert "[s1] El S&P 500" in second.tagged_text()
+    assert "Instrucciones" in second.tagged_text()
+
+    translated = second.assemble({"s1": "The S&P 500 rises 1.5%.", "s2": "Support at 4,500 points."})
+    assert translated == (
+        "Instructions before the FED.\n"
+        "The S&P 500 rises 1.5%. Support at 4,500 points.\n\n"
+        "Disclaimer: this is not advice.\n"
+        "123"
+    )
+    assert memory.stats()["segments_stored"] == 2
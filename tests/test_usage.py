@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.llm_backends import BackendError, CompletionResult, LLMBackend, LLMRouter, CircuitBreaker
+from app.rate_limit import RateLimitScheduler
+from app.usage import UsageTracker, current_usage_context, usage_scope
+import app.llm_backends as llm_backends
+
+
+class CannedBackend(LLMBackend):
+    def _send(self, messages, params):
+        usage = {
+            "prompt_tokens": 100,
+            "completion_tokens": 40,
+            "total_tokens": 140,
+            "completion_tokens_details": {"reasoning_tokens": 25},
+        }
+        return CompletionResult(content="{}", backend=self.name, model=self.model, usage=usage), {}
+
+
+class GarbledBackend(CannedBackend):
+    def _send(self, messages, params):
+        result, headers = super()._send(messages, params)
+        result.content = "not json"
+        return result, headers
+
+
+class DownBackend(LLMBackend):
+    def _send(self, messages, params):
+        raise BackendError("connection refused")
+
+
+def test_usage_scope_nests_and_resets():
+    with usage_scope(request_id="abc"):
+        with usage_scope(stage="analysis"):
+            assert current_usage_context() == {"request_id": "abc", "stage": "analysis"}
+        assert current_usage_context() == {"request_id": "abc"}
+    assert current_usage_context() == {}
+
+
+def test_router_records_usage_for_the_calling_request(tmp_path, monkeypatch):
+    tracker = UsageTracker(str(tmp_path / "usage.sqlite3"))
+    monkeypatch.setattr(llm_backends, "usage_tracker", tracker)
+    backend = CannedBackend(
+        "canned", "test-model",
+        scheduler=RateLimitScheduler(requests_per_minute=1000, tokens_per_minute=10 ** 6),
+        breaker=CircuitBreaker(),
+    )
+    router = LLMRouter([backend], hedge=False)
+
+    # The router runs the call on a worker thread; attribution must follow it there
+    with usage_scope(request_id="req-1", report_url="https://example.com/r1"):
+        with usage_scope(stage="analysis"):
+            router.complete([{"role": "user", "content": "hi"}])
+        with usage_scope(stage="missing_fields"):
+            router.complete([{"role": "user", "content": "hi"}])
+    router.complete([{"role": "user", "content": "unattributed"}])
+
+    usage = tracker.for_request("req-1")
+    assert usage["total_tokens"] == 280
+    assert usage["stages"]["analysis"]["calls"] == 1 and usage["stages"]["analysis"]["failed_calls"] == 0
+    assert usage["stages"]["analysis"]["reasoning_tokens"] == 25
+    assert set(usage["stages"]) == {"analysis", "missing_fields"}
+
+    summary = tracker.summary(days=1)
+    assert summary["per_day"][0]["calls"] == 3
+    assert summary["per_day"][0]["reasoning_tokens"] == 75
+    assert summary["per_model"][0]["model"] == "test-model"
+    assert summary["per_report"]["reports"] == 1
+    assert summary["per_report"]["p95_tokens"] == 280
+    assert summary["per_report"]["avg_reasoning_tokens"] == 50
+
+
+def test_record_is_thread_safe(tmp_path):
+    tracker = UsageTracker(str(tmp_path / "usage.sqlite3"))
+    threads = [
+        threading.Thread(target=tracker.record, args=("b", "m", {"prompt_tokens": 1, "completion_tokens": 1}, 0.1),
+                         kwargs={"request_id": "r"})
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tracker.for_request("r")["total_tokens"] == 20
+
+
+def test_failed_calls_are_recorded(tmp_path, monkeypatch):
+    tracker = UsageTracker(str(tmp_path / "usage.sqlite3"))
+    monkeypatch.setattr(llm_backends, "usage_tracker", tracker)
+    scheduler = RateLimitScheduler(requests_per_minute=1000, tokens_per_minute=10 ** 6, max_retries=0)
+    router = LLMRouter([
+        DownBackend("down", "test-model", scheduler=scheduler, breaker=CircuitBreaker()),
+        GarbledBackend("garbled", "test-model", scheduler=scheduler, breaker=CircuitBreaker()),
+        CannedBackend("canned", "test-model", scheduler=scheduler, breaker=CircuitBreaker()),
+    ], hedge=False)
+
+    with usage_scope(request_id="req-2", stage="analysis"):
+        assert router.complete([{"role": "user", "content": "hi"}], validate=json.loads).backend == "canned"
+
+    # The unreachable backend used no tokens; the garbled answer did, and counts as failed
+    usage = tracker.for_request("req-2")["stages"]["analysis"]
+    assert usage["calls"] == 3 and usage["failed_calls"] == 2
+    assert usage["total_tokens"] == 280
+    assert tracker.summary(days=1)["per_day"][0]["failed_calls"] == 2